@@ -0,0 +1,155 @@
+import os, time, asyncio
+from typing import Dict, List
+
+import job_queue
+from ocr_utils import extract_document
+from field_extractor import extract_structured_fields
+from llm_utils import query_llm
+from policy_search import _insurer_key
+from rag_utils import RETRIEVAL_MODE, build_prompt_with_usage, retrieval_queries, retrieve_scored_policy_clauses_many
+from executors import run_io
+import metrics
+
+# Background drainers for the /claims/batch queue. Each round takes up to BATCH_SIZE claims and
+# batches work across them: all OCR at once, one query-encoding pass, one corpus load per insurer,
+# and concurrent LLM calls (bounded by LLM_MAX_CONCURRENCY / LLM_RATE_PER_SEC in llm_utils).
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "2"))
+BATCH_ERROR_BACKOFF_MAX = 30.0  # seconds between retries while the queue database is unavailable
+
+_wake = {}  # event loop -> asyncio.Event set when new work is submitted
+
+async def _claim_text(files) -> str:
+    parts = await asyncio.gather(*(extract_document(name, contents) for name, contents in files))
+    return "".join(parts)
+
+async def process_jobs(jobs: List[Dict]):
+    """Run the claim pipeline for a group of queued jobs; each job is completed or failed on its own."""
+    errors: Dict[int, str] = {}
+
+    def ok(i: int, value) -> bool:
+        if isinstance(value, BaseException):
+            errors.setdefault(i, f"{type(value).__name__}: {value}")
+        return i not in errors
+
+    texts = await asyncio.gather(*(_claim_text(job["files"]) for job in jobs), return_exceptions=True)
+    structured = await asyncio.gather(
+        *(extract_structured_fields(text) for i, text in enumerate(texts) if ok(i, text)), return_exceptions=True
+    )
+    live = [i for i in range(len(jobs)) if i not in errors]
+    structured = dict(zip(live, structured))
+    for i in live:
+        ok(i, structured[i])
+    live = [i for i in live if i not in errors]
+
+    # Group by insurer so each corpus is loaded once; its claims' queries are searched together
+    query_sets = {i: retrieval_queries(structured[i]) for i in live}
+    groups: Dict[str, List[int]] = {}
+    for i in live:
+        insurer = structured[i].get("insurance_company") if isinstance(structured[i], dict) else ""
+        if insurer:
+            groups.setdefault(_insurer_key(insurer), []).append(i)
+    if RETRIEVAL_MODE != "keyword" and groups:
+        from embeddings_faiss import embed_queries
+        # Every claim's retrieval queries in one model pass; later searches hit the query cache
+        all_queries = list(dict.fromkeys(q for idxs in groups.values() for i in idxs for q in query_sets[i]))
+        await run_io(embed_queries, all_queries)
+
+    clauses = {i: [] for i in live}
+
+    async def retrieve_group(idxs: List[int]):
+        insurer = structured[idxs[0]]["insurance_company"]
+        try:
+            found = await run_io(retrieve_scored_policy_clauses_many, insurer, [query_sets[i] for i in idxs])
+        except Exception as err:
+            print(f"Batch retrieval error for {insurer}: {err}")
+            return  # decide without clauses, as the single-claim endpoint does when retrieval finds nothing
+        for i, result in zip(idxs, found):
+            clauses[i] = result
+
+    await asyncio.gather(*(retrieve_group(idxs) for idxs in groups.values()))
+
+    async def decide(i: int) -> Dict:
+        data = structured[i] if isinstance(structured[i], dict) else {}
+        prompt, usage = build_prompt_with_usage(texts[i], data, clauses[i])
+        with metrics.span("decision"):
+            decision = await query_llm(prompt)
+        return {
+            "structured_data": structured[i],
+            "policy_clauses_used": [text for _, text in clauses[i][:6]],
+            "prompt_tokens": usage,
+            "decision": decision,
+        }
+
+    decisions = await asyncio.gather(*(decide(i) for i in live), return_exceptions=True)
+    results = dict(zip(live, decisions))
+    for i, job in enumerate(jobs):
+        if i in results and ok(i, results[i]):
+            await run_io(job_queue.complete, job["id"], results[i])
+        else:
+            print(f"Batch job {job['id']} failed: {errors[i]}")
+            await run_io(job_queue.fail, job["id"], errors[i])
+
+def _event() -> asyncio.Event:
+    return _wake.setdefault(asyncio.get_running_loop(), asyncio.Event())
+
+def notify():
+    """Wake idle workers after a submit (call from the event loop)."""
+    _event().set()
+
+async def _keep_leases(job_ids: List[str]):
+    # Renew the jobs' lease while they are processed, so no other worker requeues them
+    while True:
+        await asyncio.sleep(job_queue.JOB_LEASE_SECONDS / 3)
+        try:
+            await run_io(job_queue.heartbeat, job_ids)
+        except Exception as err:
+            print(f"Batch heartbeat error: {err}")
+
+async def _worker():
+    wake = _event()
+    backoff = BATCH_POLL_SECONDS
+    next_requeue = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_requeue:
+                await run_io(job_queue.requeue_stale)
+                next_requeue = time.monotonic() + job_queue.JOB_LEASE_SECONDS / 3
+            jobs = await run_io(job_queue.claim_jobs, BATCH_SIZE)
+        except Exception as err:
+            print(f"Batch queue error: {err}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, BATCH_ERROR_BACKOFF_MAX)
+            continue
+        backoff = BATCH_POLL_SECONDS
+        if not jobs:
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), BATCH_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        leases = asyncio.ensure_future(_keep_leases([job["id"] for job in jobs]))
+        try:
+            await process_jobs(jobs)
+        except Exception as err:
+            print(f"Batch worker error: {err}")
+            # fail() skips jobs process_jobs already completed
+            for job in jobs:
+                try:
+                    await run_io(job_queue.fail, job["id"], str(err))
+                except Exception as queue_err:
+                    print(f"Batch queue error: {queue_err}")
+        finally:
+            leases.cancel()
+
+def start() -> List[asyncio.Task]:
+    return [asyncio.ensure_future(_worker()) for _ in range(BATCH_WORKERS)]
+
+async def stop(tasks: List[asyncio.Task]):
+    # Jobs cut off here stay "running" and are requeued once their lease expires
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _wake.pop(asyncio.get_running_loop(), None)
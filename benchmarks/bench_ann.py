@@ -0,0 +1,74 @@
+"""
+Recall vs latency vs memory for the index types embeddings_faiss can build.
+Vectors are clustered synthetic unit vectors (MiniLM's 384 dims by default); recall@k is measured
+against the exact flat index.
+
+    python benchmarks/bench_ann.py --sizes 10000,100000,300000 --k 8 --out ann.json
+"""
+import os, sys, json, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embeddings_faiss import build_faiss_index
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    x = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def index_bytes(index) -> int:
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)
+
+def latency_ms(index, queries: np.ndarray, k: int) -> dict:
+    times = []
+    for q in queries:
+        started = time.perf_counter()
+        index.search(q[None, :], k)
+        times.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": float(np.percentile(times, 50)), "p99_ms": float(np.percentile(times, 99))}
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+def run(sizes, types, dim: int, k: int, n_queries: int) -> list:
+    results = []
+    for n in sizes:
+        data = synthetic_vectors(n, dim, clusters=max(n // 500, 8), seed=n)
+        queries = synthetic_vectors(n_queries, dim, clusters=max(n // 500, 8), seed=n)  # same centers
+        flat, _ = build_faiss_index(data, "flat")
+        _, truth = flat.search(queries, k)
+        for index_type in types:
+            started = time.perf_counter()
+            index, params = build_faiss_index(data, index_type)
+            build_s = time.perf_counter() - started
+            _, found = index.search(queries, k)
+            row = {
+                "n": n, "requested": index_type, "built": params["index_type"], "params": params,
+                "build_s": build_s, f"recall@{k}": recall_at_k(truth, found),
+                "memory_mb": index_bytes(index) / 1e6, **latency_ms(index, queries, k),
+            }
+            results.append(row)
+            print(f"n={n:>8} {params['index_type']:>6}  recall@{k}={row[f'recall@{k}']:.3f}  "
+                  f"p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms  mem={row['memory_mb']:.1f}MB  "
+                  f"build={build_s:.1f}s", flush=True)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--types", default="flat,hnsw,ivf,ivfpq")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out", default="bench_ann.json")
+    args = parser.parse_args(argv)
+
+    results = run([int(s) for s in args.sizes.split(",")], args.types.split(","), args.dim, args.k, args.queries)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
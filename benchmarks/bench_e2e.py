@@ -0,0 +1,200 @@
+"""
+Offline end-to-end benchmark: synthetic claims (text PDFs, scanned PDFs, PNG bills, DOCX) and a
+synthetic policy, against the stub LLM. Times the stages on their own (ocr_utils, policy_ingest
+chunking, embeddings_faiss.search) and whole claims through the ASGI app at each concurrency,
+reporting p50/p95/p99, claims/sec and peak RSS as JSON so runs can be compared.
+
+    python benchmarks/bench_e2e.py --claims 100 --concurrency 1,8,32 --llm-delay 0.3 --out e2e.json
+
+Per-stage times for whole claims come from the app's Server-Timing header. OCR of scanned
+documents needs the tesseract binary; stages that cannot run here are reported with an "error".
+"""
+import os, sys, json, time, asyncio, argparse, tempfile
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_llm import start_stub_server
+from synthetic import INSURER, claim_document, policy_pdf
+
+KINDS = ("text-pdf", "scanned-pdf", "png", "docx")
+
+def latency_stats(seconds) -> dict:
+    if not seconds:
+        return {"n": 0}
+    ms = np.array(seconds) * 1000
+    return {"n": len(ms), "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)), "mean_ms": float(ms.mean())}
+
+def peak_rss_mb(who: str = "self") -> float:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def timed(fn, reps: int, *args) -> dict:
+    times = []
+    try:
+        for _ in range(reps):
+            started = time.perf_counter()
+            fn(*args)
+            times.append(time.perf_counter() - started)
+    except Exception as err:
+        return {"error": f"{type(err).__name__}: {err}", **latency_stats(times)}
+    return latency_stats(times)
+
+def bench_ocr(kinds, reps: int) -> dict:
+    from ocr_utils import extract_text_from_file
+    results = {}
+    for kind in kinds:
+        name, contents = claim_document(kind)
+        results[kind] = {"bytes": len(contents), **timed(extract_text_from_file, reps, contents, name)}
+        print(f"ocr {kind:>12}: {results[kind]}", flush=True)
+    return results
+
+def bench_chunk(policy_path: str, reps: int) -> dict:
+    from policy_ingest import chunk_text, policy_passages, read_pdf_text
+    text = read_pdf_text(policy_path)
+    results = {
+        "policy_chars": len(text),
+        "passages": len(policy_passages(policy_path)),
+        "chunk_text": timed(chunk_text, reps, text),
+        "policy_passages": timed(policy_passages, reps, policy_path),
+    }
+    print(f"chunk: {results}", flush=True)
+    return results
+
+def bench_search(policy_path: str, reps: int, k: int) -> dict:
+    try:
+        from embeddings_faiss import build_faiss_index, embed_passages, search
+        from policy_ingest import policy_passages
+        from rag_utils import DEFAULT_QUERIES
+        passages = policy_passages(policy_path)
+        started = time.perf_counter()
+        index, params = build_faiss_index(embed_passages(passages))
+        build_s = time.perf_counter() - started
+        search(index, passages, DEFAULT_QUERIES[0], k)  # model load + first encode
+    except Exception as err:
+        return {"error": f"{type(err).__name__}: {err}"}
+    times = []
+    for i in range(reps):
+        query = f"{DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)]} {i}"  # distinct, so the query cache misses
+        started = time.perf_counter()
+        search(index, passages, query, k)
+        times.append(time.perf_counter() - started)
+    results = {"passages": len(passages), "index": params, "build_s": build_s, "search": latency_stats(times)}
+    print(f"search: {results}", flush=True)
+    return results
+
+def _server_timing(header: str) -> dict:
+    stages = {}
+    for part in filter(None, (p.strip() for p in (header or "").split(","))):
+        name, _, dur = part.partition(";dur=")
+        if dur:
+            stages[name] = float(dur) / 1000
+    return stages
+
+async def bench_claims(kinds, n_claims: int, concurrency_levels) -> dict:
+    import httpx
+    import main
+
+    async def post(client, seed: int):
+        name, contents = claim_document(kinds[seed % len(kinds)], seed)
+        started = time.perf_counter()
+        response = await client.post("/process-claim/", files=[("files", (name, contents))],
+                                     params={"include_ocr_text": "false"})
+        return time.perf_counter() - started, response
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)  # failed claims count as errors
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            elapsed, response = await post(client, 0)
+            results["first_claim"] = {"latency_ms": elapsed * 1000, "status": response.status_code,
+                                      "stages_ms": {k: v * 1000 for k, v in _server_timing(response.headers.get("server-timing")).items()}}
+            for level, concurrency in enumerate(concurrency_levels):
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def one(seed: int):
+                    async with semaphore:
+                        return await post(client, seed)
+
+                # Fresh seeds per level so no claim is answered from an earlier level's caches
+                seeds = range(1 + level * n_claims, 1 + (level + 1) * n_claims)
+                started = time.perf_counter()
+                runs = await asyncio.gather(*(one(s) for s in seeds))
+                wall = time.perf_counter() - started
+
+                stages = {}
+                for _, response in runs:
+                    for stage, seconds in _server_timing(response.headers.get("server-timing")).items():
+                        stages.setdefault(stage, []).append(seconds)
+                errors = [r.status_code for _, r in runs if r.status_code != 200]
+                row = {
+                    "claims": n_claims, "wall_s": wall, "claims_per_s": n_claims / wall, "errors": len(errors),
+                    "end_to_end": latency_stats([t for t, r in runs if r.status_code == 200]),
+                    "stages": {stage: latency_stats(times) for stage, times in sorted(stages.items())},
+                    "peak_rss_mb": peak_rss_mb(),
+                }
+                results[f"concurrency_{concurrency}"] = row
+                print(f"claims c={concurrency:>3}: {row['claims_per_s']:.2f} claims/s  "
+                      f"p50={row['end_to_end'].get('p50_ms', 0):.0f}ms p99={row['end_to_end'].get('p99_ms', 0):.0f}ms  "
+                      f"errors={len(errors)}", flush=True)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default="ocr,chunk,search,claims")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="claim document kinds to generate")
+    parser.add_argument("--claims", type=int, default=50, help="claims per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--reps", type=int, default=20, help="repetitions for the single-stage timings")
+    parser.add_argument("--policy-pages", type=int, default=40)
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="stub LLM seconds per call")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--data-dir", default=None, help="default: a fresh temporary directory")
+    parser.add_argument("--out", default="bench_e2e.json")
+    args = parser.parse_args(argv)
+    stages = args.stages.split(",")
+    kinds = args.kinds.split(",")
+
+    # The app reads its configuration at import, so point it at the stub and a scratch DATA_DIR first
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="hb-bench-")
+    server, llm_url, llm_stats = start_stub_server(0, args.llm_delay)
+    os.environ.update({"DATA_DIR": data_dir, "GROQ_API_URL": llm_url, "GROQ_API_KEY": "bench"})
+    os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+    from policy_search import CACHE_DIR, _insurer_key
+    policy_path = os.path.join(CACHE_DIR, _insurer_key(INSURER), "manual.pdf")
+    policy_pdf(policy_path, args.policy_pages)
+
+    report = {
+        "config": {**vars(args), "data_dir": data_dir,
+                   **{k: os.getenv(k) for k in ("RETRIEVAL_MODE", "CPU_WORKERS", "IO_WORKERS", "WARMUP_MODE", "LLM_CACHE_ENABLED")}},
+    }
+    if "ocr" in stages:
+        report["ocr"] = bench_ocr(kinds, args.reps)
+    if "chunk" in stages:
+        report["chunk"] = bench_chunk(policy_path, args.reps)
+    if "search" in stages:
+        report["search"] = bench_search(policy_path, args.reps, args.k)
+    if "claims" in stages:
+        concurrency = [int(c) for c in args.concurrency.split(",")]
+        report["claims"] = asyncio.run(bench_claims(kinds, args.claims, concurrency))
+    report["llm_requests"] = llm_stats.get("requests", 0)
+    report["peak_rss_mb"] = {"self": peak_rss_mb(), "children": peak_rss_mb("children")}
+    server.shutdown()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+OCR speed and accuracy with and without the image normalization in ocr_utils.preprocess_image.
+The sample set is generated deterministically from seeds (synthetic.py): phone photos of bills
+(tilted, unevenly lit, noisy JPEGs of --megapixels) and clean 200 dpi PNG scans. Accuracy is the
+character similarity of the OCR output to the text the sample was rendered from.
+
+    python benchmarks/bench_ocr.py --samples 8 --megapixels 12 --out ocr.json
+
+bench_ocr_results.json is that run's report, the measurement behind the OCR_PREPROCESS default.
+"""
+import io, os, re, sys, json, time, difflib, argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import claim_text, photo_bytes, png_bytes
+import ocr_utils
+
+def sample_set(n: int, megapixels: float):
+    """[(name, image bytes, ground-truth text)]: n photos and n scans."""
+    samples = []
+    for seed in range(n):
+        text = claim_text(seed)
+        samples.append((f"photo-{seed}", photo_bytes(text, seed, megapixels), text))
+        samples.append((f"scan-{seed}", png_bytes(text), text))
+    return samples
+
+def accuracy(found: str, truth: str) -> float:
+    normalize = lambda t: re.sub(r"\s+", " ", t).strip().lower()
+    return difflib.SequenceMatcher(None, normalize(found), normalize(truth), autojunk=False).ratio()
+
+def run_variant(samples, preprocess: bool) -> dict:
+    rows = []
+    for name, contents, truth in samples:
+        started = time.perf_counter()
+        try:
+            text, steps = ocr_utils.ocr_image_timed(contents, preprocess=preprocess)
+        except Exception as err:  # e.g. no tesseract binary: still time the preprocessing on its own
+            if not preprocess:
+                return {"error": f"{type(err).__name__}: {err}"}
+            _, steps = ocr_utils.preprocess_image(Image.open(io.BytesIO(contents)))
+            rows.append({"sample": name, "seconds": time.perf_counter() - started, "steps": steps,
+                         "error": f"{type(err).__name__}: {err}"})
+            continue
+        rows.append({"sample": name, "seconds": time.perf_counter() - started, "steps": steps,
+                     "accuracy": accuracy(text, truth)})
+    summary = {}
+    for kind in ("photo", "scan"):
+        kind_rows = [r for r in rows if r["sample"].startswith(kind)]
+        seconds = [r["seconds"] for r in kind_rows]
+        steps = {}
+        for r in kind_rows:
+            for step, s in r["steps"].items():
+                steps.setdefault(step, []).append(s * 1000)
+        scored = [r["accuracy"] for r in kind_rows if "accuracy" in r]
+        summary[kind] = {
+            "p50_ms": float(np.percentile(seconds, 50) * 1000), "p95_ms": float(np.percentile(seconds, 95) * 1000),
+            "steps_p50_ms": {step: float(np.median(ms)) for step, ms in steps.items()},
+            "accuracy_mean": float(np.mean(scored)) if scored else None,
+        }
+    return {"summary": summary, "samples": rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=8, help="photos and scans each")
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--out", default="bench_ocr.json")
+    args = parser.parse_args(argv)
+
+    samples = sample_set(args.samples, args.megapixels)
+    try:
+        engine = str(ocr_utils.pytesseract.get_tesseract_version())
+    except Exception as err:
+        engine = f"unavailable ({type(err).__name__})"
+    report = {"config": {**vars(args), "tesseract": engine, "OCR_PSM": ocr_utils.OCR_PSM,
+                         "OCR_LANG": ocr_utils.OCR_LANG, "OCR_TARGET_LINE_PX": ocr_utils.OCR_TARGET_LINE_PX}}
+    for variant, preprocess in (("raw", False), ("preprocessed", True)):
+        report[variant] = run_variant(samples, preprocess)
+        for kind, stats in report[variant].get("summary", {}).items():
+            print(f"{variant:>12} {kind:>5}: p50={stats['p50_ms']:.0f}ms  accuracy={stats['accuracy_mean']}  "
+                  f"steps={ {k: round(v, 1) for k, v in stats['steps_p50_ms'].items()} }", flush=True)
+        if "error" in report[variant]:
+            print(f"{variant:>12}: {report[variant]['error']}")
+    raw, pre = report["raw"].get("summary"), report["preprocessed"].get("summary")
+    if raw and pre:
+        report["speedup_p50"] = {kind: raw[kind]["p50_ms"] / pre[kind]["p50_ms"] for kind in raw}
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
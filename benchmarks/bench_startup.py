@@ -0,0 +1,92 @@
+"""
+Cold-start benchmark: import time of the app module, and time from process launch to the
+first successful /process-claim/ response for each WARMUP_MODE, against the stub LLM.
+
+    python benchmarks/bench_startup.py --runs 3 --out startup.json
+"""
+import os, sys, json, time, argparse, statistics, subprocess, socket, tempfile
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_llm import start_stub_server
+from synthetic import INSURER, claim_text, text_pdf_bytes, policy_pdf
+from insurer_aliases import insurer_key
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def import_time(runs: int) -> dict:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    env = {**os.environ, "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "bench")}
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    # Heaviest imports, from the interpreter's own import profiler
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env,
+                         capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    top = [{"module": m, "cumulative_ms": us / 1000} for us, m in sorted(rows, reverse=True)[:10]]
+    return {"runs_s": times, "median_s": statistics.median(times), "top_imports": top}
+
+def first_claim(mode: str, llm_url: str, data_dir: str, timeout: float = 600) -> dict:
+    port = _free_port()
+    env = {**os.environ, "GROQ_API_URL": llm_url, "GROQ_API_KEY": "bench", "WARMUP_MODE": mode,
+           "DATA_DIR": data_dir, "LLM_CACHE_ENABLED": "0", "SERVE_ONLY": "1"}
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    result = {"mode": mode}
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if requests.get(f"{base}/ready", timeout=1).status_code in (200, 503):
+                    result.setdefault("listening_s", time.perf_counter() - started)
+                    break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        files = {"files": ("bill.pdf", text_pdf_bytes(claim_text(1)), "application/pdf")}
+        response = requests.post(f"{base}/process-claim/?include_ocr_text=false", files=files, timeout=timeout)
+        result["status_code"] = response.status_code
+        result["first_claim_s"] = time.perf_counter() - started
+        result["clauses"] = len(response.json().get("policy_clauses_used", [])) if response.ok else 0
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default="eager,background,off")
+    parser.add_argument("--out", default="bench_startup.json")
+    args = parser.parse_args(argv)
+
+    results = {"import": import_time(args.runs), "first_claim": []}
+    server, llm_url, _ = start_stub_server()
+    with tempfile.TemporaryDirectory() as data_dir:
+        key = insurer_key(INSURER)
+        policy_pdf(os.path.join(data_dir, "policies", key, "manual.pdf"))
+        # Pre-build the index so every mode measures startup, not ingestion
+        subprocess.run([sys.executable, "ingest_cli.py"], cwd=ROOT, env={**os.environ, "DATA_DIR": data_dir}, check=True,
+                       stdout=subprocess.DEVNULL)
+        for mode in args.modes.split(","):
+            for _ in range(args.runs):
+                results["first_claim"].append(first_claim(mode, llm_url, data_dir))
+    server.shutdown()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
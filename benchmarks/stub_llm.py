@@ -0,0 +1,78 @@
+"""
+OpenAI-compatible stub of the Groq chat completions endpoint for offline benchmarks.
+Returns canned JSON (extracted fields or a decision) after a configurable delay; supports stream=true.
+
+    python benchmarks/stub_llm.py --port 8900 --delay 0.5
+    GROQ_API_URL=http://127.0.0.1:8900/v1/chat/completions GROQ_API_KEY=stub uvicorn main:app
+"""
+import json, time, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIELDS_RESPONSE = {
+    "name": "Ramesh Kumar", "age": "45", "diagnosis": "Acute appendicitis",
+    "date_of_admission": "12/03/2024", "date_of_discharge": "15/03/2024",
+    "hospital_name": "City Care Hospital", "insurance_company": "Bench Health Insurance",
+    "policy_id": "BH/2024/000123", "claimed_amount": "125400",
+}
+DECISION_RESPONSE = {
+    "status": "approved", "approved_amount": 118000, "covered_items": ["room rent", "surgery"],
+    "excluded_items": ["toiletries"], "reasoning": "Covered under in-patient hospitalization; Excl 2 applies to consumables.",
+}
+
+def make_handler(delay: float, stats: dict):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            stats["requests"] = stats.get("requests", 0) + 1
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            canned = FIELDS_RESPONSE if "Extract the following fields" in prompt else DECISION_RESPONSE
+            # Answer only with the fields that were asked for, like the real model would
+            if canned is FIELDS_RESPONSE:
+                canned = {k: v for k, v in canned.items() if f'"{k}"' in prompt} or canned
+            content = json.dumps(canned)
+            time.sleep(delay)
+
+            if body.get("stream"):
+                pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+                payload = "".join(
+                    "data: " + json.dumps({"choices": [{"delta": {"content": p}}]}) + "\n\n" for p in pieces
+                ) + "data: [DONE]\n\n"
+                self._send(payload.encode("utf-8"), "text/event-stream")
+            else:
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+                data = {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}
+                self._send(json.dumps(data).encode("utf-8"), "application/json")
+
+        def _send(self, payload: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return StubHandler
+
+def start_stub_server(port: int = 0, delay: float = 0.0):
+    """Start in a daemon thread; returns (server, url, stats). port=0 picks a free port."""
+    stats = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, url, stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub LLM server for offline benchmarks")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before answering")
+    args = parser.parse_args()
+    server, url, _ = start_stub_server(args.port, args.delay)
+    print(f"stub LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
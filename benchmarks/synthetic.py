@@ -0,0 +1,120 @@
+"""Synthetic claim and policy documents for offline benchmarks."""
+import io, os, random
+import fitz  # PyMuPDF
+
+INSURER = "Bench Health Insurance"
+
+def claim_text(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    items = [("Room rent", 3000), ("Surgeon fees", 40000), ("OT charges", 15000),
+             ("Pharmacy", 8200), ("Investigations", 6400), ("Consumables", 2300)]
+    lines = [
+        "CITY CARE HOSPITAL",
+        "12 MG Road, Pune 411001",
+        f"Patient Name: Patient {seed}    Age: {rng.randint(20, 80)} Yrs",
+        "Date of Admission: 12/03/2024   Date of Discharge: 15/03/2024",
+        f"Insurance Company: {INSURER}",
+        f"Policy No: BH/2024/{seed:06d}",
+        "Final Diagnosis: Acute appendicitis",
+        "",
+    ]
+    total = 0
+    for name, base in items:
+        amount = base + rng.randint(0, 999)
+        total += amount
+        lines.append(f"{name:<30} Rs {amount:,}.00")
+    lines.append(f"Grand Total: Rs {total:,}.00")
+    return "\n".join(lines)
+
+def text_pdf_bytes(text: str, pages: int = 1) -> bytes:
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=10)
+    return doc.tobytes()
+
+def _page_png(text: str, dpi: int) -> bytes:
+    with fitz.open(stream=text_pdf_bytes(text), filetype="pdf") as doc:
+        return doc[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+
+def png_bytes(text: str, dpi: int = 200) -> bytes:
+    """A photographed/scanned bill: the text rendered as a grayscale PNG."""
+    return _page_png(text, dpi)
+
+def scanned_pdf_bytes(text: str, pages: int = 1, dpi: int = 200) -> bytes:
+    """An image-only PDF (no text layer), so every page goes through OCR."""
+    png = _page_png(text, dpi)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=png)
+    return doc.tobytes(deflate=True)
+
+def docx_bytes(text: str) -> bytes:
+    import docx  # python-docx
+    document = docx.Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    buf = io.BytesIO()
+    document.save(buf)
+    return buf.getvalue()
+
+def photo_bytes(text: str, seed: int = 0, megapixels: float = 12.0) -> bytes:
+    """
+    A phone photo of a printed bill: the page at a random slight tilt on a darker, unevenly lit
+    background, with sensor noise, as a JPEG of about `megapixels`.
+    """
+    import numpy as np
+    from PIL import Image
+    rng = random.Random(seed)
+    width, height = int((megapixels * 1e6 * 3 / 4) ** 0.5), int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    with fitz.open(stream=text_pdf_bytes(text), filetype="pdf") as doc:
+        page = doc[0]
+        dpi = int(0.85 * height / (page.rect.height / 72))
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    sheet = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    sheet = sheet.rotate(rng.uniform(-3, 3), resample=Image.BICUBIC, expand=True, fillcolor=90)
+    canvas = Image.new("L", (width, height), 90)
+    canvas.paste(sheet, ((width - sheet.width) // 2, (height - sheet.height) // 2))
+    pixels = np.asarray(canvas, dtype=np.float32)
+    shade = np.linspace(1.0, rng.uniform(0.6, 0.8), width, dtype=np.float32)[None, :]  # light falls off to one side
+    noise = np.random.default_rng(seed).normal(0, 6, pixels.shape).astype(np.float32)
+    photo = Image.fromarray(np.clip(pixels * shade + noise, 0, 255).astype(np.uint8))
+    buf = io.BytesIO()
+    photo.convert("RGB").save(buf, format="JPEG", quality=88)
+    return buf.getvalue()
+
+def claim_document(kind: str, seed: int = 0):
+    """(filename, bytes) of one synthetic claim document; kind is text-pdf | scanned-pdf | png | photo | docx."""
+    text = claim_text(seed)
+    if kind == "text-pdf":
+        return f"claim-{seed}.pdf", text_pdf_bytes(text)
+    if kind == "scanned-pdf":
+        return f"claim-{seed}.pdf", scanned_pdf_bytes(text)
+    if kind == "png":
+        return f"bill-{seed}.png", png_bytes(text)
+    if kind == "photo":
+        return f"photo-{seed}.jpg", photo_bytes(text, seed)
+    if kind == "docx":
+        return f"claim-{seed}.docx", docx_bytes(text)
+    raise ValueError(f"unknown document kind: {kind}")
+
+def policy_pdf(path: str, pages: int = 20, seed: int = 0):
+    """A policy wording of `pages` pages with numbered sections, exclusions and limits."""
+    rng = random.Random(seed)
+    topics = ["room rent", "pre-authorization", "cataract", "pre-existing disease waiting period",
+              "non-medical items", "day care procedures", "ambulance", "co-payment", "cashless claims"]
+    doc = fitz.open()
+    for p in range(pages):
+        paras = []
+        for s in range(6):
+            topic = rng.choice(topics)
+            paras.append(
+                f"{p + 1}.{s + 1} {topic.title()}\n"
+                f"Expenses related to {topic} are payable subject to the limits in the schedule. "
+                f"Excl {rng.randint(1, 20):02d}: claims for {topic} beyond the sum insured are not covered. "
+                * 2
+            )
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), "\n".join(paras), fontsize=8)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    doc.save(path)
@@ -0,0 +1,130 @@
+import os, re, threading
+from collections import Counter, OrderedDict
+from typing import Dict, Hashable, List, Tuple
+import numpy as np
+from fs_utils import atomic_path
+
+# Okapi BM25 over an inverted index stored as flat arrays: a sorted vocabulary, per-term
+# offsets into the postings, and postings of (passage id, term frequency).
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RRF_K", "60"))  # reciprocal-rank fusion constant
+BM25_CACHE_SIZE = int(os.getenv("BM25_CACHE_SIZE", "64"))  # loaded keyword indexes kept in memory
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and any are as at be by for from has have in is it its of on or shall such that the this to under "
+    "which will with".split()
+)
+MAX_TOKEN_CHARS = 32
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS and len(t) <= MAX_TOKEN_CHARS]
+
+class BM25Index:
+    def __init__(self, vocab: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray):
+        self.vocab, self.offsets, self.doc_ids, self.tfs, self.doc_len = vocab, offsets, doc_ids, tfs, doc_len
+        avgdl = float(doc_len.mean()) if len(doc_len) else 1.0
+        # Per-passage length normalisation, computed once
+        self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_len / max(avgdl, 1e-9))).astype("float32")
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def resident_bytes(self) -> int:
+        return sum(a.nbytes for a in (self.vocab, self.offsets, self.doc_ids, self.tfs, self.doc_len, self._norm))
+
+    @classmethod
+    def build(cls, passages: List[str]) -> "BM25Index":
+        term_ids: Dict[str, int] = {}
+        terms, docs, tfs, doc_len = [], [], [], []
+        for doc, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                terms.append(term_ids.setdefault(term, len(term_ids)))
+                docs.append(doc)
+                tfs.append(tf)
+
+        vocab = np.array(sorted(term_ids), dtype=f"<U{MAX_TOKEN_CHARS}")
+        rank = np.empty(len(term_ids), dtype="int64")
+        rank[[term_ids[t] for t in vocab.tolist()]] = np.arange(len(vocab))
+        term_rank = rank[np.array(terms, dtype="int64")] if terms else np.zeros(0, dtype="int64")
+        order = np.argsort(term_rank, kind="stable")  # postings grouped by term, passages ascending
+        offsets = np.zeros(len(vocab) + 1, dtype="int64")
+        np.cumsum(np.bincount(term_rank, minlength=len(vocab)), out=offsets[1:])
+        return cls(vocab, offsets, np.array(docs, dtype="int32")[order], np.array(tfs, dtype="float32")[order],
+                   np.array(doc_len, dtype="float32"))
+
+    def save(self, path: str):
+        with atomic_path(path) as tmp:
+            with open(tmp, "wb") as f:
+                np.savez(f, vocab=self.vocab, offsets=self.offsets, doc_ids=self.doc_ids, tfs=self.tfs,
+                         doc_len=self.doc_len)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            return cls(data["vocab"], data["offsets"], data["doc_ids"], data["tfs"], data["doc_len"])
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every passage for `query`, in one bincount over the matched postings."""
+        terms = np.array(sorted(set(tokenize(query))), dtype=self.vocab.dtype)
+        if not len(terms) or not len(self.vocab):
+            return np.zeros(len(self), dtype="float32")
+        pos = np.minimum(np.searchsorted(self.vocab, terms), len(self.vocab) - 1)
+        pos = pos[self.vocab[pos] == terms]
+        if not len(pos):
+            return np.zeros(len(self), dtype="float32")
+        starts, ends = self.offsets[pos], self.offsets[pos + 1]
+        df = (ends - starts).astype("float32")
+        idf = np.log1p((len(self) - df + 0.5) / (df + 0.5))
+        spans = np.repeat(np.arange(len(pos)), ends - starts)
+        postings = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        docs, tf = self.doc_ids[postings], self.tfs[postings]
+        weights = idf[spans] * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+        return np.bincount(docs, weights=weights, minlength=len(self)).astype("float32")
+
+    def search_batch(self, queries: List[str], k: int = 8) -> List[List[Tuple[float, int]]]:
+        """Per query, up to k (score, passage id) pairs with a positive score, best first."""
+        results = []
+        for query in queries:
+            scores = self.scores(query)
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) else []
+            ranked = sorted(((float(scores[i]), int(i)) for i in top if scores[i] > 0), reverse=True)
+            results.append(ranked)
+        return results
+
+def rrf_fuse(*rankings: List[Tuple[float, Hashable]], k: int = None, rrf_k: int = None) -> List[Tuple[float, Hashable]]:
+    """Reciprocal-rank fusion of best-first (score, item) lists; returns (fused score, item), best first."""
+    rrf_k = RRF_K if rrf_k is None else rrf_k
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, (_, item) in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (rrf_k + rank + 1)
+    out = sorted(((s, item) for item, s in fused.items()), key=lambda c: -c[0])
+    return out[:k] if k else out
+
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], BM25Index]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def load_cached(path: str):
+    """Load a saved index, reusing the in-memory copy while the file is unchanged; None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        entry = _cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            _cache.move_to_end(path)
+            return entry[1]
+    index = BM25Index.load(path)
+    with _cache_lock:
+        _cache[path] = (stamp, index)
+        _cache.move_to_end(path)
+        while len(_cache) > BM25_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,98 @@
+import os, sys, hashlib, threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+from locks import single_flight
+import metrics
+
+# Resident cache of parsed policy corpora (passages + live FAISS and BM25 indexes), keyed by
+# insurer key and the policy PDF's content hash. Bounded by an approximate memory budget.
+CORPUS_CACHE_MB = float(os.getenv("CORPUS_CACHE_MB", "512"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Tuple[str, str], Tuple[object, List[str], object, int]]" = OrderedDict()
+_used_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# (path, mtime_ns, size) -> sha256, so hot lookups don't re-read the PDF
+_sha_memo: Dict[Tuple[str, int, int], str] = {}
+
+def file_sha256(path: str) -> str:
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    sha = _sha_memo.get(memo_key)
+    if sha is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        sha = h.hexdigest()
+        _sha_memo[memo_key] = sha
+    return sha
+
+def _estimate_bytes(index, texts: List[str], keyword_index) -> int:
+    if hasattr(texts, "resident_bytes"):
+        size = texts.resident_bytes()  # memory-mapped passage store
+    else:
+        size = sum(sys.getsizeof(t) for t in texts)
+    if index is not None:
+        size += int(index.ntotal) * int(index.d) * 4
+    if keyword_index is not None:
+        size += keyword_index.resident_bytes()
+    return size
+
+def _evict_locked(budget: int):
+    global _used_bytes
+    while _entries and _used_bytes > budget:
+        _, (_, _, _, nbytes) = _entries.popitem(last=False)
+        _used_bytes -= nbytes
+        _stats["evictions"] += 1
+
+def get_corpus(insurer_key: str, pdf_path: str, loader: Callable[[str, str], Tuple[object, List[str], object]]):
+    """
+    Return (index, texts, keyword_index) for this insurer's policy PDF, calling loader(insurer_key, pdf_path)
+    only on a miss. Entries for an older version of the same insurer's PDF are dropped.
+    """
+    global _used_bytes
+    key = (insurer_key, file_sha256(pdf_path))
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="corpus", result="hit")
+            return entry[:3]
+        _stats["misses"] += 1
+    metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="corpus", result="miss")
+
+    # Concurrent misses for the same corpus share one load
+    index, texts, keyword_index = single_flight(("corpus",) + key, loader, insurer_key, pdf_path)
+    texts = texts or []
+    nbytes = _estimate_bytes(index, texts, keyword_index)
+    budget = int(CORPUS_CACHE_MB * 1024 * 1024)
+
+    with _lock:
+        for stale in [k for k in _entries if k[0] == insurer_key and k != key]:
+            _used_bytes -= _entries.pop(stale)[3]
+        old = _entries.pop(key, None)
+        if old is not None:
+            _used_bytes -= old[3]
+        if nbytes <= budget:
+            _entries[key] = (index, texts, keyword_index, nbytes)
+            _used_bytes += nbytes
+            _evict_locked(budget)
+    return index, texts, keyword_index
+
+def invalidate(insurer_key: str = None):
+    global _used_bytes
+    with _lock:
+        for k in [k for k in _entries if insurer_key is None or k[0] == insurer_key]:
+            _used_bytes -= _entries.pop(k)[3]
+
+def cache_stats() -> Dict:
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "used_bytes": _used_bytes,
+            "budget_bytes": int(CORPUS_CACHE_MB * 1024 * 1024),
+        }
@@ -1,65 +1,389 @@
-import os, json
-from typing import List, Dict, Tuple
-import faiss
-from sentence_transformers import SentenceTransformer
+import os, json, time, shutil, hashlib, sqlite3, threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Iterable
 import numpy as np
+from fs_utils import atomic_write_json
+from passage_store import PassageStore, write_passages
+from bm25 import BM25Index, load_cached as load_cached_bm25
+from locks import run_exclusive
+import metrics
 
 DATA_DIR = os.getenv("DATA_DIR", "data")
 INDEX_DIR = os.path.join(DATA_DIR, "indexes")
 os.makedirs(INDEX_DIR, exist_ok=True)
 
 EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+EMBED_STORE_PATH = os.path.join(INDEX_DIR, "embeddings.sqlite")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Map FAISS index files instead of reading them into each worker's heap
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
 
+# Index type: auto (by corpus size: flat, then hnsw, then ivf) | flat | hnsw | ivf | ivfpq
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf", "ivfpq")
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto").lower()
+if INDEX_TYPE not in INDEX_TYPES:
+    raise ValueError(f"INDEX_TYPE must be one of {', '.join(INDEX_TYPES)}, not {INDEX_TYPE!r}")
+INDEX_AUTO_HNSW_MIN = int(os.getenv("INDEX_AUTO_HNSW_MIN", "20000"))
+INDEX_AUTO_IVF_MIN = int(os.getenv("INDEX_AUTO_IVF_MIN", "200000"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_SUBVECTOR_DIMS = int(os.getenv("PQ_SUBVECTOR_DIMS", "8"))  # dims per PQ sub-quantizer (8 bits each)
+IVF_TRAIN_SAMPLE = int(os.getenv("IVF_TRAIN_SAMPLE", "100000"))
+# ivfpq re-scores this many times k PQ candidates against the full vectors (IndexRefineFlat)
+PQ_REFINE_FACTOR = int(os.getenv("PQ_REFINE_FACTOR", "4"))
+
+# faiss and sentence_transformers (torch) are imported on first use, not at module load,
+# so importing the app stays fast; see warmup.py for loading them ahead of the first claim
 _model = None
+_model_lock = threading.Lock()
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer(EMBED_MODEL_NAME)
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED_MODEL_NAME)
     return _model
 
 def embed_texts(texts: List[str]) -> np.ndarray:
     model = get_model()
-    embs = model.encode(texts, batch_size=64, show_progress_bar=False, normalize_embeddings=True)
+    with metrics.span("embed"):
+        embs = model.encode(texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False, normalize_embeddings=True)
+    metrics.inc("healthbridge_embedded_texts_total", len(texts), "Texts encoded by the embedding model")
     return np.array(embs, dtype="float32")
 
-def _index_paths(insurer_key: str) -> Tuple[str, str]:
+# Bounded LRU of query embeddings; the fixed per-claim queries stay resident.
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_query_lock = threading.Lock()
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """Embed queries, encoding only the ones not already cached (in a single model pass)."""
+    found: Dict[str, np.ndarray] = {}
+    with _query_lock:
+        for q in queries:
+            if q in _query_cache:
+                _query_cache.move_to_end(q)
+                found[q] = _query_cache[q]
+    missing = [q for q in dict.fromkeys(queries) if q not in found]
+    metrics.inc("healthbridge_cache_total", len(found), "Cache lookups", cache="query_embedding", result="hit")
+    if missing:
+        metrics.inc("healthbridge_cache_total", len(missing), "Cache lookups", cache="query_embedding", result="miss")
+        embs = embed_texts(missing)
+        with _query_lock:
+            for q, e in zip(missing, embs):
+                found[q] = e
+                _query_cache[q] = e
+                _query_cache.move_to_end(q)
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+    return np.stack([found[q] for q in queries]).astype("float32", copy=False)
+
+def warm_query_cache(queries: Iterable[str]):
+    embed_queries(list(queries))
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Persistent chunk-hash -> embedding store, so rebuilds only encode passages that changed.
+# The lock serializes writers within the process; reads use their thread's connection and never wait on it.
+_store_lock = threading.Lock()
+_store_schema_lock = threading.Lock()
+_store_schema_ready = set()
+_store_local = threading.local()
+
+def _store_conn() -> sqlite3.Connection:
+    # One connection per thread, reused; the schema is created once per store file
+    conn = getattr(_store_local, "conn", None)
+    if conn is None or _store_local.path != EMBED_STORE_PATH:
+        conn = sqlite3.connect(EMBED_STORE_PATH, timeout=30)
+        with _store_schema_lock:
+            if EMBED_STORE_PATH not in _store_schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")  # readers don't block on a writer in another process
+                conn.execute("CREATE TABLE IF NOT EXISTS emb (model TEXT, hash TEXT, vec BLOB, PRIMARY KEY (model, hash))")
+                _store_schema_ready.add(EMBED_STORE_PATH)
+        _store_local.conn, _store_local.path = conn, EMBED_STORE_PATH
+    return conn
+
+def _store_get(hashes: List[str]) -> Dict[str, np.ndarray]:
+    found = {}
+    conn = _store_conn()
+    uniq = list(dict.fromkeys(hashes))
+    for start in range(0, len(uniq), 500):
+        batch = uniq[start:start + 500]
+        rows = conn.execute(
+            f"SELECT hash, vec FROM emb WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+            [EMBED_MODEL_NAME, *batch],
+        )
+        for h, blob in rows:
+            found[h] = np.frombuffer(blob, dtype="float32")
+    return found
+
+def _store_put(vectors: Dict[str, np.ndarray]):
+    with _store_lock, _store_conn() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO emb (model, hash, vec) VALUES (?, ?, ?)",
+            [(EMBED_MODEL_NAME, h, np.asarray(v, dtype="float32").tobytes()) for h, v in vectors.items()],
+        )
+
+def embed_passages(passages: List[str]) -> np.ndarray:
+    """Embeddings for passages, reusing stored vectors and encoding only unseen chunks."""
+    hashes = [chunk_hash(p) for p in passages]
+    found = _store_get(hashes)
+    missing = {h: p for h, p in zip(hashes, passages) if h not in found}
+    metrics.inc("healthbridge_cache_total", len(hashes) - len(missing), "Cache lookups", cache="passage_embedding", result="hit")
+    metrics.inc("healthbridge_cache_total", len(missing), "Cache lookups", cache="passage_embedding", result="miss")
+    if missing:
+        new_embs = embed_texts(list(missing.values()))
+        fresh = dict(zip(missing.keys(), new_embs))
+        _store_put(fresh)
+        found.update(fresh)
+    return np.stack([found[h] for h in hashes]).astype("float32", copy=False)
+
+def stored_passage_vectors(passages: List[str]) -> Dict[str, np.ndarray]:
+    """Stored embeddings for whichever passages have one; read-only, never loads the model or encodes."""
+    hashes = [chunk_hash(p) for p in passages]
+    found = _store_get(hashes)
+    return {p: found[h] for p, h in zip(passages, hashes) if h in found}
+
+# Each build is written to its own version folder; the insurer's manifest.json names the live one,
+# so replacing the manifest swaps index, passages and BM25 together. Indexes saved before
+# versioned builds keep their files directly in the insurer folder (manifest without "version").
+LEGACY_INDEX_FILES = ("faiss.index", "meta.json", "passages.bin", "passages.offsets.npy", "bm25.npz")
+
+def _build_dir(insurer_key: str, manifest: Dict) -> str:
     base = os.path.join(INDEX_DIR, insurer_key)
-    os.makedirs(base, exist_ok=True)
-    return os.path.join(base, "faiss.index"), os.path.join(base, "meta.json")
+    return os.path.join(base, manifest["version"]) if manifest.get("version") else base
 
-def save_index(insurer_key: str, texts: List[str], embeddings: np.ndarray):
-    index_path, meta_path = _index_paths(insurer_key)
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)  # cosine (with normalized embeddings)
+def _index_paths(folder: str) -> Tuple[str, str]:
+    return os.path.join(folder, "faiss.index"), os.path.join(folder, "meta.json")
+
+def _passage_paths(folder: str) -> Tuple[str, str]:
+    return os.path.join(folder, "passages.bin"), os.path.join(folder, "passages.offsets.npy")
+
+def _keyword_path(folder: str) -> str:
+    return os.path.join(folder, "bm25.npz")
+
+def _manifest_path(insurer_key: str) -> str:
+    return os.path.join(INDEX_DIR, insurer_key, "manifest.json")
+
+def _prune_builds(insurer_key: str, keep: Iterable[str]):
+    """Delete builds other than `keep` (version names; "" = the legacy files). Open mmaps stay valid on POSIX."""
+    base = os.path.join(INDEX_DIR, insurer_key)
+    keep = set(keep)
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        if name.startswith("v") and os.path.isdir(path) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    if "" not in keep:
+        for name in LEGACY_INDEX_FILES:
+            try:
+                os.remove(os.path.join(base, name))
+            except OSError:
+                pass
+
+def load_manifest(insurer_key: str) -> Dict:
+    path = _manifest_path(insurer_key)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _source_matches(manifest: Dict, source: Dict) -> bool:
+    return bool(manifest) and manifest.get("embed_model") == EMBED_MODEL_NAME and all(
+        manifest.get(k) == v for k, v in source.items()
+    )
+
+def choose_index_type(n: int) -> str:
+    if INDEX_TYPE != "auto":
+        return INDEX_TYPE
+    # IVF-PQ alone loses too many true neighbours (recall@8 ~0.3 in bench_ann); auto stays exact-vector
+    if n >= INDEX_AUTO_IVF_MIN:
+        return "ivf"
+    if n >= INDEX_AUTO_HNSW_MIN:
+        return "hnsw"
+    return "flat"
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str = None):
+    """
+    Build an inner-product (cosine, on normalized embeddings) index of the given type, training
+    IVF/PQ on a sample when needed. Returns (index, params); params are persisted in the manifest
+    and re-applied at load time.
+    """
+    import faiss
+    n, dim = embeddings.shape
+    index_type = index_type or choose_index_type(n)
+    if index_type not in INDEX_TYPES[1:]:
+        raise ValueError(f"unknown index type {index_type!r}")
+    nlist = int(min(max(4 * np.sqrt(n), 16), max(n // 39, 1)))  # keep >= 39 training points per list
+    pq_m = dim // PQ_SUBVECTOR_DIMS if dim % PQ_SUBVECTOR_DIMS == 0 else 0
+    if index_type == "ivfpq" and (pq_m == 0 or n < 256 * 39):
+        index_type = "ivf"  # too few points to train 8-bit PQ codebooks
+    if index_type == "ivf" and n < 39 * 16:
+        index_type = "flat"
+
+    params = {"index_type": index_type}
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        params.update({"hnsw_m": HNSW_M, "ef_search": HNSW_EF_SEARCH})
+    elif index_type in ("ivf", "ivfpq"):
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+            params["pq_m"] = pq_m
+        sample = embeddings
+        if n > IVF_TRAIN_SAMPLE:
+            sample = embeddings[np.random.default_rng(0).choice(n, IVF_TRAIN_SAMPLE, replace=False)]
+        index.train(sample)
+        params.update({"nlist": nlist, "nprobe": IVF_NPROBE})
+        if index_type == "ivfpq":
+            index = faiss.IndexRefineFlat(index)  # keeps full vectors to re-rank the PQ shortlist
+            params["refine_factor"] = PQ_REFINE_FACTOR
+    else:
+        index = faiss.IndexFlatIP(dim)
     index.add(embeddings)
-    faiss.write_index(index, index_path)
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump({"texts": texts}, f, ensure_ascii=False)
-
-def load_index(insurer_key: str):
-    index_path, meta_path = _index_paths(insurer_key)
-    if not (os.path.exists(index_path) and os.path.exists(meta_path)):
-        return None, None
-    index = faiss.read_index(index_path)
-    with open(meta_path, "r", encoding="utf-8") as f:
-        meta = json.load(f)
-    return index, meta["texts"]
-
-def ensure_index(insurer_key: str, passages: List[str]):
-    index, texts = load_index(insurer_key)
-    if index is not None and texts and len(texts) == len(passages):
-        return index, texts
-    # (Re)build index
-    embeddings = embed_texts(passages)
-    save_index(insurer_key, passages, embeddings)
-    index, texts = load_index(insurer_key)
-    return index, texts
+    apply_search_params(index, params)
+    return index, params
+
+def apply_search_params(index, params: Dict):
+    import faiss
+    if params.get("ef_search") and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(params["ef_search"])
+    if params.get("nprobe"):
+        faiss.extract_index_ivf(index).nprobe = int(params["nprobe"])
+    if params.get("refine_factor") and hasattr(index, "k_factor"):
+        index.k_factor = float(params["refine_factor"])
+
+def save_index(insurer_key: str, texts: List[str], embeddings: np.ndarray, source: Dict = None):
+    import faiss
+    texts = list(texts)
+    dim = embeddings.shape[1]
+    index, index_params = build_faiss_index(embeddings)
+    # Nothing reads the new version folder until the manifest, written last, points at it
+    previous = load_manifest(insurer_key)
+    version = f"v{time.time_ns()}"
+    folder = _build_dir(insurer_key, {"version": version})
+    os.makedirs(folder)
+    faiss.write_index(index, _index_paths(folder)[0])
+    write_passages(*_passage_paths(folder), texts)
+    BM25Index.build(texts).save(_keyword_path(folder))
+    manifest = {
+        **(source or {}),
+        "version": version,
+        "embed_model": EMBED_MODEL_NAME,
+        "dim": int(dim),
+        "count": len(texts),
+        "index": index_params,
+        "chunk_hashes": [chunk_hash(t) for t in texts],
+    }
+    atomic_write_json(_manifest_path(insurer_key), manifest)
+    # The previous build stays for readers that read the old manifest just before the swap
+    _prune_builds(insurer_key, {version, previous.get("version", "")})
+
+def _read_faiss_index(index_path: str):
+    import faiss
+    if INDEX_MMAP:
+        # IFC = zero-copy flat codes (newer faiss); plain MMAP covers IVF lists on older builds
+        for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            flag = getattr(faiss, flag_name, None)
+            if flag is None:
+                continue
+            try:
+                return faiss.read_index(index_path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                continue
+    return faiss.read_index(index_path)
+
+def load_index(insurer_key: str, manifest: Dict = None):
+    """
+    Index, passages and BM25 index of one build: the manifest's (read once, so all three come from
+    the same version). Builds from before keyword search get their BM25 index built from the passages
+    and saved alongside them; this needs no embedding model.
+    """
+    manifest = load_manifest(insurer_key) if manifest is None else manifest
+    folder = _build_dir(insurer_key, manifest)
+    index_path, meta_path = _index_paths(folder)
+    blob_path, offsets_path = _passage_paths(folder)
+    if not os.path.exists(index_path):
+        return None, None, None
+    if os.path.exists(blob_path) and os.path.exists(offsets_path):
+        texts = PassageStore(blob_path, offsets_path)
+    elif os.path.exists(meta_path):
+        # Indexes built before the binary passage store
+        with open(meta_path, "r", encoding="utf-8") as f:
+            texts = json.load(f)["texts"]
+    else:
+        return None, None, None
+    index = _read_faiss_index(index_path)
+    apply_search_params(index, manifest.get("index", {}))
+    keyword_path = _keyword_path(folder)
+    keyword_index = load_cached_bm25(keyword_path)
+    if keyword_index is None:
+        keyword_index = BM25Index.build(list(texts))
+        keyword_index.save(keyword_path)  # atomic: racing loaders write the same file
+    return index, texts, keyword_index
+
+def index_is_current(insurer_key: str, source: Dict) -> bool:
+    manifest = load_manifest(insurer_key)
+    index_path, _ = _index_paths(_build_dir(insurer_key, manifest))
+    return os.path.exists(index_path) and _source_matches(manifest, source)
+
+def load_current_index(insurer_key: str, source: Dict):
+    """
+    Load the index only if its manifest was built from this exact source
+    (PDF sha256 + chunking params) with the current embedding model; else (None, None, None).
+    Lets callers skip parsing and chunking the PDF entirely.
+    """
+    manifest = load_manifest(insurer_key)
+    if not _source_matches(manifest, source):
+        return None, None, None
+    return load_index(insurer_key, manifest)
+
+def ensure_index(insurer_key: str, passages: List[str], source: Dict = None):
+    """
+    Load the insurer's index if it was built from these passages, else build it. Concurrent callers
+    (threads or worker processes) for one insurer build one at a time; those with the same passages
+    and source share a single build, the rest load its result.
+    """
+    digest = hashlib.sha256(json.dumps([passages, source], sort_keys=True).encode("utf-8")).hexdigest()
+    return run_exclusive(f"index-{insurer_key}", _ensure_index, insurer_key, passages, source, share_key=digest)
+
+def _ensure_index(insurer_key: str, passages: List[str], source: Dict = None):
+    manifest = load_manifest(insurer_key)
+    hashes = [chunk_hash(p) for p in passages]
+    if manifest.get("embed_model") == EMBED_MODEL_NAME and manifest.get("chunk_hashes") == hashes:
+        loaded = load_index(insurer_key, manifest)
+        if loaded[0] is not None:
+            if source and not _source_matches(manifest, source):
+                # Same chunks from a re-issued PDF: only the provenance changed
+                manifest.update(source)
+                atomic_write_json(_manifest_path(insurer_key), manifest)
+            return loaded
+    # (Re)build index, encoding only chunks missing from the embedding store
+    embeddings = embed_passages(passages)
+    save_index(insurer_key, passages, embeddings, source)
+    return load_index(insurer_key)
+
+def search_batch(index, texts: List[str], queries: List[str], k: int = 8) -> List[List[Tuple[float, str]]]:
+    """One embedding pass and one matrix search for all queries; results are per query, in order."""
+    if not queries:
+        return []
+    q_emb = embed_queries(queries)  # n x d
+    with metrics.span("search"):
+        scores, ids = index.search(q_emb, k)
+    results = []
+    for row_scores, row_ids in zip(scores, ids):
+        out = []
+        for s, i in zip(row_scores, row_ids):
+            if i == -1: continue
+            out.append((float(s), texts[i]))
+        results.append(out)
+    return results
 
 def search(index, texts: List[str], query: str, k: int = 8) -> List[Tuple[float, str]]:
-    q_emb = embed_texts([query])  # 1 x d
-    scores, ids = index.search(q_emb, k)
-    out = []
-    for s, i in zip(scores[0], ids[0]):
-        if i == -1: continue
-        out.append((float(s), texts[i]))
-    return out
+    return search_batch(index, texts, [query], k=k)[0]
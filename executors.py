@@ -0,0 +1,49 @@
+import os, asyncio, functools, threading, contextvars, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Process pool for CPU-bound OCR/parsing, thread pool for blocking I/O (HTTP, disk, FAISS/torch which release the GIL)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+# "spawn" keeps workers clear of torch/FAISS threads inherited from the server process
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+_lock = threading.Lock()
+_cpu_pool = None
+_io_pool = None
+
+def cpu_pool() -> ProcessPoolExecutor:
+    global _cpu_pool
+    with _lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS,
+                mp_context=multiprocessing.get_context(CPU_POOL_START_METHOD),
+            )
+        return _cpu_pool
+
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="hb-io")
+        return _io_pool
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_pool(), functools.partial(fn, *args, **kwargs))
+
+async def run_io(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context (request trace) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(io_pool(), functools.partial(context.run, fn, *args, **kwargs))
+
+def shutdown():
+    global _cpu_pool, _io_pool
+    with _lock:
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown(wait=False, cancel_futures=True)
+            _cpu_pool = None
+        if _io_pool is not None:
+            _io_pool.shutdown(wait=False, cancel_futures=True)
+            _io_pool = None
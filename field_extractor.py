@@ -39,44 +39,173 @@
 #         return {"error": f"Failed to parse response: {e}", "raw_response": response}
 
 
-import json
+import os, re, json
+from typing import Dict, List, Tuple
 from llm_utils import query_llm  # unchanged import
+import metrics
 
-def extract_structured_fields(ocr_text: str) -> dict:
+FIELDS = {
+    "name": "Patient Name",
+    "age": "Age",
+    "diagnosis": "Diagnosis",
+    "date_of_admission": "Date of Admission",
+    "date_of_discharge": "Date of Discharge",
+    "hospital_name": "Hospital Name",
+    "insurance_company": "Insurance Company Name",
+    "policy_id": "Policy ID",
+    "claimed_amount": "Claimed Amount",
+}
+# Fields that must be confidently found by the rules for the LLM call to be skipped
+REQUIRED_FIELDS = [f.strip() for f in os.getenv("RULES_REQUIRED_FIELDS", ",".join(FIELDS)).split(",") if f.strip()]
+RULES_MIN_CONFIDENCE = float(os.getenv("RULES_MIN_CONFIDENCE", "0.75"))
+WINDOW_CHARS = 300  # context kept either side of a field hint when asking the LLM for missing fields
+
+_DATE = r"(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}|\d{1,2}[\s\-]*(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*[\s\-,]*\d{2,4})"
+_AMOUNT = r"(?:rs\.?|inr|₹)?\s*([0-9][0-9,]*(?:\.\d{1,2})?)"
+
+# field -> [(compiled pattern, confidence)], most specific first; group 1 is the value
+_RULES = {
+    "policy_id": [
+        (re.compile(r"policy\s*(?:no|number|id|#)\.?\s*[:\-]?\s*([A-Z0-9][A-Z0-9/\-]{5,30})", re.I), 0.9),
+        (re.compile(r"(?:member|card|uhid)\s*(?:no|id)\.?\s*[:\-]\s*([A-Z0-9][A-Z0-9/\-]{5,30})", re.I), 0.6),
+    ],
+    "date_of_admission": [
+        (re.compile(r"(?:date\s+of\s+admission|admission\s+date|admitted\s+on|d\.?o\.?a\.?)\s*[:\-]?\s*" + _DATE, re.I), 0.9),
+    ],
+    "date_of_discharge": [
+        (re.compile(r"(?:date\s+of\s+discharge|discharge\s+date|discharged\s+on|d\.?o\.?d\.?)\s*[:\-]?\s*" + _DATE, re.I), 0.9),
+    ],
+    "claimed_amount": [
+        (re.compile(r"(?:amount\s+claimed|claimed\s+amount|claim\s+amount|net\s+payable|grand\s+total|total\s+bill\s+amount)\s*[:\-]?\s*" + _AMOUNT, re.I), 0.9),
+        (re.compile(r"\btotal(?:\s+amount)?\s*[:\-]?\s*" + _AMOUNT, re.I), 0.6),
+    ],
+    "age": [
+        (re.compile(r"\bage\s*(?:/\s*(?:sex|gender))?\s*[:\-]\s*(\d{1,3})\s*(?:y|yrs?|years?)?\b", re.I), 0.9),
+        (re.compile(r"\b(\d{1,3})\s*(?:y|yrs?|years?)\s*/\s*(?:m|f|male|female)\b", re.I), 0.8),
+    ],
+    "name": [
+        (re.compile(r"(?:patient'?s?\s+name|name\s+of\s+(?:the\s+)?patient)\s*[:\-]\s*((?:mr|mrs|ms|master|baby)?\.?\s*[a-z][a-z .]{1,60})", re.I), 0.85),
+    ],
+    "diagnosis": [
+        (re.compile(r"(?:final|primary|provisional)\s+diagnosis\s*[:\-]\s*([^\n]{3,120})", re.I), 0.85),
+        (re.compile(r"\bdiagnosis\s*[:\-]\s*([^\n]{3,120})", re.I), 0.8),
+    ],
+    "insurance_company": [
+        (re.compile(r"(?:insurance\s+company|insurer|insurance\s+co\.?|payer)\s*(?:name)?\s*[:\-]\s*([^\n]{3,80})", re.I), 0.85),
+        (re.compile(r"([A-Z][A-Za-z&. ]{2,60}?\s(?:General\s|Health\s)?Insurance(?:\sCo(?:mpany)?\.?)?(?:\s(?:Ltd|Limited)\.?)?)"), 0.7),
+    ],
+    "hospital_name": [
+        (re.compile(r"hospital\s+name\s*[:\-]\s*([^\n]{3,80})", re.I), 0.9),
+    ],
+}
+_HOSPITAL_WORDS = re.compile(r"\b(hospitals?|nursing\s+homes?|medical\s+cent(?:re|er)s?|clinics?|institutes?|healthcare)\b", re.I)
+_DOC_HEADER = re.compile(r"--- Document: [^\n]* ---\n")
+# Trailing labels that often follow a value on the same OCR line ("Name: John Doe   Age: 45")
+_TRAILING_LABEL = re.compile(r"\s{2,}.*$|\s+(?:age|sex|gender|uhid|ip\s*no|bed|ward|date)\b.*$", re.I)
+
+# Words that point at where a missing field is likely to be, used to cut text windows for the LLM
+_FIELD_HINTS = {
+    "name": r"patient|name",
+    "age": r"\bage\b|years|yrs",
+    "diagnosis": r"diagnos|impression|complaint",
+    "date_of_admission": r"admission|admitted|\bd\.?o\.?a\b",
+    "date_of_discharge": r"discharge|\bd\.?o\.?d\b",
+    "hospital_name": r"hospital|nursing home|clinic",
+    "insurance_company": r"insur|tpa|payer",
+    "policy_id": r"policy|member|card",
+    "claimed_amount": r"total|amount|payable|claim",
+}
+
+def _clean_value(field: str, value: str) -> str:
+    value = value.strip(" \t:-,")
+    if field in ("name", "diagnosis", "insurance_company", "hospital_name"):
+        value = _TRAILING_LABEL.sub("", value).strip(" \t:-,.")
+    if field == "claimed_amount":
+        value = value.replace(",", "")
+    return value
+
+def _letterhead_hospital(ocr_text: str) -> Tuple[str, float]:
+    # Hospital names sit in the first few lines of a bill's letterhead
+    for doc in _DOC_HEADER.split(ocr_text):
+        for line in [l.strip() for l in doc.strip().splitlines()[:6]]:
+            if _HOSPITAL_WORDS.search(line) and 3 <= len(line) <= 80 and not re.search(r"\d{4,}", line):
+                return line, 0.8
+    return "", 0.0
+
+def extract_fields_with_rules(ocr_text: str) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """Regex/heuristic extraction: returns (fields, per-field confidence in [0, 1])."""
+    fields = {f: "" for f in FIELDS}
+    confidence = {f: 0.0 for f in FIELDS}
+    for field, rules in _RULES.items():
+        for pattern, conf in rules:
+            m = pattern.search(ocr_text)
+            if not m:
+                continue
+            value = _clean_value(field, m.group(1))
+            if field == "age" and not (0 < int(value) < 120):
+                continue
+            if value:
+                fields[field], confidence[field] = value, conf
+                break
+    if not fields["hospital_name"]:
+        fields["hospital_name"], confidence["hospital_name"] = _letterhead_hospital(ocr_text)
+    return fields, confidence
+
+def _relevant_windows(ocr_text: str, missing: List[str]) -> str:
+    spans = [(0, min(len(ocr_text), 600))]  # document header / letterhead
+    for field in missing:
+        for m in re.finditer(_FIELD_HINTS[field], ocr_text, re.I):
+            spans.append((max(0, m.start() - WINDOW_CHARS), min(len(ocr_text), m.end() + WINDOW_CHARS)))
+    spans.sort()
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return "\n...\n".join(ocr_text[start:end] for start, end in merged)
+
+async def extract_structured_fields(ocr_text: str) -> dict:
+    """
+    Rules first; the LLM is only asked for fields the rules could not find confidently,
+    over the text windows around those fields. Skipped entirely when every required field is confident.
+    """
+    with metrics.span("fields"):
+        return await _extract_structured_fields(ocr_text)
+
+async def _extract_structured_fields(ocr_text: str) -> dict:
+    fields, confidence = extract_fields_with_rules(ocr_text)
+    if all(confidence.get(f, 0.0) >= RULES_MIN_CONFIDENCE for f in REQUIRED_FIELDS):
+        metrics.inc("healthbridge_field_extraction_total", help="Field extractions by method", method="rules")
+        return fields
+    metrics.inc("healthbridge_field_extraction_total", help="Field extractions by method", method="llm")
+
+    missing = [f for f in FIELDS if confidence[f] < RULES_MIN_CONFIDENCE]
+    field_list = "\n".join(f"- {FIELDS[f]}" for f in missing)
+    schema = json.dumps({f: "" for f in missing}, indent=2)
     prompt = f"""
 You are an expert in reading medical documents for insurance claims.
 
 Extract the following fields from the document:
-- Patient Name
-- Age
-- Diagnosis
-- Date of Admission
-- Date of Discharge
-- Hospital Name
-- Insurance Company Name
-- Policy ID
-- Claimed Amount
+{field_list}
 
-Here is the document text:
-\"\"\"{ocr_text}\"\"\"
+Here are the relevant parts of the document text:
+\"\"\"{_relevant_windows(ocr_text, missing)}\"\"\"
 
 
 Return ONLY valid JSON in this exact format (no extra text):
-{{
-  "name": "",
-  "age": "",
-  "diagnosis": "",
-  "date_of_admission": "",
-  "date_of_discharge": "",
-  "hospital_name": "",
-  "insurance_company": "",
-  "policy_id": "",
-  "claimed_amount": ""
-}}
+{schema}
 """.strip()
 
-    response = query_llm(prompt)
+    response = await query_llm(prompt)
     try:
-        return json.loads(response)
+        extracted = json.loads(response)
     except Exception as e:
-        return {"error": f"Failed to parse JSON: {e}", "raw_response": response}
+        return {**fields, "error": f"Failed to parse JSON: {e}", "raw_response": response}
+    if not isinstance(extracted, dict):  # e.g. a bare list or string: keep the rules-based fields
+        return {**fields, "error": "LLM response is not a JSON object", "raw_response": response}
+    for f in missing:
+        value = extracted.get(f)
+        if value not in (None, ""):
+            fields[f] = value
+    return fields
@@ -0,0 +1,33 @@
+import os, json, tempfile
+from contextlib import contextmanager
+
+@contextmanager
+def atomic_path(path: str):
+    """
+    Yield a temp path in the target's directory; it replaces `path` only if the block succeeds,
+    so readers see either the old file or the complete new one, never a partial write.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def atomic_write_bytes(path: str, data: bytes):
+    with atomic_path(path) as tmp:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+def atomic_write_json(path: str, data, **json_kwargs):
+    with atomic_path(path) as tmp:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, **json_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,131 @@
+"""
+Offline policy ingestion: pre-build the FAISS index for every insurer under DATA_DIR/policies
+so the request path (especially with SERVE_ONLY=1) never parses, chunks or embeds.
+
+    python ingest_cli.py                  # all insurers, skipping ones whose index is current
+    python ingest_cli.py --force          # rebuild everything
+    python ingest_cli.py star-health-and-allied-insurance-co-ltd --workers 4
+    python ingest_cli.py --unified        # into the multi-tenant store (VECTOR_STORE=unified)
+
+PDFs under DATA_DIR/policies/standard/ are the shared standard clauses (IRDAI) in the unified store.
+
+Resumable: an insurer whose manifest already matches its PDF is skipped, so re-running after
+an interruption only does the remaining work.
+"""
+import os, sys, time, argparse, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from policy_search import CACHE_DIR, local_policy_pdf_for_key, migrate_legacy_folders
+from policy_ingest import policy_passages, policy_source
+
+def discover_policies(keys: List[str] = None) -> List[Tuple[str, str]]:
+    """(insurer_key, pdf_path) for every insurer folder that has a PDF (manual.pdf preferred)."""
+    if keys is None:
+        keys = sorted(d for d in os.listdir(CACHE_DIR) if os.path.isdir(os.path.join(CACHE_DIR, d)))
+    found = []
+    for key in keys:
+        pdf_path = local_policy_pdf_for_key(key)
+        if pdf_path:
+            found.append((key, pdf_path))
+    return found
+
+def parse_policy(insurer_key: str, pdf_path: str) -> Tuple[str, Dict, List[str]]:
+    # Runs in a worker process: PDF parsing + chunking only, no model
+    source = policy_source(pdf_path)
+    passages = policy_passages(pdf_path)
+    return insurer_key, source, passages
+
+def _flush(pending: List[Tuple[str, Dict, List[str]]], progress, unified: bool = False) -> int:
+    # Deferred import: worker processes never load faiss / the embedding model
+    from embeddings_faiss import embed_passages, ensure_index
+    import vector_store
+    all_passages = [p for _, _, passages in pending for p in passages]
+    if all_passages:
+        embed_passages(all_passages)  # one large batch; later calls find every chunk in the store
+    built, unified_items = 0, []
+    for insurer_key, source, passages in pending:
+        if passages:
+            if unified:
+                doc_type = "standard" if insurer_key == vector_store.STANDARD_TENANT else "policy"
+                unified_items.append((insurer_key, passages, embed_passages(passages), doc_type, source))
+            else:
+                ensure_index(insurer_key, passages, source)
+            built += 1
+            progress(insurer_key, f"indexed {len(passages)} chunks")
+        else:
+            progress(insurer_key, "no text extracted")
+    # One rewrite of the unified index for the whole batch
+    vector_store.upsert_many(unified_items)
+    pending.clear()
+    return built
+
+def ingest(keys: List[str] = None, workers: int = None, batch_chunks: int = 4096, force: bool = False,
+           unified: bool = False) -> Dict[str, int]:
+    from embeddings_faiss import index_is_current
+    import vector_store
+
+    def is_current(insurer_key: str, source: Dict) -> bool:
+        if unified:
+            doc_type = "standard" if insurer_key == vector_store.STANDARD_TENANT else "policy"
+            return vector_store.is_current(insurer_key, source, doc_type)
+        return index_is_current(insurer_key, source)
+
+    migrate_legacy_folders()
+    policies = discover_policies(keys)
+    total, done, started = len(policies), 0, time.time()
+    stats = {"total": total, "skipped": 0, "built": 0, "empty": 0, "failed": 0}
+
+    def progress(insurer_key: str, status: str):
+        nonlocal done
+        done += 1
+        print(f"[{done}/{total}] {insurer_key}: {status} ({time.time() - started:.1f}s)", flush=True)
+
+    todo = []
+    for insurer_key, pdf_path in policies:
+        if not force and is_current(insurer_key, policy_source(pdf_path)):
+            stats["skipped"] += 1
+            progress(insurer_key, "up to date")
+        else:
+            todo.append((insurer_key, pdf_path))
+    if not todo:
+        return stats
+
+    pending, pending_chunks = [], 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 2, mp_context=ctx) as pool:
+        futures = {pool.submit(parse_policy, key, path): key for key, path in todo}
+        for future in as_completed(futures):
+            try:
+                item = future.result()
+            except Exception as err:
+                stats["failed"] += 1
+                progress(futures[future], f"failed to parse: {err}")
+                continue
+            pending.append(item)
+            pending_chunks += len(item[2])
+            if not item[2]:
+                stats["empty"] += 1
+            if pending_chunks >= batch_chunks:
+                stats["built"] += _flush(pending, progress, unified)
+                pending_chunks = 0
+        stats["built"] += _flush(pending, progress, unified)
+    return stats
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-build policy indexes for all cached insurers.")
+    parser.add_argument("insurers", nargs="*", help="insurer keys (folder names under DATA_DIR/policies); default: all")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--batch-chunks", type=int, default=4096, help="chunks to accumulate per embedding batch")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the index is current")
+    parser.add_argument("--unified", action="store_true", default=os.getenv("VECTOR_STORE") == "unified",
+                        help="write to the multi-tenant store instead of per-insurer indexes")
+    args = parser.parse_args(argv)
+
+    stats = ingest(args.insurers or None, args.workers, args.batch_chunks, args.force, args.unified)
+    print(f"done: {stats['built']} built, {stats['skipped']} up to date, {stats['empty']} empty, "
+          f"{stats['failed']} failed of {stats['total']}")
+    return 1 if stats["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os, re, json, threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+# Resolves free-form insurer names ("STAR HEALTH", "Star Health & Allied Insurance Co. Ltd")
+# to one canonical key, so every spelling shares one policy cache folder and one index.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+# Optional extra insurers: {"canonical-key": ["Display Name", "alias", ...]}
+INSURER_ALIASES_FILE = os.getenv("INSURER_ALIASES_FILE", os.path.join(DATA_DIR, "insurers.json"))
+INSURER_MATCH_THRESHOLD = float(os.getenv("INSURER_MATCH_THRESHOLD", "0.85"))  # trigram Jaccard similarity
+
+KNOWN_INSURERS: Dict[str, List[str]] = {
+    "star-health-and-allied-insurance-co-ltd": ["Star Health and Allied Insurance", "Star Health", "Star Health Insurance"],
+    "care-health-insurance-ltd": ["Care Health Insurance", "Care Health", "Religare Health Insurance", "Religare"],
+    "niva-bupa-health-insurance-co-ltd": ["Niva Bupa Health Insurance", "Niva Bupa", "Max Bupa Health Insurance", "Max Bupa"],
+    "aditya-birla-health-insurance-co-ltd": ["Aditya Birla Health Insurance", "Aditya Birla Health", "ABHI"],
+    "manipalcigna-health-insurance-co-ltd": ["ManipalCigna Health Insurance", "Manipal Cigna", "CignaTTK"],
+    "hdfc-ergo-general-insurance-co-ltd": ["HDFC ERGO General Insurance", "HDFC ERGO", "HDFC ERGO Health", "Apollo Munich"],
+    "icici-lombard-general-insurance-co-ltd": ["ICICI Lombard General Insurance", "ICICI Lombard"],
+    "bajaj-allianz-general-insurance-co-ltd": ["Bajaj Allianz General Insurance", "Bajaj Allianz", "Bajaj General Insurance"],
+    "the-new-india-assurance-co-ltd": ["The New India Assurance", "New India Assurance", "NIACL"],
+    "united-india-insurance-co-ltd": ["United India Insurance", "UIIC"],
+    "national-insurance-co-ltd": ["National Insurance Company", "National Insurance", "NICL"],
+    "the-oriental-insurance-co-ltd": ["The Oriental Insurance", "Oriental Insurance", "OICL"],
+    "tata-aig-general-insurance-co-ltd": ["Tata AIG General Insurance", "Tata AIG"],
+    "sbi-general-insurance-co-ltd": ["SBI General Insurance", "SBI General", "SBI Health Insurance"],
+    "reliance-general-insurance-co-ltd": ["Reliance General Insurance", "Reliance General", "Reliance Health"],
+    "future-generali-india-insurance-co-ltd": ["Future Generali India Insurance", "Future Generali"],
+    "iffco-tokio-general-insurance-co-ltd": ["IFFCO Tokio General Insurance", "IFFCO Tokio"],
+    "cholamandalam-ms-general-insurance-co-ltd": ["Cholamandalam MS General Insurance", "Chola MS", "Cholamandalam"],
+    "royal-sundaram-general-insurance-co-ltd": ["Royal Sundaram General Insurance", "Royal Sundaram"],
+    "universal-sompo-general-insurance-co-ltd": ["Universal Sompo General Insurance", "Universal Sompo"],
+    "liberty-general-insurance-ltd": ["Liberty General Insurance", "Liberty Videocon"],
+    "zurich-kotak-general-insurance-co-ltd": ["Zurich Kotak General Insurance", "Kotak Mahindra General Insurance", "Kotak General"],
+    "go-digit-general-insurance-ltd": ["Go Digit General Insurance", "Digit Insurance", "Go Digit"],
+    "acko-general-insurance-ltd": ["Acko General Insurance", "Acko"],
+    "navi-general-insurance-ltd": ["Navi General Insurance", "Navi"],
+    "magma-general-insurance-ltd": ["Magma General Insurance", "Magma HDI"],
+    "raheja-qbe-general-insurance-co-ltd": ["Raheja QBE General Insurance", "Raheja QBE"],
+    "shriram-general-insurance-co-ltd": ["Shriram General Insurance", "Shriram"],
+    "galaxy-health-insurance-co-ltd": ["Galaxy Health Insurance", "Galaxy Health"],
+    "narayana-health-insurance-ltd": ["Narayana Health Insurance", "Narayana Health"],
+}
+
+# Corporate boilerplate that varies between spellings of the same insurer. Words that tell insurers
+# apart ("health", "general", "life", "india", "assurance") are kept.
+_NOISE_WORDS = {"the", "co", "company", "ltd", "limited", "pvt", "private", "insurance", "ins", "insurer", "corp",
+                "corporation", "of", "and"}
+# Words allowed around a known alias inside a longer name ("Star Health Mediclaim Policy")
+_QUALIFIER_WORDS = {"policy", "plan", "scheme", "mediclaim", "formerly", "previously", "erstwhile",
+                    "gen", "general", "health", "india"}
+# One-word aliases too common to identify an insurer inside a longer name; they still match exactly
+_GENERIC_ALIASES = {"care", "star", "united", "national", "navi", "bajaj", "kotak", "new", "universal", "royal",
+                    "future", "liberty", "digit", "reliance", "tata", "magma", "galaxy", "oriental", "shriram"}
+
+def slugify(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (name or "unknown").strip().lower())
+
+def normalize(name: str) -> str:
+    words = re.sub(r"[^a-z0-9]+", " ", (name or "").lower().replace("&", " and ")).split()
+    return " ".join(w for w in words if w not in _NOISE_WORDS)  # "" for a generic name like "Health Insurance"
+
+def _trigrams(text: str) -> Set[str]:
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+_lock = threading.Lock()
+_index = {"exact": None, "grams": None}
+
+def _load_extra() -> Dict[str, List[str]]:
+    if not os.path.exists(INSURER_ALIASES_FILE):
+        return {}
+    try:
+        with open(INSURER_ALIASES_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as err:
+        print(f"Insurer alias file error: {err}")
+        return {}
+
+def _build() -> Tuple[Dict[str, str], List[Tuple[Set[str], str]]]:
+    exact: Dict[str, str] = {}
+    for key, names in {**KNOWN_INSURERS, **_load_extra()}.items():
+        for name in [key.replace("-", " "), *names]:
+            exact.setdefault(normalize(name), key)
+    grams = [(_trigrams(alias), key) for alias, key in exact.items()]
+    return exact, grams
+
+def _aliases():
+    with _lock:
+        if _index["exact"] is None:
+            _index["exact"], _index["grams"] = _build()
+        return _index["exact"], _index["grams"]
+
+def reload():
+    """Rebuild the alias index (after editing INSURER_ALIASES_FILE)."""
+    with _lock:
+        _index["exact"] = _index["grams"] = None
+    canonical_insurer.cache_clear()
+
+@lru_cache(maxsize=4096)
+def canonical_insurer(name: str) -> Optional[str]:
+    """Canonical key of a known insurer matching `name`, or None if nothing is close enough."""
+    exact, grams = _aliases()
+    norm = normalize(name)
+    if not norm:
+        return None
+    if norm in exact:
+        return exact[norm]
+    # Aliases of one insurer appearing as whole phrases, with only qualifier words left over
+    # ("Care Health Insurance (formerly Religare)", "ICICI Lombard Gen Ins"); anything else is a different company
+    padded = f" {norm} "
+    by_key: Dict[str, Set[str]] = {}
+    for alias, key in exact.items():
+        if alias in _GENERIC_ALIASES or f" {alias} " not in padded:
+            continue
+        by_key.setdefault(key, set()).update(alias.split())
+    candidates = [key for key, covered in by_key.items() if set(norm.split()) - covered <= _QUALIFIER_WORDS]
+    if len(candidates) == 1:
+        return candidates[0]
+    # Misspellings ("Bajaj Alianz"); only very close names, unknown ones fall through to a slug
+    target = _trigrams(norm)
+    best_score, best_key = 0.0, None
+    for alias_grams, key in grams:
+        score = len(target & alias_grams) / len(target | alias_grams)
+        if score > best_score:
+            best_score, best_key = score, key
+    return best_key if best_score >= INSURER_MATCH_THRESHOLD else None
+
+def insurer_key(name: str) -> str:
+    """Cache/index key for an insurer name: its canonical key if known, else a slug of the name."""
+    return canonical_insurer(name or "") or slugify(name)
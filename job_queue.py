@@ -0,0 +1,155 @@
+import os, json, time, uuid, sqlite3, threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Durable claim queue for /claims/batch: jobs and their uploaded files live in SQLite,
+# so queued (and interrupted) work survives a restart.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(DATA_DIR, "jobs.sqlite"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job whose worker has not touched it for this long is presumed dead and queued again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_local = threading.local()
+
+def _create_schema(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, batch_id TEXT, position INTEGER, claim_id TEXT, "
+        "status TEXT, attempts INTEGER DEFAULT 0, result TEXT, error TEXT, created REAL, updated REAL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, position)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS job_files (job_id TEXT, position INTEGER, filename TEXT, content BLOB, "
+        "PRIMARY KEY (job_id, position))"
+    )
+
+def _conn() -> sqlite3.Connection:
+    # One connection per thread, reused; transactions are explicit (see _transaction)
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != JOB_QUEUE_PATH:
+        conn = sqlite3.connect(JOB_QUEUE_PATH, timeout=30, isolation_level=None)
+        with _schema_lock:
+            if JOB_QUEUE_PATH not in _schema_ready:
+                _create_schema(conn)
+                _schema_ready.add(JOB_QUEUE_PATH)
+        _local.conn, _local.path = conn, JOB_QUEUE_PATH
+    return conn
+
+@contextmanager
+def _transaction():
+    # BEGIN IMMEDIATE takes SQLite's write lock up front, so read-then-write is atomic across processes
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def submit_batch(claims: List[Tuple[str, List[Tuple[str, bytes]]]]) -> str:
+    """Queue (claim_id, [(filename, bytes)]) claims as one batch; returns the batch id."""
+    batch_id, now = uuid.uuid4().hex, time.time()
+    with _transaction() as conn:
+        for position, (claim_id, files) in enumerate(claims):
+            job_id = f"{batch_id}-{position}"
+            conn.execute(
+                "INSERT INTO jobs (id, batch_id, position, claim_id, status, created, updated) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, batch_id, position, claim_id, now, now),
+            )
+            conn.executemany(
+                "INSERT INTO job_files (job_id, position, filename, content) VALUES (?, ?, ?, ?)",
+                [(job_id, i, name, sqlite3.Binary(content)) for i, (name, content) in enumerate(files)],
+            )
+    return batch_id
+
+def claim_jobs(limit: int) -> List[Dict]:
+    """Atomically move up to `limit` of the oldest queued jobs to running; returns them with their files."""
+    now = time.time()
+    with _transaction() as conn:
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created, position LIMIT ?", (limit,)
+        )]
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        conn.execute(f"UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? WHERE id IN ({marks})",
+                     [now, *ids])
+        jobs = {job_id: {"id": job_id, "files": []} for job_id in ids}
+        for job_id, claim_id, attempts in conn.execute(
+            f"SELECT id, claim_id, attempts FROM jobs WHERE id IN ({marks})", ids
+        ):
+            jobs[job_id].update(claim_id=claim_id, attempts=attempts)
+        for job_id, filename, content in conn.execute(
+            f"SELECT job_id, filename, content FROM job_files WHERE job_id IN ({marks}) ORDER BY job_id, position", ids
+        ):
+            jobs[job_id]["files"].append((filename, bytes(content)))
+    return [jobs[job_id] for job_id in ids]
+
+def complete(job_id: str, result: Dict):
+    with _transaction() as conn:
+        conn.execute("UPDATE jobs SET status = 'done', result = ?, error = NULL, updated = ? WHERE id = ?",
+                     (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id))
+        conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+
+def fail(job_id: str, error: str):
+    """Record a failure of a running job; it is queued again until it has used JOB_MAX_ATTEMPTS."""
+    with _transaction() as conn:
+        row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND status = 'running'", (job_id,)).fetchone()
+        if row is None:
+            return  # already finished (or requeued by another worker)
+        final = row[0] >= JOB_MAX_ATTEMPTS
+        conn.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                     ("failed" if final else "queued", error, time.time(), job_id))
+        if final:
+            conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+
+def heartbeat(job_ids: List[str]):
+    """Renew the lease on running jobs this worker is still processing."""
+    if not job_ids:
+        return
+    marks = ",".join("?" * len(job_ids))
+    with _transaction() as conn:
+        conn.execute(f"UPDATE jobs SET updated = ? WHERE status = 'running' AND id IN ({marks})",
+                     [time.time(), *job_ids])
+
+def requeue_stale(lease: float = None) -> int:
+    """Running jobs whose lease expired (their worker died) go back on the queue."""
+    now = time.time()
+    cutoff = now - (JOB_LEASE_SECONDS if lease is None else lease)
+    with _transaction() as conn:
+        return conn.execute("UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running' AND updated < ?",
+                            (now, cutoff)).rowcount
+
+def batch_status(batch_id: str) -> Optional[Dict]:
+    rows = _conn().execute(
+        "SELECT claim_id, status, attempts, error FROM jobs WHERE batch_id = ? ORDER BY position", (batch_id,)
+    ).fetchall()
+    if not rows:
+        return None
+    counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    for _, status, _, _ in rows:
+        counts[status] += 1
+    return {
+        "batch_id": batch_id,
+        "total": len(rows),
+        "complete": counts["queued"] + counts["running"] == 0,
+        "counts": counts,
+        "claims": [{"claim_id": c, "status": s, "attempts": a, "error": e} for c, s, a, e in rows],
+    }
+
+def batch_results(batch_id: str) -> Optional[List[Dict]]:
+    rows = _conn().execute(
+        "SELECT claim_id, status, result, error FROM jobs WHERE batch_id = ? ORDER BY position", (batch_id,)
+    ).fetchall()
+    if not rows:
+        return None
+    return [{"claim_id": c, "status": s, "result": json.loads(r) if r else None, "error": e} for c, s, r, e in rows]
+
+def queue_stats() -> Dict:
+    return dict(_conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
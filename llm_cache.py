@@ -0,0 +1,103 @@
+import os, json, time, hashlib, sqlite3, threading
+from typing import Dict, Optional
+
+# Content-addressed cache of deterministic (temperature 0) LLM responses
+DATA_DIR = os.getenv("DATA_DIR", "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.sqlite"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_ACCESS_FLUSH = float(os.getenv("LLM_CACHE_ACCESS_FLUSH", "30"))  # seconds between batched LRU access-time writes
+
+_lock = threading.Lock()  # stats and pending access times (memory only)
+_write_lock = threading.Lock()  # one writer per process; reads never take it
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_local = threading.local()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+# Hits record their access time here; it reaches the table at most every LLM_CACHE_ACCESS_FLUSH
+# seconds (or before a put evicts), so a cache hit is a plain read
+_pending_access: Dict[str, float] = {}
+_next_flush = 0.0
+
+def _conn() -> sqlite3.Connection:
+    # One connection per thread, reused; the schema is created once per cache file
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != LLM_CACHE_PATH:
+        conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30)
+        with _schema_lock:
+            if LLM_CACHE_PATH not in _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT, created REAL, accessed REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+                conn.commit()
+                _schema_ready.add(LLM_CACHE_PATH)
+        _local.conn, _local.path = conn, LLM_CACHE_PATH
+    return conn
+
+def _flush_access():
+    global _next_flush
+    with _lock:
+        pending = list(_pending_access.items())
+        _pending_access.clear()
+        _next_flush = time.time() + LLM_CACHE_ACCESS_FLUSH
+    if pending:
+        with _write_lock, _conn() as conn:
+            conn.executemany("UPDATE llm_cache SET accessed = ? WHERE key = ?", [(t, k) for k, t in pending])
+
+def cache_key(payload: Dict) -> str:
+    """Hash of model, messages (system + user prompt) and sampling parameters."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def get(key: str) -> Optional[str]:
+    now = time.time()
+    row = _conn().execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    if row is not None and now - row[1] > LLM_CACHE_TTL:
+        with _write_lock, _conn() as conn:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        with _lock:
+            _stats["expired"] += 1
+        row = None
+    with _lock:
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+        _pending_access[key] = now
+        flush_due = now >= _next_flush
+    if flush_due:
+        _flush_access()
+    return row[0]
+
+def put(key: str, response: str):
+    now = time.time()
+    _flush_access()  # so eviction below sees recent hits
+    with _write_lock, _conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - LLM_CACHE_MAX_ENTRIES
+        if excess > 0:
+            # Least recently used first
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+    with _lock:
+        _stats["writes"] += 1
+        _stats["evictions"] += max(excess, 0)
+
+def clear():
+    with _lock:
+        _pending_access.clear()
+    with _write_lock, _conn() as conn:
+        conn.execute("DELETE FROM llm_cache")
+
+def cache_stats() -> Dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_rate": (_stats["hits"] / lookups) if lookups else 0.0}
@@ -39,40 +39,228 @@
 #         return "LLM API failed due to an unexpected error."
 
 
-import os
-import requests
+import os, json, random, asyncio, time
+import httpx
 from dotenv import load_dotenv
+import llm_cache
+import metrics
+from executors import run_io
 
 load_dotenv()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = "llama-3.3-70b-versatile"
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Overridable so the client can be pointed at a local stub server
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 
-if not GROQ_API_KEY:
-    raise EnvironmentError("GROQ_API_KEY not found in environment. Please check your .env file.")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # in-flight requests per model
+LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", "0"))  # request starts per second per model; 0 = unlimited
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-def query_llm(prompt: str):
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
+SYSTEM_PROMPT = "You are a careful insurance claim adjudicator. Always return strict JSON when asked."
+FALLBACK_RESPONSE = '{"status":"query","approved_amount":null,"covered_items":[],"excluded_items":[],"reasoning":"LLM API failed; manual review."}'
+
+# httpx clients, semaphores and futures are bound to an event loop, so keep one set per loop
+_loop_states = {}
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        client = httpx.AsyncClient(
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+        )
+        state = {"client": client, "semaphores": {}, "next_start": {}, "inflight": {}}
+        _loop_states[loop] = state
+    return state
+
+async def close_llm_client():
+    state = _loop_states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state["client"].aclose()
+
+async def _throttle(state, model: str):
+    if LLM_RATE_PER_SEC <= 0:
+        return
+    now = time.monotonic()
+    start = max(now, state["next_start"].get(model, now))
+    state["next_start"][model] = start + 1.0 / LLM_RATE_PER_SEC
+    if start > now:
+        await asyncio.sleep(start - now)
+
+def _count_retry(response, error):
+    reason = str(response.status_code) if response is not None else type(error).__name__
+    metrics.inc("healthbridge_llm_retries_total", help="LLM request retries", reason=reason)
+
+def _backoff_delay(attempt: int, response) -> float:
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    # Full jitter
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+def _headers() -> dict:
+    # Read per call (not at import) so a missing key fails the LLM step, not app startup
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise EnvironmentError("GROQ_API_KEY not found in environment. Please check your .env file.")
+    return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+def _semaphore(state, model: str) -> asyncio.Semaphore:
+    return state["semaphores"].setdefault(model, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+
+async def _post_with_retries(payload: dict) -> dict:
+    state = _loop_state()
+    model = payload["model"]
+    semaphore = _semaphore(state, model)
+    headers = _headers()
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response, error = None, None
+        async with semaphore:
+            await _throttle(state, model)
+            try:
+                response = await state["client"].post(GROQ_API_URL, headers=headers, json=payload)
+            except httpx.TransportError as err:
+                error = err
+        if response is not None:
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response.json()
+            error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+        if attempt == LLM_MAX_RETRIES:
+            raise error
+        _count_retry(response, error)
+        await asyncio.sleep(_backoff_delay(attempt, response))
 
-    payload = {
+async def _stream_with_retries(payload: dict):
+    """Yield content deltas from a streamed completion; retries only until the first delta arrives."""
+    state = _loop_state()
+    model = payload["model"]
+    semaphore = _semaphore(state, model)
+    emitted = False
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response, error = None, None
+        async with semaphore:
+            await _throttle(state, model)
+            try:
+                async with state["client"].stream("POST", GROQ_API_URL, headers=_headers(), json=payload) as response:
+                    if response.status_code in RETRY_STATUSES:
+                        error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+                    else:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                            if delta:
+                                emitted = True
+                                yield delta
+                        return
+            except httpx.TransportError as err:
+                if emitted:
+                    raise
+                error = err
+        if attempt == LLM_MAX_RETRIES:
+            raise error
+        _count_retry(response, error)
+        await asyncio.sleep(_backoff_delay(attempt, response))
+
+async def _complete(payload: dict, cache_key: str = None) -> str:
+    data = await _post_with_retries(payload)
+    content = data["choices"][0]["message"]["content"]
+    usage = data.get("usage") or {}
+    for kind in ("prompt", "completion"):
+        if usage.get(f"{kind}_tokens"):
+            metrics.inc("healthbridge_llm_tokens_total", usage[f"{kind}_tokens"], "LLM tokens reported by the API", kind=kind)
+    if cache_key:
+        await run_io(llm_cache.put, cache_key, content)
+    return content
+
+def _build_payload(prompt: str, system: str, temperature: float, max_tokens: int) -> dict:
+    return {
         "model": GROQ_MODEL,
         "messages": [
-            {"role": "system", "content": "You are a careful insurance claim adjudicator. Always return strict JSON when asked."},
+            {"role": "system", "content": system},
             {"role": "user", "content": prompt},
         ],
-        "temperature": 0.0,
-        "max_tokens": 1200
+        "temperature": temperature,
+        "max_tokens": max_tokens
     }
 
+async def query_llm(prompt: str, system: str = SYSTEM_PROMPT, temperature: float = 0.0, max_tokens: int = 1200,
+                    use_cache: bool = True):
+    payload = _build_payload(prompt, system, temperature, max_tokens)
+
+    key = llm_cache.cache_key(payload)
+    # Only deterministic calls are cached; use_cache=False bypasses lookup and store
+    cacheable = use_cache and llm_cache.LLM_CACHE_ENABLED and temperature == 0.0
+    if cacheable:
+        cached = await run_io(llm_cache.get, key)
+        if cached is not None:
+            metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="llm", result="hit")
+            return cached
+        metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="llm", result="miss")
+
+    # Coalesce identical in-flight requests into one upstream call
+    state = _loop_state()
+    future = state["inflight"].get(key)
+    if future is None:
+        future = asyncio.ensure_future(_complete(payload, key if cacheable else None))
+        state["inflight"][key] = future
+        future.add_done_callback(lambda _: state["inflight"].pop(key, None))
+
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        raise
+    except Exception as err:
+        print(f"LLM error: {err}")
+        metrics.inc("healthbridge_llm_errors_total", help="LLM calls answered with the fallback response")
+        return FALLBACK_RESPONSE
+
+async def stream_llm(prompt: str, system: str = SYSTEM_PROMPT, temperature: float = 0.0, max_tokens: int = 1200,
+                     use_cache: bool = True):
+    """
+    Async generator of response text as it is produced. Shares cache entries with query_llm;
+    on failure before any output, yields FALLBACK_RESPONSE as a single chunk. A failure after
+    partial output is re-raised, so the caller never mistakes a truncated response for a whole one.
+    """
+    payload = _build_payload(prompt, system, temperature, max_tokens)
+    key = llm_cache.cache_key(payload)
+    cacheable = use_cache and llm_cache.LLM_CACHE_ENABLED and temperature == 0.0
+    if cacheable:
+        cached = await run_io(llm_cache.get, key)
+        if cached is not None:
+            metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="llm", result="hit")
+            yield cached
+            return
+        metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="llm", result="miss")
 
+    parts = []
+    try:
+        async for delta in _stream_with_retries({**payload, "stream": True}):
+            parts.append(delta)
+            yield delta
     except Exception as err:
         print(f"LLM error: {err}")
-        return '{"status":"query","approved_amount":null,"covered_items":[],"excluded_items":[],"reasoning":"LLM API failed; manual review."}'
+        metrics.inc("healthbridge_llm_errors_total", help="LLM calls answered with the fallback response")
+        if parts:
+            raise
+        yield FALLBACK_RESPONSE
+        return
+
+    if cacheable and parts:
+        await run_io(llm_cache.put, key, "".join(parts))
@@ -0,0 +1,79 @@
+import os, re, threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks below are per-process only
+    fcntl = None
+
+# Coordination for work that must happen once per key (policy download, index build), both
+# between threads of this process and between uvicorn worker processes sharing DATA_DIR.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+LOCK_DIR = os.path.join(DATA_DIR, "locks")
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock(name: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(name, threading.Lock())
+
+@contextmanager
+def file_lock(name: str):
+    """Exclusive lock on DATA_DIR/locks/<name>.lock, held across threads and processes."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    path = os.path.join(LOCK_DIR, re.sub(r"[^A-Za-z0-9._-]+", "_", name) + ".lock")
+    with _thread_lock(name), open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_flights = {}
+_flights_guard = threading.Lock()
+
+def single_flight(key, fn, *args, **kwargs):
+    """
+    Run fn once for concurrent callers with the same key: the first caller runs it,
+    the others wait and get its result (or its exception).
+    """
+    with _flights_guard:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = fn(*args, **kwargs)
+        return flight.result
+    except BaseException as err:
+        flight.error = err
+        raise
+    finally:
+        with _flights_guard:
+            _flights.pop(key, None)
+        flight.done.set()
+
+def run_exclusive(name: str, fn, *args, share_key=None, **kwargs):
+    """
+    single_flight within this process, plus file_lock(name) across processes. Only callers passing
+    the same share_key (e.g. a hash of their inputs) share one result; others with the same name
+    run fn themselves, one at a time.
+    """
+    def locked():
+        with file_lock(name):
+            return fn(*args, **kwargs)
+    return single_flight((name, share_key), locked)
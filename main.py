@@ -39,16 +39,50 @@
 #     }
 
 
-from fastapi import FastAPI, UploadFile, File
+import asyncio, json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Tuple
 
-from ocr_utils import extract_text_from_file
-from llm_utils import query_llm
-from rag_utils import build_prompt, retrieve_policy_clauses
+from ocr_utils import extract_document
+from llm_utils import query_llm, stream_llm, close_llm_client
+from rag_utils import build_prompt_with_usage, retrieve_scored_policy_clauses, retrieval_queries
 from field_extractor import extract_structured_fields
+from executors import run_io, shutdown as shutdown_executors
+import warmup
+import metrics
+import corpus_cache
+import llm_cache
+import job_queue
+import batch_worker
+import policy_search
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Caches written before canonical insurer keys move under them, before warmup looks them up
+    await run_io(policy_search.migrate_legacy_folders)
+    # Load the embedding model, pre-embed the fixed retrieval queries and map hot indexes (WARMUP_MODE)
+    background = None
+    if warmup.WARMUP_MODE == "eager":
+        await run_io(warmup.warm_up)
+    elif warmup.WARMUP_MODE == "background":
+        background = asyncio.ensure_future(run_io(warmup.warm_up))
+    else:
+        warmup.mark_skipped()
+    # Batch jobs whose worker died (lease expired) are picked up again; live siblings keep theirs
+    await run_io(job_queue.requeue_stale)
+    batch_workers = batch_worker.start()
+    yield
+    if background is not None and not background.done():
+        background.cancel()
+    await batch_worker.stop(batch_workers)
+    await close_llm_client()
+    shutdown_executors()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,43 +92,193 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/process-claim/")
-async def process_claim(files: List[UploadFile] = File(...)):
-    combined_text = ""
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Per-request trace: stage timings come back as Server-Timing, keyed by X-Trace-Id in the logs
+    trace, token = metrics.start_trace(request.headers.get("x-request-id"))
+    started = asyncio.get_running_loop().time()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_trace(token)
+    response.headers["X-Trace-Id"] = trace["id"]
+    if trace["spans"]:
+        response.headers["Server-Timing"] = metrics.server_timing(trace)
+    headers_spans = dict(trace["spans"])
+    route = request.scope.get("route")
 
-    for file in files:
-        contents = await file.read()
-        file_text = extract_text_from_file(contents, file.filename)
-        combined_text += f"\n\n--- Document: {file.filename} ---\n{file_text}"
+    async def body(chunks):
+        # Streamed responses keep working after the headers go out: latency and any later spans
+        # are recorded once the body is finished
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            elapsed = asyncio.get_running_loop().time() - started
+            metrics.observe("healthbridge_request_seconds", elapsed, "HTTP request latency",
+                            path=getattr(route, "path", "unmatched"), status=str(response.status_code))
+            if trace["spans"] != headers_spans:
+                print(f"Trace {trace['id']}: {metrics.server_timing(trace)}")
 
-    # Step 1: LLM-assisted field extraction
-    structured_data = extract_structured_fields(combined_text)
+    response.body_iterator = body(response.body_iterator)
+    return response
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    corpus = corpus_cache.cache_stats()
+    llm = await run_io(llm_cache.cache_stats)
+    jobs = await run_io(job_queue.queue_stats)
+    gauges = {
+        "healthbridge_corpus_cache_entries": corpus["entries"],
+        "healthbridge_corpus_cache_bytes": corpus["used_bytes"],
+    }
+    gauges.update({f"healthbridge_llm_cache_{k}": v for k, v in llm.items() if isinstance(v, (int, float))})
+    gauges.update({f"healthbridge_jobs_{k}": v for k, v in jobs.items() if isinstance(v, (int, float))})
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def ready():
+    state = warmup.warmup_state()
+    return JSONResponse({"ready": warmup.is_ready(), **state}, status_code=200 if warmup.is_ready() else 503)
 
+async def _read_uploads(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    return [(f.filename, await f.read()) for f in files]
+
+async def _retrieve_clauses(structured_data) -> List[Tuple[float, str]]:
     insurer = ""
     if isinstance(structured_data, dict):
         insurer = structured_data.get("insurance_company") or ""
+    if not insurer:
+        return []
+    return await run_io(retrieve_scored_policy_clauses, insurer, retrieval_queries(structured_data))
 
-    # Step 2: RAG - retrieve relevant policy clauses using FAISS
-    # Build search queries from structured fields + heuristics
-    q = []
-    if isinstance(structured_data, dict):
-        if structured_data.get("diagnosis"): q.append(structured_data["diagnosis"])
-        if structured_data.get("claimed_amount"): q.append(f"charges {structured_data['claimed_amount']}")
-        q += ["coverage", "exclusions", "hospitalization", "pre-authorization", "bed charges", "non-medical items"]
+def _decision_prompt(combined_text: str, structured_data, policy_clauses: List[Tuple[float, str]]):
+    return build_prompt_with_usage(combined_text, structured_data if isinstance(structured_data, dict) else {}, policy_clauses)
+
+def _clauses_for_ui(policy_clauses: List[Tuple[float, str]]) -> List[str]:
+    return [text for _, text in policy_clauses[:6]]  # show a handful on UI
+
+@app.post("/process-claim/")
+async def process_claim(files: List[UploadFile] = File(...), include_ocr_text: bool = True):
+    uploads = await _read_uploads(files)
+    # OCR / parse all uploads concurrently, keeping upload order
+    parts = await asyncio.gather(*(extract_document(name, contents) for name, contents in uploads))
+    combined_text = "".join(parts)
 
-    policy_clauses = retrieve_policy_clauses(insurer, q) if insurer else []
+    # Step 1: LLM-assisted field extraction
+    structured_data = await extract_structured_fields(combined_text)
+
+    # Step 2: RAG - retrieve relevant policy clauses using FAISS
+    policy_clauses = await _retrieve_clauses(structured_data)
 
     # Step 3: Build decision prompt and query LLM
-    prompt = build_prompt(combined_text, structured_data if isinstance(structured_data, dict) else {}, policy_clauses)
-    decision = query_llm(prompt)
+    prompt, prompt_usage = _decision_prompt(combined_text, structured_data, policy_clauses)
+    with metrics.span("decision"):
+        decision = await query_llm(prompt)
 
-    return {
-        "ocr_text": combined_text,
+    result = {
         "structured_data": structured_data,
-        "policy_clauses_used": policy_clauses[:6],  # show a handful on UI
+        "policy_clauses_used": _clauses_for_ui(policy_clauses),
+        "prompt_tokens": prompt_usage,
         "decision": decision
     }
-    if __name__ == "__main__":
+    if include_ocr_text:
+        result = {"ocr_text": combined_text, **result}
+    return result
+
+@app.post("/process-claim/stream")
+async def process_claim_stream(files: List[UploadFile] = File(...), include_ocr_text: bool = False):
+    """
+    Same pipeline as /process-claim/, streamed as NDJSON: a "trace" event with the request's trace id
+    (stage timings are logged under it when the stream ends), one "ocr" event per file as it finishes,
+    then "structured_data", "policy_clauses", "prompt" (token usage), "decision_delta" chunks from the LLM,
+    and "decision". If any stage fails (including an LLM stream that breaks off midway) an "error" event
+    naming it in "failed_stage" ends the stream instead.
+    """
+    # Read uploads before the response starts; the request body is gone once streaming begins
+    uploads = await _read_uploads(files)
+
+    trace_id = metrics.current_trace_id()
+
+    async def events():
+        yield json.dumps({"stage": "trace", "trace_id": trace_id}) + "\n"
+
+        async def extract(position, name, contents):
+            return position, name, await extract_document(name, contents)
+
+        # Headers (200) are already sent, so a failing stage is reported in-stream and ends it
+        stage = "ocr"
+        try:
+            parts = [""] * len(uploads)
+            for next_done in asyncio.as_completed([extract(i, n, c) for i, (n, c) in enumerate(uploads)]):
+                position, name, text = await next_done
+                parts[position] = text
+                event = {"stage": "ocr", "index": position, "filename": name, "chars": len(text)}
+                if include_ocr_text:
+                    event["text"] = text
+                yield json.dumps(event) + "\n"
+            combined_text = "".join(parts)
+
+            stage = "structured_data"
+            structured_data = await extract_structured_fields(combined_text)
+            yield json.dumps({"stage": "structured_data", "data": structured_data}) + "\n"
+
+            stage = "policy_clauses"
+            policy_clauses = await _retrieve_clauses(structured_data)
+            yield json.dumps({"stage": "policy_clauses", "data": _clauses_for_ui(policy_clauses)}) + "\n"
+
+            stage = "prompt"
+            prompt, prompt_usage = _decision_prompt(combined_text, structured_data, policy_clauses)
+            yield json.dumps({"stage": "prompt", "tokens": prompt_usage}) + "\n"
+
+            stage = "decision"
+            decision = []
+            with metrics.span("decision"):
+                async for delta in stream_llm(prompt):
+                    decision.append(delta)
+                    yield json.dumps({"stage": "decision_delta", "delta": delta}) + "\n"
+            yield json.dumps({"stage": "decision", "data": "".join(decision)}) + "\n"
+        except Exception as err:
+            print(f"Claim stream error in {stage}: {err}")
+            yield json.dumps({"stage": "error", "failed_stage": stage, "error": str(err)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/claims/batch")
+async def submit_claims_batch(files: List[UploadFile] = File(...), claim_ids: List[str] = Form(None)):
+    """
+    Queue many claims for background processing. claim_ids (one per file) groups files into claims;
+    without it every file is its own claim. Poll /claims/batch/{batch_id}, then fetch /results.
+    """
+    uploads = await _read_uploads(files)
+    if claim_ids and len(claim_ids) != len(uploads):
+        return JSONResponse({"error": "claim_ids must have one entry per file"}, status_code=400)
+    if claim_ids:
+        grouped = {}
+        for claim_id, upload in zip(claim_ids, uploads):
+            grouped.setdefault(claim_id, []).append(upload)
+        claims = list(grouped.items())
+    else:
+        claims = [(name, [(name, contents)]) for name, contents in uploads]
+    batch_id = await run_io(job_queue.submit_batch, claims)
+    batch_worker.notify()
+    return {"batch_id": batch_id, "claims": len(claims)}
+
+@app.get("/claims/batch/{batch_id}")
+async def claims_batch_status(batch_id: str):
+    status = await run_io(job_queue.batch_status, batch_id)
+    if status is None:
+        return JSONResponse({"error": "unknown batch"}, status_code=404)
+    return status
+
+@app.get("/claims/batch/{batch_id}/results")
+async def claims_batch_results(batch_id: str):
+    results = await run_io(job_queue.batch_results, batch_id)
+    if results is None:
+        return JSONResponse({"error": "unknown batch"}, status_code=404)
+    return {"batch_id": batch_id, "results": results}
+
+if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
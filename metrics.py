@@ -0,0 +1,116 @@
+import os, re, time, uuid, bisect, threading, contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# In-process counters and latency histograms, rendered in the Prometheus text format on /metrics,
+# plus a per-request trace (id + time per stage) that main.py returns as Server-Timing.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+PREFIX = "healthbridge"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], list] = {}  # key -> [bucket counts (+Inf last), sum, count]
+_help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+
+# Current request's trace: {"id": str, "spans": {stage: seconds}}. Executor threads get a copy of the
+# context (executors.run_io), and the dict inside is shared, so their spans land on the same request.
+_trace: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("trace", default=None)
+# Caller-supplied ids (X-Request-ID) are echoed in headers and logs, so only plain short tokens are kept
+_TRACE_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+def inc(name: str, value: float = 1.0, help: str = "", **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _help.setdefault(name, ("counter", help))
+        _counters[key] = _counters.get(key, 0.0) + value
+
+def observe(name: str, value: float, help: str = "", **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    slot = bisect.bisect_left(BUCKETS, value)
+    with _lock:
+        _help.setdefault(name, ("histogram", help))
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        hist[0][slot] += 1
+        hist[1] += value
+        hist[2] += 1
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage: feeds the stage histogram and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe(f"{PREFIX}_stage_seconds", elapsed, "Time spent per pipeline stage", stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            spans = trace["spans"]
+            spans[stage] = spans.get(stage, 0.0) + elapsed
+
+def start_trace(trace_id: str = None):
+    """Begin a request trace; returns (trace, token) for end_trace. An unusable `trace_id` gets a fresh id."""
+    if not (trace_id and _TRACE_ID.fullmatch(trace_id)):
+        trace_id = uuid.uuid4().hex
+    trace = {"id": trace_id, "spans": {}}
+    return trace, _trace.set(trace)
+
+def end_trace(token):
+    _trace.reset(token)
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace["id"] if trace else None
+
+def server_timing(trace: Dict) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in trace["spans"].items())
+
+def _labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{str(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def render(gauges: Dict[str, float] = None) -> str:
+    """All metrics in the Prometheus text exposition format; `gauges` are point-in-time values."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in _histograms.items())
+        helps = dict(_help)
+    seen = set()
+
+    def header(name: str):
+        if name not in seen:
+            seen.add(name)
+            kind, text = helps.get(name, ("gauge", ""))
+            if text:
+                lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        header(name)
+        lines.append(f"{name}{_labels(labels)} {value:g}")
+    for (name, labels), (buckets, total, count) in histograms:
+        header(name)
+        cumulative = 0
+        for bound, n in zip(list(BUCKETS) + ["+Inf"], buckets):
+            cumulative += n
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    for name, value in sorted((gauges or {}).items()):
+        header(name)
+        lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
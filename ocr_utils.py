@@ -1,34 +1,239 @@
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageFilter, ImageOps
 import io
 import fitz  # PyMuPDF
 import tempfile
 import docx2txt
 import os
+import re
+import time
+import numpy as np
+from typing import Dict, List, Tuple
 
+# A page with fewer extractable characters than this is treated as scanned and OCR'd
+OCR_TEXT_LAYER_MIN_CHARS = int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "25"))
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+# Caps render size for oversized pages (tesseract time scales with pixel count)
+OCR_MAX_PAGE_PIXELS = int(os.getenv("OCR_MAX_PAGE_PIXELS", "9000000"))
 
-def extract_text_from_file(file_bytes, filename: str):
+# Image normalization before tesseract: rescale to a target text height, deskew, binarize, crop margins.
+# On by default per benchmarks/bench_ocr_results.json (tesseract 5.5.1, 8 photos + 8 scans): accuracy
+# 0.9995 -> 1.0 on 12 MP phone photos at p50 912 -> 579 ms; scans unchanged at 0.9998 for +65 ms.
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1") == "1"
+OCR_TARGET_LINE_PX = int(os.getenv("OCR_TARGET_LINE_PX", "40"))  # text line height, ascender to descender
+OCR_MAX_SKEW = float(os.getenv("OCR_MAX_SKEW", "5"))  # degrees searched either way
+OCR_DETECT_ORIENTATION = os.getenv("OCR_DETECT_ORIENTATION", "0") == "1"  # tesseract OSD pass for 90/180/270 turns
+# 6: one uniform block, keeps bill rows (item ... amount) together in reading order; 4: one column of mixed sizes
+OCR_PSM = os.getenv("OCR_PSM", "6")
+OCR_LANG = os.getenv("OCR_LANG", "eng")  # e.g. "eng+hin"; every extra language slows recognition
+OCR_THUMB_PX = 1000  # long side of the thumbnail that skew and text height are measured on
+
+
+def _run_cpu(pool, fn, *args):
+    # Hand CPU-heavy work to the process pool when the caller supplies one, else run inline
+    if pool is None:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+def extract_text_from_file(file_bytes, filename: str, pool=None):
     ext = filename.lower().split(".")[-1]
     
     if ext in ["jpg", "jpeg", "png"]:
-        image = Image.open(io.BytesIO(file_bytes))
-        return pytesseract.image_to_string(image)
+        return _run_cpu(pool, ocr_image_bytes, file_bytes)
     
     elif ext == "pdf":
-        return extract_text_from_pdf(file_bytes)
+        return extract_text_from_pdf(file_bytes, pool)
     
     elif ext == "docx":
-        return extract_text_from_docx(file_bytes)
+        return _run_cpu(pool, extract_text_from_docx, file_bytes)
     
     else:
         return "Unsupported file format."
 
-def extract_text_from_pdf(file_bytes):
-    text = ""
+def ocr_image_bytes(image_bytes) -> str:
+    return ocr_image_timed(image_bytes)[0]
+
+def ocr_image_timed(image_bytes, preprocess: bool = None) -> Tuple[str, Dict[str, float]]:
+    """OCR text plus seconds spent per step (preprocessing steps and "tesseract")."""
+    preprocess = OCR_PREPROCESS if preprocess is None else preprocess
+    image = Image.open(io.BytesIO(image_bytes))
+    timings = {}
+    if preprocess:
+        image, timings = preprocess_image(image)
+    started = time.perf_counter()
+    # Same language and page segmentation either way, so the two paths differ only in the image
+    text = pytesseract.image_to_string(image, lang=OCR_LANG, config=f"--psm {OCR_PSM} -c preserve_interword_spaces=1")
+    timings["tesseract"] = time.perf_counter() - started
+    return text, timings
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / gray.size
+    mu = np.cumsum(hist * np.arange(256)) / gray.size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return int(np.nanargmax(between)) if np.isfinite(between).any() else 128
+
+def _square_filter(pixels: np.ndarray, size: int, reduce) -> np.ndarray:
+    # Separable max/min over a size x size window (PIL's rank filters are O(size^2) per pixel)
+    half = size // 2
+    for axis in (0, 1):
+        padded = np.pad(pixels, [(half, half) if a == axis else (0, 0) for a in (0, 1)], mode="edge")
+        n = pixels.shape[axis]
+        windows = [padded[i:i + n] if axis == 0 else padded[:, i:i + n] for i in range(size)]
+        pixels = reduce.reduce(windows)
+    return pixels
+
+def _text_mask(thumb: Image.Image) -> np.ndarray:
+    # Black top-hat: thin dark strokes survive, large dark areas (desk, shadows, page edges) do not
+    pixels = np.asarray(thumb)
+    closed = _square_filter(_square_filter(pixels, 7, np.maximum), 7, np.minimum)
+    hat = (closed.astype(np.int16) - pixels).astype(np.uint8)
+    return hat > max(_otsu_threshold(hat), 20)
+
+def _text_box(mask: np.ndarray):
+    # Rows/columns with a few text pixels, so isolated specks don't stretch the box
+    rows, cols = np.flatnonzero(mask.sum(axis=1) >= 2), np.flatnonzero(mask.sum(axis=0) >= 2)
+    if not len(rows) or not len(cols):
+        return None
+    return cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+
+def _skew_angle(mask: Image.Image) -> float:
+    # Projection profile: text rows line up (sharpest row-sum profile) at the right angle
+    def sharpness(angle):
+        rows = np.asarray(mask.rotate(angle, resample=Image.NEAREST) if angle else mask).sum(axis=1, dtype=np.float64)
+        return float(np.square(np.diff(rows)).sum())
+
+    best_angle, best_score = 0.0, sharpness(0.0)  # ties (e.g. a blank page) stay unrotated
+    for angle in np.arange(-OCR_MAX_SKEW, OCR_MAX_SKEW + 0.01, 0.5):
+        score = sharpness(float(angle)) if angle else best_score
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+def _line_height(mask: Image.Image) -> float:
+    """Median height in pixels of the text lines in a deskewed text mask; 0 if none are found."""
+    rows = np.asarray(mask).mean(axis=1)
+    text_rows = rows > rows.max() * 0.05
+    runs, length = [], 0
+    for is_text in text_rows:
+        if is_text:
+            length += 1
+        elif length:
+            runs.append(length)
+            length = 0
+    runs = [r for r in runs if r >= 2]
+    return float(np.median(runs)) if runs else 0.0
+
+def _orientation(image: Image.Image) -> int:
+    try:
+        found = re.search(r"Rotate: (\d+)", pytesseract.image_to_osd(image))
+    except pytesseract.TesseractError:
+        return 0  # too little text to tell
+    return int(found.group(1)) if found else 0
+
+def _binarize(gray: Image.Image) -> Image.Image:
+    # Divide out uneven lighting (shadows, vignetting on phone photos), then one global threshold
+    small = gray.resize((max(1, gray.width // 16), max(1, gray.height // 16)), Image.BILINEAR)
+    background = small.filter(ImageFilter.MaxFilter(5)).resize(gray.size, Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32) / np.maximum(np.asarray(background, dtype=np.float32), 1)
+    flat = np.clip(pixels * 255, 0, 255).astype(np.uint8)
+    return Image.fromarray(np.where(flat > _otsu_threshold(flat), 255, 0).astype(np.uint8))
+
+def preprocess_image(image: Image.Image) -> Tuple[Image.Image, Dict[str, float]]:
+    """
+    Normalize a photo or scan for tesseract: grayscale, crop to the text, rescale so text lines are
+    about OCR_TARGET_LINE_PX tall (tesseract time scales with pixels), deskew, binarize.
+    Returns the image and seconds per step.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    def step(name):
+        nonlocal started
+        now = time.perf_counter()
+        timings[name] = now - started
+        started = now
+
+    gray = ImageOps.exif_transpose(image).convert("L")  # phone photos are often stored sideways plus an EXIF flag
+    step("grayscale")
+
+    # Orientation, text box, skew and text height are measured on a thumbnail; full-size steps come after
+    thumb_scale = min(1.0, OCR_THUMB_PX / max(gray.size))
+    thumb = gray.resize((max(1, int(gray.width * thumb_scale)), max(1, int(gray.height * thumb_scale))), Image.BILINEAR)
+    if OCR_DETECT_ORIENTATION:
+        rotate = _orientation(thumb)
+        if rotate:
+            gray, thumb = gray.rotate(-rotate, expand=True), thumb.rotate(-rotate, expand=True)
+        step("orientation")
+
+    mask = _text_mask(thumb)
+    box = _text_box(mask)
+    if box is not None:
+        x0, y0, x1, y1 = box
+        mask = mask[y0:y1, x0:x1]
+    mask = Image.fromarray((mask * 255).astype(np.uint8))
+    angle = _skew_angle(mask) if OCR_MAX_SKEW > 0 else 0.0
+    line_px = _line_height(mask.rotate(angle, resample=Image.NEAREST, expand=True) if angle else mask) / thumb_scale
+    step("analyze")
+
+    if box is not None:
+        pad = OCR_TARGET_LINE_PX / thumb_scale / 2
+        gray = gray.crop((max(0, int(box[0] / thumb_scale - pad)), max(0, int(box[1] / thumb_scale - pad)),
+                          min(gray.width, int(box[2] / thumb_scale + pad)), min(gray.height, int(box[3] / thumb_scale + pad))))
+    step("crop")
+
+    scale = OCR_TARGET_LINE_PX / line_px if line_px else 1.0
+    scale = min(scale, (OCR_MAX_PAGE_PIXELS / (gray.width * gray.height)) ** 0.5, 2.0)
+    if not 0.9 <= scale <= 1.1:
+        gray = gray.resize((max(1, int(gray.width * scale)), max(1, int(gray.height * scale))), Image.LANCZOS)
+    step("resize")
+
+    if angle:
+        gray = gray.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    step("deskew")
+
+    binary = _binarize(gray)
+    step("binarize")
+    return binary, timings
+
+def _page_dpi(page) -> int:
+    area_in2 = (page.rect.width / 72) * (page.rect.height / 72)
+    dpi = min(OCR_TARGET_DPI, (OCR_MAX_PAGE_PIXELS / max(area_in2, 1e-6)) ** 0.5)
+    return max(OCR_MIN_DPI, int(dpi))
+
+def _extract_pdf_page(page) -> Dict:
+    text = page.get_text()
+    if len(text.strip()) >= OCR_TEXT_LAYER_MIN_CHARS:
+        return {"page": page.number + 1, "text": text, "source": "text"}
+    pix = page.get_pixmap(dpi=_page_dpi(page), colorspace=fitz.csGRAY)
+    return {"page": page.number + 1, "text": ocr_image_bytes(pix.tobytes("png")), "source": "ocr"}
+
+def _extract_pdf_page_group(file_bytes, numbers: List[int]) -> List[Dict]:
+    # One pool task: open the PDF once, then read or render + OCR each of its pages
     with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+        return [_extract_pdf_page(doc[n]) for n in numbers]
+
+def extract_pdf_pages(file_bytes, pool=None) -> List[Dict]:
+    """
+    Per-page text in page order: {"page": 1-based number, "text": ..., "source": "text" | "ocr"}.
+    Pages with a text layer use it directly; scanned pages are rendered (grayscale, adaptive DPI)
+    and OCR'd. With a pool, all page work (parsing, rendering, OCR) runs in its worker processes,
+    pages interleaved over at most CPU_WORKERS tasks so scanned and text pages spread evenly.
+    """
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        count = doc.page_count
+    if pool is None:
+        return _extract_pdf_page_group(file_bytes, list(range(count)))
+    from executors import CPU_WORKERS
+    groups = [list(range(start, count, CPU_WORKERS)) for start in range(min(CPU_WORKERS, count))]
+    results = pool.map(_extract_pdf_page_group, [file_bytes] * len(groups), groups)
+    return sorted((page for group in results for page in group), key=lambda p: p["page"])
+
+def extract_text_from_pdf(file_bytes, pool=None):
+    pages = extract_pdf_pages(file_bytes, pool)
+    return "".join(f"\n[Page {p['page']}]\n{p['text']}" for p in pages)
 
 def extract_text_from_docx(file_bytes):
     with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
@@ -37,3 +242,12 @@ def extract_text_from_docx(file_bytes):
         text = docx2txt.process(tmp.name)
     os.remove(tmp.name)
     return text
+
+async def extract_document(filename: str, contents: bytes) -> str:
+    """One upload's text under a "--- Document: name ---" header, for combining a claim's files."""
+    from executors import cpu_pool, run_io  # server side only; pool workers import this module too
+    from metrics import span
+    # Dispatch runs on an I/O thread; OCR and parsing (incl. per-page PDF OCR) fan out to the process pool
+    with span("extract"):
+        file_text = await run_io(extract_text_from_file, contents, filename, cpu_pool())
+    return f"\n\n--- Document: {filename} ---\n{file_text}"
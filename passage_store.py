@@ -0,0 +1,57 @@
+import os, sys, mmap
+from typing import Iterator, List
+import numpy as np
+from fs_utils import atomic_path
+
+class PassageStore:
+    """
+    Read-only passage list backed by a memory-mapped UTF-8 blob plus an offsets array.
+    Passages are decoded only when accessed; the mapped pages live in the OS page cache,
+    so every worker process reading the same index shares one copy.
+    """
+
+    def __init__(self, blob_path: str, offsets_path: str):
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+        self._blob = b""
+        if os.path.getsize(blob_path):
+            with open(blob_path, "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._blob[int(self._offsets[i]):int(self._offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def resident_bytes(self) -> int:
+        """
+        Private memory: the Python objects (store, offsets array header, mmap handle). The blob and
+        offset values are file-backed pages shared by every process and reclaimable by the OS,
+        so they are not charged to the corpus cache budget.
+        """
+        return (sys.getsizeof(self) + sys.getsizeof(self.__dict__) + sys.getsizeof(self._offsets)
+                + sys.getsizeof(self._blob))
+
+def write_passages(blob_path: str, offsets_path: str, texts: List[str]):
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with atomic_path(blob_path) as tmp:
+        with open(tmp, "wb") as f:
+            for b in encoded:
+                f.write(b)
+    with atomic_path(offsets_path) as tmp:
+        # np.save appends .npy to names without it
+        with open(tmp, "wb") as f:
+            np.save(f, offsets)
@@ -1,32 +1,143 @@
 import os, re, fitz
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from corpus_cache import file_sha256
+from metrics import span
 
 MAX_CHUNK_CHARS = 1200
 CHUNK_OVERLAP = 150
+MIN_CHUNK_CHARS = 30  # only drops stray fragments (page furniture); short exclusion clauses are kept
+CHUNKER_VERSION = "structured-1"  # bump when chunk boundaries change so existing indexes are rebuilt
 
-def read_pdf_text(pdf_path: str) -> str:
-    text = ""
+def iter_pdf_pages(pdf_path: str) -> Iterator[Tuple[int, str]]:
+    """(1-based page number, raw text) one page at a time."""
     with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+        for number, page in enumerate(doc, start=1):
+            yield number, page.get_text()
+
+def read_pdf_text(pdf_path: str) -> str:
+    return "\n".join(text for _, text in iter_pdf_pages(pdf_path))
+
+def policy_source(pdf_path: str) -> Dict:
+    """What an index built from this PDF depends on; recorded in (and compared against) its manifest."""
+    return {
+        "pdf_sha256": file_sha256(pdf_path),
+        "max_chunk_chars": MAX_CHUNK_CHARS,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "chunker": CHUNKER_VERSION,
+    }
 
 def clean_text(t: str) -> str:
     t = re.sub(r"[ \t]+", " ", t)
     t = re.sub(r"\n{2,}", "\n", t)
     return t.strip()
 
+# "SECTION 4 - EXCLUSIONS", "Part B", "4. EXCLUSIONS", "GENERAL CONDITIONS"
+_SECTION_HEADING = re.compile(r"^(?:section|part|chapter|schedule|annexure|appendix)\s+[0-9IVXA-Z]+\b", re.I)
+_CAPS_HEADING = re.compile(r"^(?:\d{1,2}(?:\.\d{1,2})*\.?\s+)?[A-Z][A-Z0-9 &,/()'\-]{2,80}$")
+# Numbered / lettered / bulleted clause starts: "4.2", "3)", "(a)", "(iv)", "Excl 02", "Code-Excl03", "•"
+_CLAUSE_START = re.compile(
+    r"^(?:\(?\d{1,2}(?:\.\d{1,2}){0,3}\)?[.)]?|\(?[a-z]\)|\(?[ivx]{1,5}\)|(?:code\s*[-\u2013]?\s*)?excl\s?\d{1,2}\b[.:)]?|[\u2022\-\u2013*])\s+",
+    re.I,
+)
+_PAGE_FURNITURE = re.compile(r"^(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?$", re.I)
+_SENTENCE_END = re.compile(r"(?<=[.;:])\s+(?=[A-Z(\d])")
+
+def _is_heading(line: str) -> bool:
+    if len(line) > 100 or line.endswith((".", ",", ";")):
+        return False
+    return bool(_SECTION_HEADING.match(line) or (_CAPS_HEADING.match(line) and sum(c.isalpha() for c in line) >= 4))
+
+def iter_blocks(pages: Iterable[Tuple[Optional[int], str]]) -> Iterator[Tuple[str, str, Optional[int]]]:
+    """
+    ("heading" | "clause", text, page) blocks: a heading line, or a clause with its wrapped
+    continuation lines joined. Blocks never span pages, so each one keeps its page number.
+    """
+    for page, raw in pages:
+        buf = []
+        for line in raw.replace("\r\n", "\n").split("\n"):
+            line = re.sub(r"[ \t]+", " ", line).strip()
+            if not line or _PAGE_FURNITURE.match(line):
+                continue
+            if _is_heading(line):
+                if buf:
+                    yield "clause", " ".join(buf), page
+                    buf = []
+                yield "heading", line, page
+            elif _CLAUSE_START.match(line) and buf:
+                yield "clause", " ".join(buf), page
+                buf = [line]
+            else:
+                buf.append(line)
+        if buf:
+            yield "clause", " ".join(buf), page
+
+def _pieces(text: str, max_chars: int) -> Iterator[str]:
+    # A clause that fits is one piece; longer ones split at sentence ends, then at word boundaries
+    if len(text) <= max_chars:
+        yield text
+        return
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            yield sentence[:cut]
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            yield sentence
+
+def iter_chunks(blocks: Iterable[Tuple[str, str, Optional[int]]], max_chars=MAX_CHUNK_CHARS,
+                overlap=CHUNK_OVERLAP) -> Iterator[Dict]:
+    """
+    Pack blocks into chunks of at most `max_chars`: {"text", "page_start", "page_end", "section"}.
+    A heading always starts a new chunk; consecutive chunks of a section share up to `overlap`
+    chars of whole trailing pieces (never a cut word).
+    """
+    buf, size, fresh, section = [], 0, False, ""  # buf: [(piece, page)]
+
+    def emit():
+        text = "\n".join(piece for piece, _ in buf)
+        if len(text) >= MIN_CHUNK_CHARS:
+            pages = [page for _, page in buf if page is not None]
+            return {"text": text, "page_start": pages[0] if pages else None,
+                    "page_end": pages[-1] if pages else None, "section": section}
+        return None
+
+    for kind, text, page in blocks:
+        if kind == "heading":
+            if fresh and (chunk := emit()):
+                yield chunk
+            buf, size, fresh, section = [(text, page)], len(text), False, text[:80]
+            continue
+        for piece in _pieces(text, max_chars):
+            if buf and size + len(piece) + 1 > max_chars:
+                if fresh and (chunk := emit()):
+                    yield chunk
+                tail, tail_size = [], 0
+                for prev, prev_page in reversed(buf):
+                    if tail_size + len(prev) + 1 > overlap:
+                        break
+                    tail.insert(0, (prev, prev_page))
+                    tail_size += len(prev) + 1
+                buf, size = tail, tail_size
+            buf.append((piece, page))
+            size += len(piece) + 1
+            fresh = True
+    if fresh and (chunk := emit()):
+        yield chunk
+
+def format_passage(chunk: Dict) -> str:
+    """Chunk text prefixed with its citation, e.g. "[Pages 12-13 | 4. EXCLUSIONS]"."""
+    start, end = chunk["page_start"], chunk["page_end"]
+    cite = [] if start is None else [f"Page {start}" if start == end else f"Pages {start}-{end}"]
+    if chunk["section"]:
+        cite.append(chunk["section"])
+    return f"[{' | '.join(cite)}]\n{chunk['text']}" if cite else chunk["text"]
+
+def policy_passages(pdf_path: str, max_chars=MAX_CHUNK_CHARS, overlap=CHUNK_OVERLAP) -> List[str]:
+    """Citable passages for a policy PDF, streamed page by page."""
+    with span("chunk"):
+        return [format_passage(c) for c in iter_chunks(iter_blocks(iter_pdf_pages(pdf_path)), max_chars, overlap)]
+
 def chunk_text(t: str, max_chars=MAX_CHUNK_CHARS, overlap=CHUNK_OVERLAP) -> List[str]:
-    t = t.replace("\r\n", "\n")
-    lines = t.split("\n")
-    chunks, cur = [], ""
-    for line in lines:
-        if len(cur) + len(line) + 1 <= max_chars:
-            cur += (line + "\n")
-        else:
-            chunks.append(cur.strip())
-            cur = cur[-overlap:] + line + "\n"
-    if cur.strip():
-        chunks.append(cur.strip())
-    # Minor filter to avoid tiny fragments
-    return [c for c in chunks if len(c) > 200]
+    """Chunk plain text (no page information) with the same structure-aware rules."""
+    return [c["text"] for c in iter_chunks(iter_blocks([(None, t)]), max_chars, overlap)]
@@ -103,9 +103,14 @@
 #         _save_url_cache(url_cache)
 #     return None
 
-import os, re, time, json, hashlib, requests, pathlib
+import os, re, json, time, hashlib, tempfile, threading, requests, pathlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import quote_plus
 from bs4 import BeautifulSoup
+from fs_utils import atomic_write_json
+from locks import file_lock, run_exclusive
+from insurer_aliases import insurer_key
+import metrics
 
 try:
     from duckduckgo_search import DDGS
@@ -116,8 +121,21 @@ except ImportError:
 DATA_DIR = os.getenv("DATA_DIR", "data")
 CACHE_DIR = os.path.join(DATA_DIR, "policies")
 URL_CACHE_FILE = os.path.join(CACHE_DIR, "url_cache.json")
+# Insurers whose search found no usable PDF, with an expiry, so repeat claims skip the web search
+NEGATIVE_CACHE_FILE = os.path.join(CACHE_DIR, "negative_cache.json")
+POLICY_NEGATIVE_TTL = float(os.getenv("POLICY_NEGATIVE_TTL", str(6 * 3600)))  # seconds; 0 disables
+# After a failed search (network error, rate limit) only back off briefly; it says nothing about the insurer
+POLICY_SEARCH_ERROR_TTL = float(os.getenv("POLICY_SEARCH_ERROR_TTL", "60"))
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+# Candidate PDFs are probed in parallel; the first valid download wins and the rest are abandoned
+POLICY_FETCH_PARALLELISM = int(os.getenv("POLICY_FETCH_PARALLELISM", "4"))
+POLICY_CONNECT_TIMEOUT = float(os.getenv("POLICY_CONNECT_TIMEOUT", "5"))
+POLICY_READ_TIMEOUT = float(os.getenv("POLICY_READ_TIMEOUT", "20"))  # max wait between received bytes
+POLICY_MAX_BYTES = int(os.getenv("POLICY_MAX_BYTES", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+PDF_MAGIC_WINDOW = 1024  # readers accept the %PDF- header anywhere in the first KB
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (+https://healthbridge.internal)",
     "Accept": "text/html,application/pdf;q=0.9,*/*;q=0.8",
@@ -130,28 +148,185 @@ def _load_url_cache():
     return {}
 
 def _save_url_cache(cache):
-    with open(URL_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
+    atomic_write_json(URL_CACHE_FILE, cache, ensure_ascii=False, indent=2)
+
+def _remember_urls(key: str, urls):
+    # Re-read under the lock so concurrent workers merge their entries instead of overwriting each other
+    with file_lock("url_cache"):
+        cache = _load_url_cache()
+        cache[key] = list(dict.fromkeys(cache.get(key, []) + list(urls)))
+        _save_url_cache(cache)
+
+# Keys that name something other than an insurer; "standard" holds the shared standard clauses
+# (vector_store.STANDARD_TENANT), so an insurer slugged to it gets a suffixed key instead
+RESERVED_INSURER_KEYS = {"standard"}
 
 def _insurer_key(name: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "-", (name or "unknown").strip().lower())
+    # Canonical key for known insurers, so every spelling shares one cache folder and index
+    key = insurer_key(name)
+    return f"{key}-insurer" if key in RESERVED_INSURER_KEYS else key
+
+def migrate_legacy_folders() -> int:
+    """
+    One-time rename of policy and index folders named by the pre-alias slug of an insurer name
+    ("star-health") to its canonical key, so they are neither fetched nor indexed again. Folders whose
+    canonical key already has one are left alone. Returns the number of insurers moved.
+    """
+    from embeddings_faiss import INDEX_DIR  # deferred: keeps the search path free of numpy/faiss imports
+    moved = 0
+    with file_lock("legacy_folders"):
+        for legacy in sorted(os.listdir(CACHE_DIR)):
+            if legacy in RESERVED_INSURER_KEYS or not os.path.isdir(os.path.join(CACHE_DIR, legacy)):
+                continue
+            key = _insurer_key(legacy)
+            if key == legacy:
+                continue
+            if any(os.path.exists(os.path.join(root, key)) for root in (CACHE_DIR, INDEX_DIR)):
+                print(f"Legacy policy folder {legacy} not moved: {key} already exists")
+                continue
+            for root in (CACHE_DIR, INDEX_DIR):
+                if os.path.isdir(os.path.join(root, legacy)):
+                    os.rename(os.path.join(root, legacy), os.path.join(root, key))
+            with file_lock("url_cache"):
+                cache = _load_url_cache()
+                if legacy in cache:
+                    cache[key] = cache.pop(legacy)
+                    _save_url_cache(cache)
+            moved += 1
+    return moved
+
+_negative = {"stamp": None, "entries": {}}
+_negative_lock = threading.Lock()
+
+def _negative_entries() -> dict:
+    # In-memory copy, re-read only when another worker has rewritten the file
+    try:
+        stamp = os.stat(NEGATIVE_CACHE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        stamp = None
+    with _negative_lock:
+        if stamp != _negative["stamp"]:
+            entries = {}
+            if stamp is not None:
+                try:
+                    with open(NEGATIVE_CACHE_FILE, "r", encoding="utf-8") as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            _negative.update(stamp=stamp, entries=entries)
+        return _negative["entries"]
+
+def is_known_miss(key: str) -> bool:
+    expires = _negative_entries().get(key)
+    return expires is not None and expires > time.time()
+
+def _remember_miss(key: str, ttl: float = None):
+    ttl = POLICY_NEGATIVE_TTL if ttl is None else ttl
+    if ttl <= 0:
+        return
+    with file_lock("negative_cache"):
+        now = time.time()
+        entries = {k: v for k, v in _negative_entries().items() if v > now}
+        entries[key] = now + ttl
+        atomic_write_json(NEGATIVE_CACHE_FILE, entries)
+
+def forget_miss(key: str = None):
+    """Drop one insurer's (or every) negative entry, e.g. after adding its manual.pdf."""
+    with file_lock("negative_cache"):
+        entries = {} if key is None else {k: v for k, v in _negative_entries().items() if k != key}
+        atomic_write_json(NEGATIVE_CACHE_FILE, entries)
 
 def _filehash(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
-def download_and_cache_pdf(url: str, insurer: str) -> str:
-    insurer_folder = os.path.join(CACHE_DIR, _insurer_key(insurer))
-    os.makedirs(insurer_folder, exist_ok=True)
-    fname = _filehash(url) + ".pdf"
-    fpath = os.path.join(insurer_folder, fname)
-    if os.path.exists(fpath):
-        return fpath
-    r = requests.get(url, headers=HEADERS, timeout=60)
-    r.raise_for_status()
-    with open(fpath, "wb") as f:
-        f.write(r.content)
+class DownloadCancelled(Exception):
+    pass
+
+def _cached_pdf_path(url: str, insurer: str) -> str:
+    return os.path.join(CACHE_DIR, _insurer_key(insurer), _filehash(url) + ".pdf")
+
+def _download_pdf(url: str, folder: str, cancel: threading.Event = None) -> str:
+    """
+    Stream a PDF into a ".part" temp file in `folder` and return its path. The body is judged by its
+    %PDF magic, not the Content-Type (servers send PDFs as octet-stream, force-download, text/html...);
+    anything over POLICY_MAX_BYTES is rejected. The temp file is removed on any failure.
+    """
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f, requests.get(url, headers=HEADERS, stream=True,
+                                                    timeout=(POLICY_CONNECT_TIMEOUT, POLICY_READ_TIMEOUT)) as r:
+            r.raise_for_status()
+            if int(r.headers.get("Content-Length") or 0) > POLICY_MAX_BYTES:
+                raise ValueError(f"PDF larger than {POLICY_MAX_BYTES} bytes: {url}")
+            head, size = b"", 0
+            for chunk in r.iter_content(DOWNLOAD_CHUNK_BYTES):
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled(url)
+                if len(head) < PDF_MAGIC_WINDOW:
+                    head += chunk[:PDF_MAGIC_WINDOW]
+                    if len(head) >= PDF_MAGIC_WINDOW and b"%PDF-" not in head[:PDF_MAGIC_WINDOW]:
+                        raise ValueError(f"missing %PDF header: {url}")
+                size += len(chunk)
+                if size > POLICY_MAX_BYTES:
+                    raise ValueError(f"PDF larger than {POLICY_MAX_BYTES} bytes: {url}")
+                f.write(chunk)
+        if b"%PDF-" not in head[:PDF_MAGIC_WINDOW]:
+            raise ValueError(f"missing %PDF header: {url}")
+        return tmp
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def download_and_cache_pdf(url: str, insurer: str, cancel: threading.Event = None) -> str:
+    """Download one policy PDF into the insurer's cache folder; the file appears only when complete."""
+    fpath = _cached_pdf_path(url, insurer)
+    if not os.path.exists(fpath):
+        os.replace(_download_pdf(url, os.path.dirname(fpath), cancel), fpath)
     return fpath
 
+def probe_pdf_urls(urls, insurer: str):
+    """
+    Download candidates concurrently (POLICY_FETCH_PARALLELISM at a time) to temp files; returns (url, path)
+    of the first valid PDF, or (None, None). Only the winner is renamed into the cache: pending candidates
+    are dropped, in-flight ones stop at their next chunk and finished losers delete their temp file.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return None, None
+    for url in urls:
+        if os.path.exists(_cached_pdf_path(url, insurer)):
+            return url, _cached_pdf_path(url, insurer)
+    cancel = threading.Event()
+    claim = threading.Lock()
+
+    def fetch(url):
+        fpath = _cached_pdf_path(url, insurer)
+        tmp = _download_pdf(url, os.path.dirname(fpath), cancel)
+        with claim:
+            won = not cancel.is_set()
+            cancel.set()
+            if won:
+                os.replace(tmp, fpath)
+                return fpath
+        os.remove(tmp)
+        raise DownloadCancelled(url)
+
+    pool = ThreadPoolExecutor(max_workers=min(POLICY_FETCH_PARALLELISM, len(urls)), thread_name_prefix="hb-fetch")
+    try:
+        futures = {pool.submit(fetch, url): url for url in urls}
+        for future in as_completed(futures):
+            try:
+                return futures[future], future.result()
+            except DownloadCancelled:
+                continue
+            except Exception as err:
+                print(f"Policy download error: {err}")
+        return None, None
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
 def duckduckgo_pdf_search_html(query, max_results=8):
     url = f"https://duckduckgo.com/html/?q={quote_plus(query)}+filetype%3Apdf"
     resp = requests.get(url, headers=HEADERS, timeout=30)
@@ -177,11 +352,70 @@ def duckduckgo_pdf_search_api(query, max_results=8):
                 results.append(url)
     return results
 
+def search_pdf_urls(query) -> tuple:
+    """(candidate PDF URLs, whether any search actually completed)."""
+    searched = False
+    for search in (duckduckgo_pdf_search_api, duckduckgo_pdf_search_html):
+        if search is duckduckgo_pdf_search_api and not DUCK_API:
+            continue
+        try:
+            urls = search(query)
+        except Exception as err:
+            print(f"Policy search error: {err}")
+            continue
+        searched = True
+        if urls:
+            return urls, True
+    return [], searched
+
+def _cached_pdf(key: str) -> str | None:
+    # manual.pdf, else the first URL-cache entry already downloaded (find_or_fetch_policy_pdf's order)
+    insurer_folder = os.path.join(CACHE_DIR, key)
+    manual_path = os.path.join(insurer_folder, "manual.pdf")
+    if os.path.exists(manual_path):
+        return manual_path
+    for url in _load_url_cache().get(key, []):
+        fpath = os.path.join(insurer_folder, _filehash(url) + ".pdf")
+        if os.path.exists(fpath):
+            return fpath
+    return None
+
+def local_policy_pdf_for_key(key: str) -> str | None:
+    """Already-cached policy PDF for an insurer key, without any network access."""
+    cached = _cached_pdf(key)
+    if cached:
+        return cached
+    insurer_folder = os.path.join(CACHE_DIR, key)
+    if not os.path.isdir(insurer_folder):
+        return None
+    pdfs = [os.path.join(insurer_folder, f) for f in os.listdir(insurer_folder) if f.lower().endswith(".pdf")]
+    return max(pdfs, key=os.path.getmtime) if pdfs else None
+
+def local_policy_pdf(insurer_name: str) -> str | None:
+    if not insurer_name:
+        return None
+    return local_policy_pdf_for_key(_insurer_key(insurer_name))
+
 def find_or_fetch_policy_pdf(insurer_name: str, keywords=None) -> str | None:
     if not insurer_name:
         return None
+    with metrics.span("policy_fetch"):
+        key = _insurer_key(insurer_name)
+        cached = _cached_pdf(key)
+        if cached:
+            metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="policy_pdf", result="hit")
+            return cached
+        if is_known_miss(key):
+            metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="policy_pdf", result="negative")
+            return None
+        metrics.inc("healthbridge_cache_total", help="Cache lookups", cache="policy_pdf", result="miss")
+        # One search + download per insurer, however many claims (threads or workers) arrive at once;
+        # callers that waited on the lock find the winner's PDF in the cache
+        return run_exclusive(f"policy-{key}", _fetch_policy_pdf, insurer_name, key, keywords)
 
-    key = _insurer_key(insurer_name)
+def _fetch_policy_pdf(insurer_name: str, key: str, keywords=None) -> str | None:
+    if is_known_miss(key):
+        return None  # recorded by whoever held the lock before us
     insurer_folder = os.path.join(CACHE_DIR, key)
     os.makedirs(insurer_folder, exist_ok=True)
 
@@ -190,30 +424,20 @@ def find_or_fetch_policy_pdf(insurer_name: str, keywords=None) -> str | None:
     if os.path.exists(manual_path):
         return manual_path
 
-    # Try cached URLs
-    url_cache = _load_url_cache()
-    for url in url_cache.get(key, []):
-        try:
-            return download_and_cache_pdf(url, insurer_name)
-        except Exception:
-            continue
+    # Cached URLs whose file has gone missing first, then a fresh search
+    url, pdf_path = probe_pdf_urls(_load_url_cache().get(key, []), insurer_name)
+    if pdf_path:
+        return pdf_path
 
     # Search online
     query = f"{insurer_name} health insurance policy pdf {' '.join(keywords or [])}"
-    urls = duckduckgo_pdf_search_api(query)
-    if not urls:
-        urls = duckduckgo_pdf_search_html(query)
+    urls, searched = search_pdf_urls(query)
 
-    ok_urls = []
-    for url in urls:
-        try:
-            pdf_path = download_and_cache_pdf(url, insurer_name)
-            ok_urls.append(url)
-            url_cache[key] = list(dict.fromkeys(url_cache.get(key, []) + ok_urls))
-            _save_url_cache(url_cache)
-            return pdf_path
-        except Exception:
-            time.sleep(1)
-            continue
-
-    return None
+    url, pdf_path = probe_pdf_urls(urls, insurer_name)
+    if pdf_path:
+        _remember_urls(key, [url])
+    elif searched:
+        _remember_miss(key)  # the search worked and nothing it found was a usable policy PDF
+    else:
+        _remember_miss(key, POLICY_SEARCH_ERROR_TTL)
+    return pdf_path
@@ -0,0 +1,139 @@
+import os, re, json, math, hashlib
+from typing import Dict, List, Tuple, Union
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+# Share of the budget left after instructions + structured fields that policy clauses may use;
+# whatever they don't use goes to the OCR text
+CLAUSE_BUDGET_SHARE = float(os.getenv("CLAUSE_BUDGET_SHARE", "0.35"))
+MAX_BLOCK_CHARS = 800
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """Exact with tiktoken installed, else a close estimate (~4 chars per sub-word piece)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return sum(math.ceil(len(w) / 4) if w[0].isalnum() else 1 for w in _WORD.findall(text))
+
+_DOC_HEADER = re.compile(r"^--- Document: .* ---$")
+_PAGE_HEADER = re.compile(r"^\[Page \d+\]$")
+_AMOUNT = re.compile(r"(?:rs\.?|inr|₹)\s*[0-9][0-9,]*|\b[0-9]{1,3}(?:,[0-9]{2,3})+(?:\.\d{1,2})?\b|\b\d{3,}\.\d{2}\b", re.I)
+_BILLING = re.compile(r"\b(bill|invoice|charges?|amount|total|payable|room|rent|pharmacy|medicines?|consumables?|investigations?|lab|ot\b|surgeon|fees?|package)", re.I)
+_CLINICAL = re.compile(r"\b(diagnos\w*|impression|discharge summary|procedure|surgery|operation|treatment|history|complaints?|icd)", re.I)
+
+def _block_priority(block: str) -> int:
+    # 0 = itemized billing, 1 = diagnosis/clinical, 2 = everything else
+    amounts = len(_AMOUNT.findall(block))
+    if amounts >= 2 or (amounts and _BILLING.search(block)):
+        return 0
+    if _CLINICAL.search(block):
+        return 1
+    return 2
+
+def _split_blocks(ocr_text: str) -> List[Tuple[str, str]]:
+    """(context header, block) pairs: blank-line separated blocks, long ones cut at line boundaries."""
+    blocks, doc, page, cur = [], "", "", []
+
+    def flush():
+        if cur:
+            blocks.append((f"{doc}\n{page}".strip(), "\n".join(cur).strip()))
+            cur.clear()
+
+    for line in ocr_text.replace("\r\n", "\n").split("\n"):
+        stripped = line.strip()
+        if _DOC_HEADER.match(stripped):
+            flush(); doc, page = stripped, ""
+        elif _PAGE_HEADER.match(stripped):
+            flush(); page = stripped
+        elif not stripped:
+            flush()
+        else:
+            if cur and sum(len(l) + 1 for l in cur) + len(stripped) > MAX_BLOCK_CHARS:
+                flush()
+            cur.append(stripped)
+    flush()
+    return [(h, b) for h, b in blocks if b]
+
+def pack_ocr_text(ocr_text: str, budget: int) -> Tuple[str, int]:
+    """
+    Fit OCR text into `budget` tokens: drop repeated blocks (headers/footers on every page),
+    keep billing line items first, then clinical text, then the rest; emit in document order.
+    """
+    seen, candidates = set(), []
+    for position, (header, block) in enumerate(_split_blocks(ocr_text)):
+        key = hashlib.sha1(re.sub(r"\s+", " ", block.lower()).encode("utf-8")).digest()
+        if key in seen:
+            continue
+        seen.add(key)
+        candidates.append((_block_priority(block), position, header, block))
+
+    chosen, used, headers_used = [], 0, set()
+    for priority, position, header, block in sorted(candidates):
+        cost = count_tokens(block) + (0 if header in headers_used else count_tokens(header))
+        if used + cost > budget:
+            continue
+        chosen.append((position, header, block))
+        headers_used.add(header)
+        used += cost
+
+    out, last_header = [], None
+    for _, header, block in sorted(chosen):
+        if header != last_header and header:
+            out.append(header)
+        last_header = header
+        out.append(block)
+    return "\n".join(out), used
+
+ScoredClause = Union[str, Tuple[float, str]]
+
+def pack_clauses(clauses: List[ScoredClause], budget: int) -> Tuple[List[str], int]:
+    """Highest retrieval score first, whole clauses only, until the budget is spent."""
+    scored = [(c if isinstance(c, tuple) else (0.0, c)) for c in clauses]
+    order = sorted(range(len(scored)), key=lambda i: -scored[i][0])
+    kept, used = [], 0
+    for i in order:
+        cost = count_tokens(scored[i][1])
+        if used + cost <= budget:
+            kept.append(i)
+            used += cost
+    return [scored[i][1] for i in kept], used
+
+def compact_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def pack_prompt(template: str, ocr_text: str, structured: Dict, clauses: List[ScoredClause],
+                budget: int = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Fill `template` ({ocr}, {structured}, {clauses} placeholders) within `budget` tokens.
+    Returns the prompt and the tokens used per section.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    structured_json = compact_json(structured)
+    fixed = count_tokens(template.format(ocr="", structured="", clauses=""))
+    structured_tokens = count_tokens(structured_json)
+    remaining = max(0, budget - fixed - structured_tokens)
+
+    kept_clauses, clause_tokens = pack_clauses(clauses, int(remaining * CLAUSE_BUDGET_SHARE))
+    clauses_joined = "\n\n---\n".join(kept_clauses) if kept_clauses else "No clauses retrieved."
+    ocr_packed, ocr_tokens = pack_ocr_text(ocr_text, remaining - clause_tokens)
+
+    prompt = template.format(ocr=ocr_packed, structured=structured_json, clauses=clauses_joined)
+    usage = {
+        "instructions": fixed,
+        "structured": structured_tokens,
+        "policy_clauses": clause_tokens,
+        "clauses_kept": len(kept_clauses),
+        "clauses_dropped": len(clauses) - len(kept_clauses),
+        "ocr": ocr_tokens,
+        "total": count_tokens(prompt),
+        "budget": budget,
+    }
+    return prompt, usage
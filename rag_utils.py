@@ -21,49 +21,134 @@
 
 
 import os
-from typing import List, Dict
-from policy_search import find_or_fetch_policy_pdf, _insurer_key
-from policy_ingest import read_pdf_text, clean_text, chunk_text
-from embeddings_faiss import ensure_index, search
+from typing import List, Dict, Tuple
+from policy_search import find_or_fetch_policy_pdf, local_policy_pdf, local_policy_pdf_for_key, _insurer_key
+from policy_ingest import policy_passages, policy_source
+from embeddings_faiss import ensure_index, load_current_index, load_index, search_batch, embed_passages, embed_queries, stored_passage_vectors
+from corpus_cache import get_corpus
+import vector_store
+from prompt_packer import pack_prompt
+from rerank import rerank
+from bm25 import rrf_fuse
+from locks import run_exclusive
+import metrics
+
+# Serve-only: use policies and indexes pre-built by ingest_cli.py; never search the web or build on a request
+SERVE_ONLY = os.getenv("SERVE_ONLY", "0") == "1"
+
+# per-insurer: one FAISS index per insurer directory; unified: one multi-tenant store (vector_store.py)
+# that also serves the shared standard clauses to every insurer
+VECTOR_STORE = os.getenv("VECTOR_STORE", "per-insurer")
+
+# hybrid: BM25 + vector results fused by reciprocal rank; vector: embeddings only;
+# keyword: BM25 only, never encodes a query (per-insurer indexes)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Queries asked of every policy on every claim; their embeddings are pre-warmed at startup.
+DEFAULT_QUERIES = ["coverage", "exclusions", "hospitalization", "pre-authorization", "bed charges", "non-medical items"]
+
+def retrieval_queries(structured_data) -> List[str]:
+    # Build search queries from structured fields + heuristics
+    q = []
+    if isinstance(structured_data, dict):
+        if structured_data.get("diagnosis"): q.append(structured_data["diagnosis"])
+        if structured_data.get("claimed_amount"): q.append(f"charges {structured_data['claimed_amount']}")
+        q += DEFAULT_QUERIES
+    return q
+
+def _load_corpus(insurer_key: str, pdf_path: str):
+    source = policy_source(pdf_path)
+    loaded = load_current_index(insurer_key, source)
+    if loaded[0] is not None:
+        return loaded
+    if SERVE_ONLY:
+        # Serve whatever was last ingested rather than building on the request path
+        loaded = load_index(insurer_key)
+        if loaded[0] is None:
+            print(f"Serve-only: no prebuilt index for {insurer_key}")
+            return None, [], None
+        return loaded
+    passages = policy_passages(pdf_path)
+    if not passages:
+        return None, [], None
+    return ensure_index(insurer_key, passages, source)
 
-def retrieve_policy_clauses(insurer: str, queries: List[str], k_per_query=4) -> List[str]:
+def warm_corpus(insurer_key: str) -> bool:
+    """Load a locally cached insurer's corpus + index into the corpus cache (no network)."""
+    pdf_path = local_policy_pdf_for_key(insurer_key)
+    if not pdf_path:
+        return False
+    index, _, _ = get_corpus(insurer_key, pdf_path, _load_corpus)
+    return index is not None
+
+def _unified_upsert(insurer_key: str, pdf_path: str, source: Dict):
+    if vector_store.is_current(insurer_key, source):
+        return  # built by whoever held the lock before us
+    passages = policy_passages(pdf_path)
+    if passages:
+        vector_store.upsert(insurer_key, passages, embed_passages(passages), source=source)
+
+def _unified_search(insurer_key: str, pdf_path: str, queries: List[str], k: int) -> List[List[Tuple[float, str]]]:
+    if pdf_path:
+        source = policy_source(pdf_path)
+        if not SERVE_ONLY and not vector_store.is_current(insurer_key, source):
+            run_exclusive(f"unified-{insurer_key}", _unified_upsert, insurer_key, pdf_path, source,
+                          share_key=source.get("pdf_sha256"))
+    return vector_store.search(insurer_key, embed_queries(queries), k)
+
+def _insurer_search(index, texts, keyword_index, queries: List[str], k: int, mode: str) -> List[List[Tuple[float, str]]]:
+    if mode == "vector" or keyword_index is None:
+        return search_batch(index, texts, queries, k=k)
+    with metrics.span("keyword_search"):
+        keyword = [[(s, texts[i]) for s, i in hits] for hits in keyword_index.search_batch(queries, k)]
+    if mode == "keyword":
+        return keyword
+    vector = search_batch(index, texts, queries, k=k)
+    return [rrf_fuse(v, kw, k=k) for v, kw in zip(vector, keyword)]
+
+def retrieve_scored_policy_clauses_many(insurer: str, query_sets: List[List[str]], k_per_query=4,
+                                        mode: str = None) -> List[List[Tuple[float, str]]]:
+    """
+    Clauses for several claims against the same insurer: the corpus is loaded once and the
+    union of all claims' queries is searched in one batch; each claim is then reranked on its own hits.
+    """
+    if SERVE_ONLY:
+        pdf_path = local_policy_pdf(insurer)
+    else:
+        pdf_path = find_or_fetch_policy_pdf(insurer, keywords=["coverage", "exclusions", "hospitalization", "cashless"])
+    queries = list(dict.fromkeys(q for qs in query_sets for q in qs))
+    if VECTOR_STORE == "unified":
+        # Standard clauses are still searchable when the insurer's own policy is unavailable
+        results = _unified_search(_insurer_key(insurer), pdf_path, queries, k_per_query) if queries else []
+    else:
+        if not pdf_path:
+            return [[] for _ in query_sets]
+        index, texts, keyword_index = get_corpus(_insurer_key(insurer), pdf_path, _load_corpus)
+        if index is None or not texts:
+            return [[] for _ in query_sets]
+        results = _insurer_search(index, texts, keyword_index, queries, k_per_query, mode or RETRIEVAL_MODE)
+
+    by_query = dict(zip(queries, results))
+    # Passage vectors are only read from the chunk-hash embedding store written at indexing time:
+    # the hot path (and keyword mode) never loads the model or encodes
+    with metrics.span("rerank"):
+        return [rerank([by_query[q] for q in qs], stored_passage_vectors) for qs in query_sets]
+
+def retrieve_scored_policy_clauses(insurer: str, queries: List[str], k_per_query=4, mode: str = None) -> List[Tuple[float, str]]:
     """
     1) Ensure policy PDF is cached locally.
-    2) Read & chunk policy text.
-    3) Build or load FAISS index for this insurer.
-    4) Run semantic search for each query and collect top passages.
+    2) Read & chunk policy text, build or load FAISS index for this insurer
+       (served from the in-process corpus cache while the PDF is unchanged).
+    3) Run BM25 and/or semantic search (RETRIEVAL_MODE, or `mode`) for all queries in one batch,
+       fusing the two rankings per query by reciprocal rank; pool the hits and pick a diverse,
+       relevant set by MMR over their stored embeddings (no re-encoding).
     """
-    pdf_path = find_or_fetch_policy_pdf(insurer, keywords=["coverage", "exclusions", "hospitalization", "cashless"])
-    if not pdf_path:
-        return []
+    return retrieve_scored_policy_clauses_many(insurer, [queries], k_per_query, mode)[0]
 
-    text = clean_text(read_pdf_text(pdf_path))
-    passages = chunk_text(text)
-    if not passages:
-        return []
-
-    insurer_key = _insurer_key(insurer)
-    index, texts = ensure_index(insurer_key, passages)
-
-    seen, out = set(), []
-    for q in queries:
-        for score, passage in search(index, texts, q, k=k_per_query):
-            # De-dup near-identical passages
-            key = passage[:200]
-            if key not in seen:
-                seen.add(key)
-                out.append(passage)
-    # Keep a reasonable cap to avoid prompt bloat
-    return out[:12]
-
-def build_prompt(ocr_text: str, structured: Dict, policy_clauses: List[str]) -> str:
-    insurer = structured.get("insurance_company", "") or "Unknown"
-    claimed = structured.get("claimed_amount", "")
-    diagnosis = structured.get("diagnosis", "")
-
-    clauses_joined = "\n\n---\n".join(policy_clauses) if policy_clauses else "No clauses retrieved."
-
-    return f"""
+def retrieve_policy_clauses(insurer: str, queries: List[str], k_per_query=4, mode: str = None) -> List[str]:
+    return [passage for _, passage in retrieve_scored_policy_clauses(insurer, queries, k_per_query, mode)]
+
+DECISION_PROMPT_TEMPLATE = """
 You are a senior health insurance claim adjudicator. Use ONLY the provided claim data and policy excerpts.
 
 TASKS:
@@ -74,14 +159,14 @@ TASKS:
 5) Cite the relevant policy excerpts in your reasoning.
 
 CLAIM (OCR EXTRACT):
-\"\"\"{ocr_text[:8000]}\"\"\"  # truncated to keep prompt size reasonable
+\"\"\"{ocr}\"\"\"
 
 STRUCTURED FIELDS:
 {structured}
 
 POLICY EXCERPTS:
 \"\"\"
-{clauses_joined}
+{clauses}
 \"\"\"
 
 
@@ -94,3 +179,14 @@ Return ONLY valid JSON with this schema:
   "reasoning": "short, cite clause snippets where relevant (e.g., 'Excl 2: ...')"
 }}
 """.strip()
+
+def build_prompt_with_usage(ocr_text: str, structured: Dict, policy_clauses, token_budget: int = None) -> Tuple[str, Dict]:
+    """
+    Pack the decision prompt into a token budget (PROMPT_TOKEN_BUDGET by default).
+    policy_clauses may be plain strings or (score, text) pairs; higher scores survive trimming.
+    """
+    with metrics.span("prompt"):
+        return pack_prompt(DECISION_PROMPT_TEMPLATE, ocr_text, structured, policy_clauses, token_budget)
+
+def build_prompt(ocr_text: str, structured: Dict, policy_clauses, token_budget: int = None) -> str:
+    return build_prompt_with_usage(ocr_text, structured, policy_clauses, token_budget)[0]
@@ -0,0 +1,73 @@
+import os
+from typing import List, Tuple
+import numpy as np
+
+from prompt_packer import count_tokens
+
+# Maximal marginal relevance over the pooled candidates of all retrieval queries:
+# relevance is a candidate's best score for any query, redundancy its max cosine similarity
+# to a clause already picked. Overlapping chunks of the same clause are dropped outright.
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1.0 = pure relevance, 0.0 = pure diversity
+MMR_DUP_THRESHOLD = float(os.getenv("MMR_DUP_THRESHOLD", "0.92"))  # similarity above which a candidate is a duplicate
+MAX_CLAUSES = int(os.getenv("MAX_CLAUSES", "12"))
+CLAUSE_TOKEN_BUDGET = int(os.getenv("CLAUSE_TOKEN_BUDGET", "0"))  # 0 = leave trimming to the prompt packer
+
+def pool_candidates(results: List[List[Tuple[float, str]]]) -> List[Tuple[float, str]]:
+    """Merge per-query hits into unique passages, each with its best score over all queries."""
+    best = {}
+    for hits in results:
+        for score, passage in hits:
+            if score > best.get(passage, float("-inf")):
+                best[passage] = score
+    return sorted(((s, p) for p, s in best.items()), key=lambda c: -c[0])
+
+def mmr_select(candidates: List[Tuple[float, str]], vectors: np.ndarray, max_clauses: int = None,
+               token_budget: int = None, lambda_: float = None, dup_threshold: float = None) -> List[Tuple[float, str]]:
+    """
+    Pick up to `max_clauses` candidates by MMR using their (unit-norm) passage vectors.
+    Returns (score, passage) pairs in selection order, keeping the original retrieval scores.
+    """
+    max_clauses = MAX_CLAUSES if max_clauses is None else max_clauses
+    token_budget = CLAUSE_TOKEN_BUDGET if token_budget is None else token_budget
+    lambda_ = MMR_LAMBDA if lambda_ is None else lambda_
+    dup_threshold = MMR_DUP_THRESHOLD if dup_threshold is None else dup_threshold
+    if not candidates:
+        return []
+
+    relevance = np.array([s for s, _ in candidates], dtype="float32")
+    # Min-max to [0, 1] so cosine and reciprocal-rank scores trade off against similarity alike
+    spread = float(relevance.max() - relevance.min())
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+    similarity = vectors @ vectors.T  # n x n cosine similarity
+    redundancy = np.full(len(candidates), -1.0, dtype="float32")  # max similarity to anything selected
+    available = np.ones(len(candidates), dtype=bool)
+    selected, used = [], 0
+
+    while len(selected) < max_clauses and available.any():
+        mmr = np.where(available, lambda_ * relevance - (1 - lambda_) * np.maximum(redundancy, 0), -np.inf)
+        i = int(np.argmax(mmr))
+        available[i] = False
+        cost = count_tokens(candidates[i][1]) if token_budget else 0
+        if token_budget and used + cost > token_budget:
+            continue  # too long for what is left; a shorter clause may still fit
+        selected.append(i)
+        used += cost
+        redundancy = np.maximum(redundancy, similarity[i])
+        available &= redundancy < dup_threshold
+    return [candidates[i] for i in selected]
+
+def rerank(results: List[List[Tuple[float, str]]], vectors_for, **kwargs) -> List[Tuple[float, str]]:
+    """
+    Pool per-query hits and MMR-select them. `vectors_for(passages)` returns {passage: stored embedding}
+    for those it has; a passage without one gets a zero vector, i.e. it competes on relevance alone.
+    """
+    candidates = pool_candidates(results)
+    if not candidates:
+        return []
+    found = vectors_for([p for _, p in candidates])
+    dim = len(next(iter(found.values()))) if found else 1
+    vectors = np.zeros((len(candidates), dim), dtype="float32")
+    for i, (_, passage) in enumerate(candidates):
+        if passage in found:
+            vectors[i] = found[passage]
+    return mmr_select(candidates, vectors, **kwargs)
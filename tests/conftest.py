@@ -0,0 +1,5 @@
+import os, sys, tempfile
+
+# Modules live at the repository root and read DATA_DIR at import; keep test runs out of ./data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="healthbridge-tests-"))
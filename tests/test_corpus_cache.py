@@ -0,0 +1,61 @@
+import pytest
+
+import corpus_cache
+
+class FakeIndex:
+    def __init__(self, ntotal, d=256):
+        self.ntotal, self.d = ntotal, d
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    corpus_cache.invalidate()
+    yield
+    corpus_cache.invalidate()
+
+def policy(tmp_path, name, content=b"%PDF-1.4 policy"):
+    path = tmp_path / f"{name}.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+def loader(calls):
+    def load(insurer_key, pdf_path):
+        calls.append(insurer_key)
+        return FakeIndex(1000), [f"{insurer_key} clause"] * 10, None
+    return load
+
+def test_hits_skip_the_loader(tmp_path):
+    calls = []
+    path = policy(tmp_path, "acme")
+    first = corpus_cache.get_corpus("acme", path, loader(calls))
+    second = corpus_cache.get_corpus("acme", path, loader(calls))
+    assert calls == ["acme"] and first[0] is second[0]
+
+def test_least_recently_used_corpus_is_evicted_at_the_byte_budget(tmp_path, monkeypatch):
+    calls = []
+    one_corpus = 1000 * 256 * 4  # FAISS vectors dominate the estimate
+    monkeypatch.setattr(corpus_cache, "CORPUS_CACHE_MB", 2.5 * one_corpus / (1024 * 1024))
+    paths = {key: policy(tmp_path, key) for key in ("a", "b", "c")}
+
+    corpus_cache.get_corpus("a", paths["a"], loader(calls))
+    corpus_cache.get_corpus("b", paths["b"], loader(calls))
+    corpus_cache.get_corpus("a", paths["a"], loader(calls))  # "b" is now the oldest
+    corpus_cache.get_corpus("c", paths["c"], loader(calls))
+
+    stats = corpus_cache.cache_stats()
+    assert stats["entries"] == 2 and stats["used_bytes"] <= stats["budget_bytes"]
+    corpus_cache.get_corpus("a", paths["a"], loader(calls))
+    corpus_cache.get_corpus("b", paths["b"], loader(calls))
+    assert calls == ["a", "b", "c", "b"]
+
+def test_corpus_larger_than_the_budget_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_cache, "CORPUS_CACHE_MB", 0.1)
+    corpus_cache.get_corpus("big", policy(tmp_path, "big"), loader([]))
+    assert corpus_cache.cache_stats()["entries"] == 0
+
+def test_new_pdf_replaces_the_insurers_old_entry(tmp_path):
+    calls = []
+    path = policy(tmp_path, "acme")
+    corpus_cache.get_corpus("acme", path, loader(calls))
+    policy(tmp_path, "acme", b"%PDF-1.4 reissued policy")
+    corpus_cache.get_corpus("acme", path, loader(calls))
+    assert calls == ["acme", "acme"] and corpus_cache.cache_stats()["entries"] == 1
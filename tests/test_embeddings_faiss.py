@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+import embeddings_faiss
+
+def test_store_connection_is_reused_per_thread():
+    conn = embeddings_faiss._store_conn()
+    assert embeddings_faiss._store_conn() is conn
+    other = []
+    thread = threading.Thread(target=lambda: other.append(embeddings_faiss._store_conn()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+@pytest.fixture
+def counting_encoder(monkeypatch):
+    encoded = []
+
+    def embed_texts(texts):
+        encoded.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype="float32")
+    monkeypatch.setattr(embeddings_faiss, "embed_texts", embed_texts)
+    monkeypatch.setattr(embeddings_faiss, "_query_cache", OrderedDict())
+    return encoded
+
+def test_query_embeddings_are_encoded_once(counting_encoder):
+    first = embeddings_faiss.embed_queries(["room rent", "icu charges", "room rent"])
+    second = embeddings_faiss.embed_queries(["icu charges", "day care"])
+
+    assert counting_encoder == [["room rent", "icu charges"], ["day care"]]
+    assert first.shape == (3, 2) and np.array_equal(first[1], second[0])
+
+def test_query_cache_is_bounded_lru(counting_encoder, monkeypatch):
+    monkeypatch.setattr(embeddings_faiss, "QUERY_CACHE_SIZE", 2)
+    embeddings_faiss.embed_queries(["a", "b"])
+    embeddings_faiss.embed_queries(["a", "c"])  # "b" is the least recently used
+    embeddings_faiss.embed_queries(["a", "b"])
+    assert counting_encoder == [["a", "b"], ["c"], ["b"]]
+
+def test_search_batch_runs_one_search_for_all_queries(counting_encoder):
+    class Index:
+        searches = 0
+
+        def search(self, q_emb, k):
+            self.searches += 1
+            return np.ones((len(q_emb), k), dtype="float32"), np.array([[0, -1]] * len(q_emb))
+
+    index = Index()
+    results = embeddings_faiss.search_batch(index, ["clause"], ["q1", "q2", "q3"], k=2)
+    assert index.searches == 1 and results == [[(1.0, "clause")]] * 3
+
+@pytest.mark.parametrize("n, expected", [(10, "flat"), (20000, "hnsw"), (200000, "ivf")])
+def test_auto_index_type_follows_corpus_size(monkeypatch, n, expected):
+    monkeypatch.setattr(embeddings_faiss, "INDEX_TYPE", "auto")
+    assert embeddings_faiss.choose_index_type(n) == expected
+
+def test_configured_index_type_wins(monkeypatch):
+    monkeypatch.setattr(embeddings_faiss, "INDEX_TYPE", "ivfpq")
+    assert embeddings_faiss.choose_index_type(10) == "ivfpq"
+
+def test_unknown_index_type_is_rejected():
+    with pytest.raises(ValueError):
+        embeddings_faiss.build_faiss_index(np.zeros((4, 8), dtype="float32"), "annoy")
+
+@pytest.mark.parametrize("index_type, n", [("hnsw", 300), ("ivf", 2000), ("ivfpq", 10000)])
+def test_ann_indexes_find_exact_matches(index_type, n):
+    vectors = np.random.default_rng(0).standard_normal((n, 32)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index, params = embeddings_faiss.build_faiss_index(vectors, index_type)
+    assert params["index_type"] == index_type and index.ntotal == n
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
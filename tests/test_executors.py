@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+import executors
+import metrics
+
+def test_run_io_runs_on_the_io_pool():
+    async def main():
+        return await executors.run_io(lambda: threading.current_thread().name)
+
+    assert asyncio.run(main()).startswith("hb-io")
+
+def test_run_cpu_uses_the_process_pool():
+    async def main():
+        return await asyncio.gather(*(executors.run_cpu(pow, 2, n) for n in range(4)))
+
+    try:
+        assert asyncio.run(main()) == [1, 2, 4, 8]
+    finally:
+        executors.shutdown()
+
+def test_run_io_carries_the_callers_trace():
+    async def main():
+        trace, token = metrics.start_trace("claim-42")
+        try:
+            return await executors.run_io(metrics.current_trace_id)
+        finally:
+            metrics.end_trace(token)
+
+    assert asyncio.run(main()) == "claim-42"
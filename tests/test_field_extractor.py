@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+import field_extractor
+
+@pytest.mark.parametrize("response", ['["Ravi Kumar"]', '"Ravi Kumar"', "42", "null"])
+def test_non_object_llm_response_keeps_rules_fields(monkeypatch, response):
+    async def fake_llm(prompt):
+        return response
+    monkeypatch.setattr(field_extractor, "query_llm", fake_llm)
+    text = "Patient Name: Ravi Kumar\nAge: 45"
+    rules, _ = field_extractor.extract_fields_with_rules(text)
+
+    fields = asyncio.run(field_extractor.extract_structured_fields(text))
+
+    assert "error" in fields
+    for f, value in rules.items():
+        assert fields[f] == value
+
+@pytest.mark.parametrize("letterhead", ["APOLLO HOSPITALS, CHENNAI", "Sunrise Clinics", "City Care Hospital"])
+def test_letterhead_hospital_name(letterhead):
+    fields, confidence = field_extractor.extract_fields_with_rules(f"{letterhead}\nPatient Name: Ravi Kumar\n")
+    assert fields["hospital_name"] == letterhead
+    assert confidence["hospital_name"] > 0
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+import embeddings_faiss as ef
+
+def vectors(n, seed=0):
+    v = np.random.default_rng(seed).standard_normal((n, 16)).astype("float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+def builds(key):
+    return sorted(n for n in os.listdir(os.path.join(ef.INDEX_DIR, key)) if n.startswith("v"))
+
+def test_rebuild_swaps_index_passages_and_bm25_together():
+    key = "swap-test"
+    old = [f"old clause {i}" for i in range(3)]
+    new = [f"new clause {i}" for i in range(5)]
+    ef.save_index(key, old, vectors(3))
+    old_manifest = ef.load_manifest(key)
+    ef.save_index(key, new, vectors(5, 1))
+
+    index, texts, keyword_index = ef.load_index(key)
+    assert index.ntotal == len(texts) == len(keyword_index) == 5 and texts[0] == "new clause 0"
+    # A reader holding the manifest from before the swap still gets a complete old build,
+    # keyword index included
+    index, texts, keyword_index = ef.load_index(key, old_manifest)
+    assert index.ntotal == len(texts) == len(keyword_index) == 3 and texts[0] == "old clause 0"
+    assert keyword_index.search_batch(["old clause"], 1)[0]
+
+    ef.save_index(key, old, vectors(3))
+    assert len(builds(key)) == 2 and old_manifest["version"] not in builds(key)
+
+def test_legacy_layout_is_read_then_pruned():
+    key = "legacy-test"
+    ef.save_index(key, ["a", "b"], vectors(2))
+    manifest = ef.load_manifest(key)
+    folder = ef._build_dir(key, manifest)
+    base = os.path.dirname(folder)
+    for name in os.listdir(folder):
+        os.replace(os.path.join(folder, name), os.path.join(base, name))
+    os.rmdir(folder)
+    del manifest["version"]
+    ef.atomic_write_json(ef._manifest_path(key), manifest)
+
+    os.remove(os.path.join(base, "bm25.npz"))  # built before keyword search
+
+    index, texts, keyword_index = ef.load_index(key)
+    assert index.ntotal == len(texts) == len(keyword_index) == 2
+    assert os.path.exists(os.path.join(base, "bm25.npz"))
+
+    ef.save_index(key, ["c"], vectors(1))
+    assert os.path.exists(os.path.join(base, "faiss.index"))  # previous build, kept for in-flight readers
+    ef.save_index(key, ["d"], vectors(1))
+    assert not os.path.exists(os.path.join(base, "faiss.index"))
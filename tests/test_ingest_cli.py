@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+import fitz
+import numpy as np
+import pytest
+
+import embeddings_faiss
+import ingest_cli
+
+def fake_embed_texts(texts):
+    rows = [np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest(), dtype="uint8")[:16] for t in texts]
+    vectors = np.array(rows, dtype="float32") + 1
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+# Enough text on every page to make a full-sized passage
+CONDITIONS = ["GENERAL CONDITIONS", "Claims must be intimated within 48 hours of admission.",
+              "Room rent is payable up to one percent of the sum insured per day.",
+              "Pre-existing diseases are covered after a waiting period of four years."]
+
+@pytest.fixture
+def policies(monkeypatch):
+    monkeypatch.setattr(embeddings_faiss, "embed_texts", fake_embed_texts)
+
+    def write(key, clauses):
+        folder = os.path.join(ingest_cli.CACHE_DIR, key)
+        os.makedirs(folder, exist_ok=True)
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "\n".join(["COVERAGE"] + clauses + CONDITIONS))
+        doc.save(os.path.join(folder, "manual.pdf"))
+        doc.close()
+    return write
+
+def test_ingest_builds_each_insurer_once_and_resumes(policies):
+    keys = ["ingest-alpha", "ingest-beta"]
+    for key in keys:
+        policies(key, [f"1. {key} covers in-patient hospitalization.", f"2. {key} excludes cosmetic surgery."])
+
+    assert ingest_cli.ingest(keys, workers=2) == {"total": 2, "skipped": 0, "built": 2, "empty": 0, "failed": 0}
+    for key in keys:
+        index, texts = embeddings_faiss.load_index(key)[:2]
+        assert index.ntotal == len(texts) and key in texts[0]
+
+    assert ingest_cli.ingest(keys, workers=2)["skipped"] == 2
+    policies("ingest-beta", ["1. ingest-beta now covers day care procedures."])
+    assert ingest_cli.ingest(keys, workers=2) == {"total": 2, "skipped": 1, "built": 1, "empty": 0, "failed": 0}
@@ -0,0 +1,43 @@
+import pytest
+
+import insurer_aliases
+from insurer_aliases import canonical_insurer, insurer_key
+
+@pytest.fixture(autouse=True)
+def builtin_aliases_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(insurer_aliases, "INSURER_ALIASES_FILE", str(tmp_path / "insurers.json"))
+    insurer_aliases.reload()
+    yield
+    insurer_aliases.reload()
+
+@pytest.mark.parametrize("name, key", [
+    ("STAR HEALTH", "star-health-and-allied-insurance-co-ltd"),
+    ("Star Health & Allied Insurance Co. Ltd", "star-health-and-allied-insurance-co-ltd"),
+    ("Star Health Insurance Policy", "star-health-and-allied-insurance-co-ltd"),
+    ("Care Health Insurance (formerly Religare)", "care-health-insurance-ltd"),
+    ("Religare", "care-health-insurance-ltd"),
+    ("ICICI Lombard Gen Ins", "icici-lombard-general-insurance-co-ltd"),
+    ("The New India Assurance Co. Ltd.", "the-new-india-assurance-co-ltd"),
+    ("National Insurance Co Ltd", "national-insurance-co-ltd"),
+    ("Max Bupa Health Insurance Company Limited", "niva-bupa-health-insurance-co-ltd"),
+    ("Bajaj Alianz General Insurance", "bajaj-allianz-general-insurance-co-ltd"),
+])
+def test_known_spellings_resolve(name, key):
+    assert canonical_insurer(name) == key
+
+@pytest.mark.parametrize("name", [
+    "United Healthcare Parekh TPA",
+    "Paramount Health Care",
+    "Star Union Dai-ichi Life",
+    "New Star Health",
+    "National Health Insurance",
+    "Universal Health",
+    "Bajaj Finance",
+    "Kotak Life",
+    "Aditya Birla Sun Life",
+    "Reliance Nippon Life",
+    "Health Insurance",
+])
+def test_other_companies_do_not_match(name):
+    assert canonical_insurer(name) is None
+    assert insurer_key(name) == insurer_aliases.slugify(name)
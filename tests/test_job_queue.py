@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import job_queue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(autouse=True)
+def fresh_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_PATH", str(tmp_path / "jobs.sqlite"))
+
+def _submit(n):
+    return job_queue.submit_batch([(f"claim-{i}", [(f"{i}.txt", b"x")]) for i in range(n)])
+
+def test_concurrent_claims_never_share_a_job():
+    _submit(200)
+    with ThreadPoolExecutor(8) as pool:
+        rounds = list(pool.map(lambda _: job_queue.claim_jobs(5), range(60)))
+    claimed = [job["id"] for jobs in rounds for job in jobs]
+    assert len(claimed) == 200
+    assert len(set(claimed)) == 200
+
+def test_requeue_stale_leaves_live_jobs_alone():
+    _submit(2)
+    first, second = job_queue.claim_jobs(2)
+    time.sleep(0.05)
+    job_queue.heartbeat([second["id"]])
+    assert job_queue.requeue_stale(lease=0.02) == 1
+    assert [job["id"] for job in job_queue.claim_jobs(2)] == [first["id"]]
+
+def test_fail_does_not_touch_completed_jobs():
+    batch_id = _submit(1)
+    (job,) = job_queue.claim_jobs(1)
+    job_queue.complete(job["id"], {"decision": "ok"})
+    job_queue.fail(job["id"], "late error")
+    assert job_queue.batch_status(batch_id)["counts"]["done"] == 1
+
+def test_jobs_of_a_killed_worker_run_again_once_their_lease_expires(monkeypatch):
+    batch_id = _submit(2)
+    # A worker process claims both jobs and dies without finishing them
+    code = "import os, job_queue; job_queue.claim_jobs(2); os._exit(1)"
+    env = {**os.environ, "JOB_QUEUE_PATH": job_queue.JOB_QUEUE_PATH}
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env)
+    assert job_queue.batch_status(batch_id)["counts"]["running"] == 2
+
+    # After the restart the jobs are still leased to the dead worker until the lease runs out
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 0.2)
+    assert job_queue.requeue_stale() == 0 and job_queue.claim_jobs(2) == []
+    time.sleep(0.3)
+    assert job_queue.requeue_stale() == 2
+
+    jobs = job_queue.claim_jobs(2)
+    assert [job["claim_id"] for job in jobs] == ["claim-0", "claim-1"]
+    assert all(job["attempts"] == 2 and job["files"] == [(job["claim_id"][-1] + ".txt", b"x")] for job in jobs)
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+import pytest
+
+import llm_cache
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ACCESS_FLUSH", 3600)
+    llm_cache._pending_access.clear()
+
+def test_round_trip_and_expiry(monkeypatch):
+    key = llm_cache.cache_key({"model": "m", "messages": [{"role": "user", "content": "decide"}]})
+    assert llm_cache.get(key) is None
+    llm_cache.put(key, '{"status": "approved"}')
+    assert llm_cache.get(key) == '{"status": "approved"}'
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_TTL", -1)
+    assert llm_cache.get(key) is None
+
+def test_hits_do_not_write_until_flushed():
+    llm_cache.put("a", "A")
+    llm_cache._flush_access()
+    # Hold a write lock from another connection: a cache hit must still be answered
+    blocker = sqlite3.connect(llm_cache.LLM_CACHE_PATH, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        assert llm_cache.get("a") == "A"
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+def test_eviction_keeps_recently_hit_entries(monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_MAX_ENTRIES", 2)
+    llm_cache.put("old", "1")
+    llm_cache.put("newer", "2")
+    assert llm_cache.get("old") == "1"  # access time only pending in memory
+    llm_cache.put("newest", "3")
+    assert llm_cache.get("old") == "1"
+    assert llm_cache.get("newer") is None
+
+def test_connection_is_reused_per_thread():
+    conn = llm_cache._conn()
+    assert llm_cache._conn() is conn
+    other = []
+    thread = threading.Thread(target=lambda: other.append(llm_cache._conn()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import json
+import time
+
+import httpx
+import pytest
+
+import llm_utils
+
+DECISION = '{"status": "approved"}'
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Scripted LLM API: `failures` [(status, Retry-After or None)] are answered first, then DECISION."""
+    calls = []
+
+    def start(failures=(), delay=0.0):
+        failures = list(failures)
+
+        async def handler(request):
+            calls.append(json.loads(request.content))
+            await asyncio.sleep(delay)
+            if failures:
+                status, retry_after = failures.pop(0)
+                return httpx.Response(status, headers={"Retry-After": str(retry_after)} if retry_after is not None else {})
+            return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": DECISION}}]})
+
+        transport = httpx.MockTransport(handler)
+        monkeypatch.setattr(llm_utils.httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=transport))
+        return calls
+
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setattr(llm_utils, "LLM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(llm_utils, "LLM_MAX_RETRIES", 2)
+    return start
+
+def ask(*prompts):
+    async def run():
+        try:
+            return await asyncio.gather(*(llm_utils.query_llm(p, use_cache=False) for p in prompts))
+        finally:
+            await llm_utils.close_llm_client()
+    return asyncio.run(run())
+
+def test_retryable_status_is_retried(upstream):
+    calls = upstream(failures=[(503, None), (502, None)])
+    assert ask("decide") == [DECISION]
+    assert len(calls) == 3
+
+def test_retry_after_is_honoured(upstream):
+    calls = upstream(failures=[(429, 0.4)])
+    started = time.monotonic()
+    assert ask("decide") == [DECISION]
+    assert time.monotonic() - started >= 0.4
+    assert len(calls) == 2
+
+def test_exhausted_retries_fall_back(upstream):
+    calls = upstream(failures=[(500, None)] * 3)
+    assert ask("decide") == [llm_utils.FALLBACK_RESPONSE]
+    assert len(calls) == 3
+
+def test_client_errors_are_not_retried(upstream):
+    calls = upstream(failures=[(400, None)])
+    assert ask("decide") == [llm_utils.FALLBACK_RESPONSE]
+    assert len(calls) == 1
+
+def test_identical_concurrent_requests_are_coalesced(upstream):
+    calls = upstream(delay=0.2)
+    answers = ask(*["decide"] * 5, "decide again")
+    assert answers == [DECISION] * 6
+    assert len(calls) == 2
@@ -0,0 +1,54 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import locks
+
+def test_single_flight_shares_one_call():
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: locks.single_flight("corpus", load), range(8)))
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+def test_single_flight_followers_get_the_leaders_error():
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("bad pdf")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(locks.single_flight, "broken", fail)
+        started.wait()
+        follower = pool.submit(locks.single_flight, "broken", fail)
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+def test_run_exclusive_only_shares_results_between_equal_inputs():
+    running, overlaps = [], []
+
+    def build(passages):
+        running.append(passages)
+        overlaps.append(len(running))
+        time.sleep(0.1)
+        running.remove(passages)
+        return passages
+
+    inputs = ["old", "new", "old", "new"]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda p: locks.run_exclusive("index-acme", build, p, share_key=p), inputs))
+
+    assert results == inputs  # nobody is handed another caller's build
+    assert max(overlaps) == 1  # builds for one name never run at once
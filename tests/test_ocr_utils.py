@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+import ocr_utils
+
+def pdf_bytes(pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+class RecordingPool(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.tasks = []
+
+    def map(self, fn, *iterables):
+        args = list(zip(*iterables))
+        self.tasks += [(fn, a) for a in args]
+        return super().map(fn, *zip(*args))
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    monkeypatch.setattr(ocr_utils, "ocr_image_bytes", lambda png: "OCR TEXT")
+
+def test_single_scanned_page_goes_to_the_pool(fake_ocr):
+    with RecordingPool() as pool:
+        pages = ocr_utils.extract_pdf_pages(pdf_bytes([""]), pool)
+    assert pages == [{"page": 1, "text": "OCR TEXT", "source": "ocr"}]
+    assert [fn for fn, _ in pool.tasks] == [ocr_utils._extract_pdf_page_group]
+
+def test_pages_come_back_in_order_with_their_source(fake_ocr, monkeypatch):
+    monkeypatch.setattr("executors.CPU_WORKERS", 2)
+    layer = "Room rent is payable up to one percent of the sum insured per day."
+    with RecordingPool() as pool:
+        pages = ocr_utils.extract_pdf_pages(pdf_bytes([layer, "", layer, ""]), pool)
+    assert [(p["page"], p["source"]) for p in pages] == [(1, "text"), (2, "ocr"), (3, "text"), (4, "ocr")]
+    assert len(pool.tasks) == 2
+    assert ocr_utils.extract_pdf_pages(pdf_bytes([layer, "", layer, ""])) == pages
+
+def test_short_text_layer_is_treated_as_scanned(fake_ocr):
+    # A page number or stamp is not a text layer
+    pages = ocr_utils.extract_pdf_pages(pdf_bytes(["Page 3"]))
+    assert pages == [{"page": 1, "text": "OCR TEXT", "source": "ocr"}]
+
+def test_render_dpi_is_capped_for_oversized_pages(monkeypatch):
+    doc = fitz.open()
+    doc.new_page(width=595, height=842)
+    doc.new_page(width=595 * 4, height=842 * 4)
+    a4, poster = doc[0], doc[1]
+    assert ocr_utils._page_dpi(a4) == ocr_utils.OCR_TARGET_DPI
+    assert ocr_utils._page_dpi(poster) == ocr_utils.OCR_MIN_DPI
+    monkeypatch.setattr(ocr_utils, "OCR_MIN_DPI", 10)
+    width_in, height_in = poster.rect.width / 72, poster.rect.height / 72
+    dpi = ocr_utils._page_dpi(poster)
+    assert (width_in * dpi) * (height_in * dpi) <= ocr_utils.OCR_MAX_PAGE_PIXELS
+    doc.close()
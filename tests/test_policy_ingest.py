@@ -0,0 +1,48 @@
+import fitz
+
+from policy_ingest import chunk_text, format_passage, iter_blocks, iter_chunks, policy_passages
+
+PAGES = [
+    (1, "SECTION 3 - COVERAGE\n3.1 In-patient hospitalization expenses are covered\nwhen admission exceeds 24 hours.\n"
+        "3.2 Day care procedures are covered.\nPage 1 of 2"),
+    (2, "4. EXCLUSIONS\n(a) Cosmetic surgery is not covered.\n(b) Dental treatment is not covered unless\n"
+        "arising from an accident.\n2"),
+]
+
+def test_blocks_join_wrapped_lines_and_drop_page_furniture():
+    blocks = list(iter_blocks(PAGES))
+    assert ("clause", "3.1 In-patient hospitalization expenses are covered when admission exceeds 24 hours.", 1) in blocks
+    assert ("heading", "4. EXCLUSIONS", 2) in blocks
+    assert not any(text.startswith("Page 1") or text == "2" for _, text, _ in blocks)
+
+def test_chunks_carry_page_range_and_section():
+    chunks = list(iter_chunks(iter_blocks(PAGES)))
+    assert [(c["section"], c["page_start"], c["page_end"]) for c in chunks] == [
+        ("SECTION 3 - COVERAGE", 1, 1), ("4. EXCLUSIONS", 2, 2)]
+    assert format_passage(chunks[1]).startswith("[Page 2 | 4. EXCLUSIONS]\n4. EXCLUSIONS\n(a) Cosmetic")
+
+def test_long_sections_split_within_the_limit_with_whole_word_overlap():
+    text = "GENERAL CONDITIONS\n" + "\n".join(f"{i}. Condition number {i} applies to every claim made." for i in range(1, 40))
+    chunks = chunk_text(text, max_chars=300, overlap=80)
+    assert len(chunks) > 3 and all(len(c) <= 300 for c in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_line = chunk.split("\n")[0]
+        assert first_line in previous.split("\n")  # overlap is whole pieces, never a cut word
+
+def test_policy_passages_cite_pages_across_a_pdf(tmp_path):
+    doc = fitz.open()
+    for _, text in PAGES:
+        doc.new_page().insert_text((72, 72), text)
+    path = tmp_path / "policy.pdf"
+    doc.save(str(path))
+    doc.close()
+
+    passages = policy_passages(str(path))
+    assert passages[0].startswith("[Page 1 | SECTION 3 - COVERAGE]")
+    assert passages[1].startswith("[Page 2 | 4. EXCLUSIONS]")
+
+def test_section_continuing_onto_the_next_page_cites_both():
+    pages = [(7, "WAITING PERIODS\n1. Pre-existing diseases: 36 months."), (8, "2. Specified illnesses: 24 months.")]
+    [chunk] = iter_chunks(iter_blocks(pages))
+    assert (chunk["page_start"], chunk["page_end"]) == (7, 8)
+    assert format_passage(chunk).startswith("[Pages 7-8 | WAITING PERIODS]")
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import policy_search
+
+# isolated_cache stubs probe_pdf_urls out for the search tests; the download tests use the real one
+probe_pdf_urls = policy_search.probe_pdf_urls
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(policy_search, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(policy_search, "URL_CACHE_FILE", str(tmp_path / "url_cache.json"))
+    monkeypatch.setattr(policy_search, "NEGATIVE_CACHE_FILE", str(tmp_path / "negative_cache.json"))
+    monkeypatch.setattr(policy_search, "DUCK_API", True)
+    monkeypatch.setattr(policy_search, "probe_pdf_urls", lambda urls, insurer: (None, None))
+
+def _miss_ttl(key):
+    return policy_search._negative_entries()[key] - time.time()
+
+def test_search_outage_is_not_cached_for_long(isolated_cache, monkeypatch):
+    def down(query):
+        raise ConnectionError("rate limited")
+    monkeypatch.setattr(policy_search, "duckduckgo_pdf_search_api", down)
+    monkeypatch.setattr(policy_search, "duckduckgo_pdf_search_html", down)
+
+    assert policy_search._fetch_policy_pdf("Acme Health", "acme-health") is None
+    assert _miss_ttl("acme-health") <= policy_search.POLICY_SEARCH_ERROR_TTL
+
+def test_search_without_usable_pdf_is_cached(isolated_cache, monkeypatch):
+    monkeypatch.setattr(policy_search, "duckduckgo_pdf_search_api", lambda query: [])
+    monkeypatch.setattr(policy_search, "duckduckgo_pdf_search_html", lambda query: ["https://example.com/x.pdf"])
+
+    assert policy_search._fetch_policy_pdf("Acme Health", "acme-health") is None
+    assert _miss_ttl("acme-health") > policy_search.POLICY_SEARCH_ERROR_TTL
+
+PDF = b"%PDF-1.4\n" + b"0" * 5000 + b"\n%%EOF\n"
+
+@pytest.fixture
+def pdf_server():
+    """Local HTTP server: path -> (content type, body, seconds to wait before the body)."""
+    routes = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            content_type, body, delay = routes[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            time.sleep(delay)
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield routes, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def _settle(folder, seconds=3.0):
+    # Losers finish (and clean up) in the background after the winner is returned
+    deadline = time.time() + seconds
+    while any(f.endswith(".part") for f in os.listdir(folder)) and time.time() < deadline:
+        time.sleep(0.05)
+    return sorted(os.listdir(folder))
+
+def test_pdf_is_judged_by_magic_bytes_not_content_type(isolated_cache, pdf_server):
+    routes, base = pdf_server
+    routes["/login"] = ("application/pdf", b"<html>please sign in</html>" * 50, 0)
+    routes["/policy"] = ("application/force-download", PDF, 0.2)
+
+    url, path = probe_pdf_urls([base + "/login", base + "/policy"], "Acme Health")
+
+    assert url == base + "/policy"
+    with open(path, "rb") as f:
+        assert f.read() == PDF
+    assert _settle(os.path.dirname(path)) == [os.path.basename(path)]
+
+def test_only_the_winning_download_is_kept(isolated_cache, pdf_server):
+    routes, base = pdf_server
+    routes["/fast.pdf"] = ("application/octet-stream", PDF, 0)
+    routes["/slow.pdf"] = ("application/pdf", PDF, 0.5)
+
+    url, path = probe_pdf_urls([base + "/slow.pdf", base + "/fast.pdf"], "Acme Health")
+
+    assert url == base + "/fast.pdf"
+    folder = os.path.dirname(path)
+    time.sleep(0.7)
+    assert _settle(folder) == [os.path.basename(path)]
+    assert policy_search.local_policy_pdf_for_key("acme-health") == path
+
+def test_legacy_slug_folders_move_to_the_canonical_key(isolated_cache, tmp_path, monkeypatch):
+    import embeddings_faiss
+    index_dir = tmp_path / "indexes"
+    monkeypatch.setattr(embeddings_faiss, "INDEX_DIR", str(index_dir))
+    cache_dir = tmp_path
+    (cache_dir / "star-health").mkdir()
+    (cache_dir / "star-health" / "manual.pdf").write_bytes(PDF)
+    (index_dir / "star-health").mkdir(parents=True)
+    (index_dir / "star-health" / "manifest.json").write_text("{}")
+    (cache_dir / "standard").mkdir()
+    policy_search._remember_urls("star-health", ["https://example.com/star.pdf"])
+
+    assert policy_search.migrate_legacy_folders() == 1
+
+    key = "star-health-and-allied-insurance-co-ltd"
+    assert policy_search.local_policy_pdf("Star Health") == str(cache_dir / key / "manual.pdf")
+    assert (index_dir / key / "manifest.json").exists()
+    assert (cache_dir / "standard").exists()  # shared standard clauses, not an insurer
+    assert policy_search._load_url_cache() == {key: ["https://example.com/star.pdf"]}
+    assert policy_search.migrate_legacy_folders() == 0
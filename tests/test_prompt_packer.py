@@ -0,0 +1,31 @@
+from prompt_packer import count_tokens, pack_clauses, pack_ocr_text, pack_prompt
+
+TEMPLATE = "Adjudicate.\nCLAIM:\n{ocr}\nFIELDS:\n{structured}\nPOLICY:\n{clauses}\n"
+
+def claim_text(pages=30):
+    parts = []
+    for page in range(1, pages + 1):
+        parts += [f"[Page {page}]", "City Care Hospital, 12 MG Road, Pune", "",
+                  f"Nursing note {page}: patient comfortable, vitals stable, tolerating oral diet well.", ""]
+    parts += ["[Page 31]", "Room rent Rs. 4,500 x 3 days", "Pharmacy Rs. 12,340.00", "Total payable Rs. 25,840.00",
+              "", "Final diagnosis: acute appendicitis, laparoscopic appendectomy done."]
+    return "\n".join(parts)
+
+def test_prompt_fits_the_budget_and_keeps_bills_and_diagnosis():
+    clauses = [(0.9, "Room rent is capped at 1% of the sum insured per day.")] + [
+        (0.1, f"Unrelated clause {i} about maternity waiting periods and dental cover.") for i in range(40)]
+    prompt, usage = pack_prompt(TEMPLATE, claim_text(), {"diagnosis": "appendicitis"}, clauses, budget=300)
+
+    assert usage["total"] <= 300 and count_tokens(prompt) == usage["total"]
+    assert "Total payable Rs. 25,840.00" in prompt and "acute appendicitis" in prompt
+    assert "Room rent is capped" in prompt and usage["clauses_dropped"] > 0
+    assert prompt.count("City Care Hospital") <= 1  # letterhead repeated on every page
+
+def test_ocr_blocks_keep_document_order():
+    packed, used = pack_ocr_text(claim_text(3), budget=10_000)
+    assert packed.index("Nursing note 1") < packed.index("Nursing note 3") < packed.index("Total payable")
+    assert used <= 10_000
+
+def test_clauses_are_kept_whole_by_score():
+    kept, used = pack_clauses([(0.2, "low " * 20), (0.8, "high clause"), "unscored clause"], budget=10)
+    assert kept == ["high clause", "unscored clause"] and used <= 10
@@ -0,0 +1,25 @@
+import pytest
+
+import embeddings_faiss
+import rag_utils
+from bm25 import BM25Index
+
+PASSAGES = [
+    "Hospitalization expenses are covered when admission exceeds 24 hours.",
+    "Non-medical items such as gloves and toiletries are not payable.",
+    "Pre-authorization is required for planned cashless admissions.",
+]
+
+def test_keyword_mode_never_loads_the_embedding_model(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("keyword retrieval must not load or run the embedding model")
+    monkeypatch.setattr(embeddings_faiss, "get_model", fail)
+    monkeypatch.setattr(embeddings_faiss, "embed_texts", fail)
+    monkeypatch.setattr(rag_utils, "VECTOR_STORE", "per-insurer")
+    monkeypatch.setattr(rag_utils, "SERVE_ONLY", False)
+    monkeypatch.setattr(rag_utils, "find_or_fetch_policy_pdf", lambda insurer, keywords=None: "policy.pdf")
+    monkeypatch.setattr(rag_utils, "get_corpus", lambda key, path, load: (object(), PASSAGES, BM25Index.build(PASSAGES)))
+
+    clauses = rag_utils.retrieve_policy_clauses("Example Insurer", ["non-medical items", "hospitalization"], mode="keyword")
+
+    assert PASSAGES[1] in clauses and PASSAGES[0] in clauses
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import embeddings_faiss
+from rerank import rerank
+
+@pytest.fixture
+def no_model(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("reranking must not encode")
+    monkeypatch.setattr(embeddings_faiss, "get_model", fail)
+    monkeypatch.setattr(embeddings_faiss, "embed_texts", fail)
+
+def test_rerank_reads_stored_vectors_only(no_model):
+    stored = "Room rent is capped at 1% of the sum insured per day."
+    unseen = "Cosmetic surgery is excluded unless needed after an accident."
+    embeddings_faiss._store_put({embeddings_faiss.chunk_hash(stored): np.ones(4, dtype="float32") / 2})
+
+    picked = rerank([[(0.9, stored), (0.5, unseen)]], embeddings_faiss.stored_passage_vectors)
+
+    assert [p for _, p in picked] == [stored, unseen]
+    assert embeddings_faiss.stored_passage_vectors([unseen]) == {}
+
+def test_passages_without_vectors_are_ranked_by_relevance():
+    candidates = [[(0.2, "c"), (0.9, "a"), (0.5, "b")]]
+    picked = rerank(candidates, lambda passages: {}, max_clauses=2)
+    assert [p for _, p in picked] == ["a", "b"]
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import llm_cache
+import llm_utils
+import main
+import metrics
+
+def broken_stream(*deltas):
+    async def stream(payload):
+        for delta in deltas:
+            yield delta
+        raise ConnectionError("connection reset")
+    return stream
+
+async def collect(prompt):
+    return [delta async for delta in llm_utils.stream_llm(prompt, use_cache=False)]
+
+def test_failure_before_output_yields_fallback(monkeypatch):
+    monkeypatch.setattr(llm_utils, "_stream_with_retries", broken_stream())
+    assert asyncio.run(collect("claim")) == [llm_utils.FALLBACK_RESPONSE]
+
+def test_failure_after_partial_output_is_raised(monkeypatch):
+    monkeypatch.setattr(llm_utils, "_stream_with_retries", broken_stream('{"status": "appr'))
+    with pytest.raises(ConnectionError):
+        asyncio.run(collect("claim"))
+
+@pytest.fixture
+def offline_pipeline(monkeypatch):
+    async def extract_document(name, contents):
+        return "Patient Name: Ravi Kumar"
+    async def extract_structured_fields(text):
+        return {}
+    monkeypatch.setattr(main, "extract_document", extract_document)
+    monkeypatch.setattr(main, "extract_structured_fields", extract_structured_fields)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+
+def post_claim(**kwargs):
+    response = TestClient(main.app).post("/process-claim/stream", files=[("files", ("bill.txt", b"bill"))], **kwargs)
+    return response, [json.loads(line) for line in response.text.splitlines()]
+
+def request_seconds(stat):
+    line = next(l for l in metrics.render().splitlines()
+                if l.startswith(f'healthbridge_request_seconds_{stat}{{path="/process-claim/stream"'))
+    return float(line.rsplit(" ", 1)[1])
+
+def test_stream_endpoint_reports_error_instead_of_truncated_decision(offline_pipeline, monkeypatch):
+    monkeypatch.setattr(llm_utils, "_stream_with_retries", broken_stream('{"status": "appr'))
+
+    _, events = post_claim()
+    stages = [e["stage"] for e in events]
+
+    assert stages[-1] == "error"
+    assert events[-1]["failed_stage"] == "decision"
+    assert "decision" not in stages
+
+@pytest.mark.parametrize("failing", ["extract_document", "extract_structured_fields", "_retrieve_clauses"])
+def test_stream_reports_the_stage_that_failed(offline_pipeline, monkeypatch, failing):
+    async def broken(*args):
+        raise RuntimeError(f"{failing} broke")
+    monkeypatch.setattr(main, failing, broken)
+
+    response, events = post_claim()
+
+    assert response.status_code == 200
+    expected = {"extract_document": "ocr", "extract_structured_fields": "structured_data",
+                "_retrieve_clauses": "policy_clauses"}[failing]
+    assert events[-1] == {"stage": "error", "failed_stage": expected, "error": f"{failing} broke"}
+
+def test_stream_trace_id_comes_first_and_latency_covers_the_body(offline_pipeline, monkeypatch):
+    async def slow_stream(payload):
+        await asyncio.sleep(0.3)
+        yield '{"status": "approved"}'
+    monkeypatch.setattr(llm_utils, "_stream_with_retries", slow_stream)
+    before = request_seconds("sum") if 'path="/process-claim/stream"' in metrics.render() else 0.0
+
+    response, events = post_claim(headers={"X-Request-ID": "claim-42.retry_1"})
+
+    assert events[0] == {"stage": "trace", "trace_id": "claim-42.retry_1"}
+    assert response.headers["x-trace-id"] == "claim-42.retry_1"
+    assert events[-1]["stage"] == "decision"
+    assert request_seconds("sum") - before >= 0.3
+
+@pytest.mark.parametrize("request_id", ["x" * 65, "id with spaces", "<script>", "id\u2028"])
+def test_unsafe_request_ids_are_not_echoed(offline_pipeline, monkeypatch, request_id):
+    monkeypatch.setattr(llm_utils, "_stream_with_retries", broken_stream('{}'))
+    response, events = post_claim(headers={"X-Request-ID": request_id.encode("utf-8")})
+    assert response.headers["x-trace-id"] != request_id
+    assert events[0]["trace_id"] == response.headers["x-trace-id"]
@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import policy_search
+import vector_store
+
+def unit(*rows):
+    v = np.array(rows, dtype="float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "UNIFIED_DIR", str(tmp_path / "_unified"))
+    monkeypatch.setattr(vector_store, "_state", {"index": None, "registry": None, "stamp": None,
+                                                 "writable": False, "stores": {}})
+
+def load_fresh():
+    # What another process sees: nothing cached in memory
+    vector_store._state.update(index=None, registry=None, stamp=None, writable=False, stores={})
+
+def test_search_is_filtered_to_the_tenant_and_standard_clauses():
+    vector_store.upsert_many([
+        ("alpha", ["alpha room rent"], unit([1, 0, 0]), "policy", {"sha256": "a"}),
+        ("beta", ["beta room rent"], unit([1, 0.1, 0]), "policy", {"sha256": "b"}),
+        (vector_store.STANDARD_TENANT, ["standard exclusions"], unit([0.9, 0.2, 0]), "standard", {}),
+    ])
+    load_fresh()
+    query = unit([1, 0, 0])
+    assert [p for _, p in vector_store.search("alpha", query, k=5)[0]] == ["alpha room rent", "standard exclusions"]
+    assert [p for _, p in vector_store.search("alpha", query, k=5, include_standard=False)[0]] == ["alpha room rent"]
+    assert vector_store.search("gamma", query, k=5, include_standard=False) == [[]]
+    assert vector_store.is_current("beta", {"sha256": "b"}) and not vector_store.is_current("beta", {"sha256": "x"})
+
+def test_rewrites_never_touch_the_files_a_reader_is_using():
+    vector_store.upsert("alpha", ["first"], unit([1, 0]))
+    load_fresh()
+    vector_store.search("alpha", unit([1, 0]))
+    old_files = vector_store._registry_files(vector_store._state["registry"])
+
+    vector_store.upsert("alpha", ["second", "third"], unit([1, 0], [0, 1]))
+    assert all(os.path.exists(f) for f in old_files)  # previous version kept for in-flight readers
+    assert [p for _, p in vector_store.search("alpha", unit([0, 1]), k=1)[0]] == ["third"]
+
+    vector_store.upsert("alpha", ["fourth"], unit([1, 0]))
+    assert not any(os.path.exists(f) for f in old_files)
+
+def test_store_from_another_embedding_model_is_rebuilt():
+    vector_store.upsert("alpha", ["first"], unit([1, 0]), source={"sha256": "a"})
+    registry_path = vector_store._registry_path()
+    with open(registry_path, encoding="utf-8") as f:
+        registry = json.load(f)
+    registry["embed_model"] = "some-other-model"
+    with open(registry_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f)
+    load_fresh()
+
+    assert vector_store.search("alpha", unit([1, 0])) == [[]]
+    assert not vector_store.is_current("alpha", {"sha256": "a"})
+    vector_store.upsert("alpha", ["rebuilt"], unit([1, 0]), source={"sha256": "a"})
+    load_fresh()
+    assert [p for _, p in vector_store.search("alpha", unit([1, 0]))[0]] == ["rebuilt"]
+
+def test_insurers_never_get_the_standard_tenant_key():
+    assert policy_search._insurer_key("Standard") != vector_store.STANDARD_TENANT
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import embeddings_faiss
+import main
+import rag_utils
+import warmup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(warmup, "_state", {"status": "pending", "mode": "eager", "steps": {}, "error": None})
+
+def ready():
+    response = asyncio.run(main.ready())
+    return response.status_code, json.loads(response.body)
+
+def test_app_import_leaves_heavy_libraries_for_later():
+    code = "import sys, main; print(sorted(m for m in ('faiss', 'sentence_transformers', 'torch') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+def test_warm_up_loads_model_queries_and_hot_indexes(fresh_state, monkeypatch):
+    calls = []
+    monkeypatch.setattr(warmup, "WARMUP_INSURERS", ["acme-health"])
+    monkeypatch.setattr(embeddings_faiss, "get_model", lambda: calls.append("model"))
+    monkeypatch.setattr(embeddings_faiss, "warm_query_cache", lambda queries: calls.append("queries"))
+    monkeypatch.setattr(rag_utils, "warm_corpus", lambda key: calls.append(key))
+
+    warmup._state["status"] = "warming"
+    assert ready()[0] == 503
+    warmup.warm_up()
+
+    assert calls == ["model", "queries", "acme-health"]
+    status, body = ready()
+    assert status == 200 and body["status"] == "ready" and set(body["steps"]) == {"model", "queries", "index:acme-health"}
+
+def test_failed_warm_up_still_serves(fresh_state, monkeypatch):
+    def missing_model():
+        raise OSError("model download failed")
+    monkeypatch.setattr(embeddings_faiss, "get_model", missing_model)
+
+    warmup.warm_up()
+
+    status, body = ready()
+    assert status == 200 and body["status"] == "failed" and "model download failed" in body["error"]
@@ -0,0 +1,244 @@
+import os, json, time, threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from embeddings_faiss import INDEX_DIR, EMBED_MODEL_NAME, chunk_hash, _read_faiss_index
+from fs_utils import atomic_write_json
+from passage_store import PassageStore, write_passages
+from locks import file_lock
+
+# Single multi-tenant store: one FAISS index for every insurer, with int64 IDs laid out as
+#   tenant (27 bits) | document type (4 bits) | local passage number (32 bits)
+# so one insurer, one document type, or the shared standard clauses are contiguous ID ranges.
+# Index and passage files are never overwritten: each write adds files under a new version name and
+# tenants.json (the registry, replaced atomically) names the live ones, so readers always pair an
+# index with the passages it was built with. Files of the previous version stay for in-flight readers.
+UNIFIED_DIR = os.path.join(INDEX_DIR, "_unified")
+STANDARD_TENANT = "standard"  # IRDAI standard exclusions/definitions shared by every insurer
+DOC_TYPES = {"policy": 0, "endorsement": 1, "annexure": 2, "standard": 3}
+_TENANT_SHIFT, _DOC_SHIFT = 36, 32
+
+_lock = threading.RLock()
+_state = {"index": None, "registry": None, "stamp": None, "writable": False, "stores": {}}
+
+def _registry_path() -> str:
+    return os.path.join(UNIFIED_DIR, "tenants.json")
+
+def _index_path(registry: Dict) -> str:
+    # Stores written before versioned files have a single faiss.index
+    return os.path.join(UNIFIED_DIR, registry.get("index", "faiss.index"))
+
+def _passage_paths(tenant_key: str, doc_type: str, version: str = None) -> Tuple[str, str]:
+    base = os.path.join(UNIFIED_DIR, "passages", tenant_key)
+    name = f"{doc_type}-{version}" if version else doc_type
+    return os.path.join(base, f"{name}.bin"), os.path.join(base, f"{name}.offsets.npy")
+
+def _registry_files(registry: Dict) -> set:
+    files = {_index_path(registry)}
+    for tenant_key, tenant in registry["tenants"].items():
+        for doc_type, doc in tenant["docs"].items():
+            files.update(_passage_paths(tenant_key, doc_type, doc.get("passages")))
+    return files
+
+def _empty_registry() -> Dict:
+    return {"embed_model": EMBED_MODEL_NAME, "next_tenant": 1, "tenants": {}}
+
+def make_id(tenant_id: int, doc_type: str, local: int) -> int:
+    return (tenant_id << _TENANT_SHIFT) | (DOC_TYPES[doc_type] << _DOC_SHIFT) | local
+
+def _split_id(vid: int) -> Tuple[int, int, int]:
+    return vid >> _TENANT_SHIFT, (vid >> _DOC_SHIFT) & 0xF, vid & 0xFFFFFFFF
+
+def _tenant_range(tenant_id: int, doc_type: str = None) -> Tuple[int, int]:
+    if doc_type is None:
+        return tenant_id << _TENANT_SHIFT, (tenant_id + 1) << _TENANT_SHIFT
+    start = make_id(tenant_id, doc_type, 0)
+    return start, start + (1 << _DOC_SHIFT)
+
+def _stamp():
+    try:
+        st = os.stat(_registry_path())
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _load(writable: bool = False):
+    """(Re)load the index + registry if another process has rewritten them since we last looked."""
+    import faiss
+    with _lock:
+        stamp = _stamp()
+        if _state["registry"] is not None and stamp == _state["stamp"] and (_state["writable"] or not writable):
+            return
+        if stamp is None:
+            _state.update(index=None, registry=_empty_registry(), stamp=None, writable=True, stores={})
+            return
+        with open(_registry_path(), "r", encoding="utf-8") as f:
+            registry = json.load(f)
+        if registry.get("embed_model") != EMBED_MODEL_NAME:
+            # Vectors from another model can't be searched with this one's queries: serve nothing,
+            # so every tenant reads as stale and is rebuilt (the next write replaces the store)
+            print(f"Unified store was built with {registry.get('embed_model')}, not {EMBED_MODEL_NAME}; rebuilding")
+            _state.update(index=None, registry=_empty_registry(), stamp=stamp, writable=True, stores={})
+            return
+        # Mapped read-only for serving; a private copy only when this process is going to modify it
+        index_path = _index_path(registry)
+        index = faiss.read_index(index_path) if writable else _read_faiss_index(index_path)
+        _state.update(index=index, registry=registry, stamp=stamp, writable=writable, stores={})
+
+def _save(version: str, previous_files: set):
+    import faiss
+    os.makedirs(UNIFIED_DIR, exist_ok=True)
+    registry = _state["registry"]
+    registry["index"] = f"faiss-{version}.index"
+    faiss.write_index(_state["index"], _index_path(registry))
+    atomic_write_json(_registry_path(), registry)
+    _state["stamp"] = _stamp()
+    _prune(_registry_files(registry) | previous_files)
+
+def _prune(keep: set):
+    """Delete index and passage files named by neither the live nor the previous registry."""
+    for folder, _, names in os.walk(UNIFIED_DIR):
+        for name in names:
+            path = os.path.join(folder, name)
+            if name == "tenants.json" or name.startswith(".tmp-") or path in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    passages_dir = os.path.join(UNIFIED_DIR, "passages")
+    if os.path.isdir(passages_dir):
+        for name in os.listdir(passages_dir):
+            try:
+                os.rmdir(os.path.join(passages_dir, name))  # only succeeds for tenants with no files left
+            except OSError:
+                pass
+
+def _tenant_id(tenant_key: str, create: bool = False) -> Optional[int]:
+    tenants = _state["registry"]["tenants"]
+    if tenant_key not in tenants:
+        if not create:
+            return None
+        if tenant_key == STANDARD_TENANT:
+            tenant_id = 0
+        else:
+            tenant_id = _state["registry"]["next_tenant"]
+            _state["registry"]["next_tenant"] = tenant_id + 1
+        tenants[tenant_key] = {"id": tenant_id, "docs": {}}
+    return tenants[tenant_key]["id"]
+
+def tenant_source(tenant_key: str, doc_type: str = "policy") -> Dict:
+    _load()
+    with _lock:
+        tenant = _state["registry"]["tenants"].get(tenant_key)
+        return dict(tenant["docs"].get(doc_type, {}).get("source", {})) if tenant else {}
+
+def is_current(tenant_key: str, source: Dict, doc_type: str = "policy") -> bool:
+    current = tenant_source(tenant_key, doc_type)
+    return bool(current) and all(current.get(k) == v for k, v in source.items())
+
+def upsert(tenant_key: str, passages: List[str], embeddings: np.ndarray, doc_type: str = "policy",
+           source: Dict = None):
+    """Replace one tenant's passages of one document type; other tenants are untouched."""
+    upsert_many([(tenant_key, passages, embeddings, doc_type, source)])
+
+def upsert_many(items: List[Tuple[str, List[str], np.ndarray, str, Dict]]):
+    """
+    upsert for several (tenant_key, passages, embeddings, doc_type, source) at once. The index file is
+    rewritten once per call, so bulk loads should pass many tenants together.
+    """
+    import faiss
+    if not items:
+        return
+    # The file lock serialises writers across processes; _load then picks up any newer copy
+    with file_lock("unified-store"), _lock:
+        _load(writable=True)
+        previous_files = _registry_files(_state["registry"])
+        version = str(time.time_ns())
+        for tenant_key, passages, embeddings, doc_type, source in items:
+            tenant_id = _tenant_id(tenant_key, create=True)
+            if _state["index"] is None:
+                _state["index"] = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+            start, end = _tenant_range(tenant_id, doc_type)
+            _state["index"].remove_ids(faiss.IDSelectorRange(start, end))
+            ids = np.array([make_id(tenant_id, doc_type, i) for i in range(len(passages))], dtype="int64")
+            _state["index"].add_with_ids(np.ascontiguousarray(embeddings, dtype="float32"), ids)
+            write_passages(*_passage_paths(tenant_key, doc_type, version), list(passages))
+            _state["registry"]["tenants"][tenant_key]["docs"][doc_type] = {
+                "count": len(passages),
+                "source": source or {},
+                "chunk_hashes": [chunk_hash(p) for p in passages],
+                "passages": version,
+            }
+            _state["stores"].pop((tenant_key, doc_type), None)
+        _save(version, previous_files)
+
+def remove(tenant_key: str, doc_type: str = None):
+    import faiss
+    with file_lock("unified-store"), _lock:
+        _load(writable=True)
+        tenant_id = _tenant_id(tenant_key)
+        if tenant_id is None or _state["index"] is None:
+            return
+        previous_files = _registry_files(_state["registry"])
+        start, end = _tenant_range(tenant_id, doc_type)
+        _state["index"].remove_ids(faiss.IDSelectorRange(start, end))
+        tenant = _state["registry"]["tenants"][tenant_key]
+        for dt in [doc_type] if doc_type else list(tenant["docs"]):
+            tenant["docs"].pop(dt, None)
+            _state["stores"].pop((tenant_key, dt), None)
+        if doc_type is None or not tenant["docs"]:
+            del _state["registry"]["tenants"][tenant_key]
+        _save(str(time.time_ns()), previous_files)
+
+def _passage(tenant_by_id: Dict[int, str], vid: int) -> str:
+    tenant_id, doc_code, local = _split_id(vid)
+    doc_type = next(name for name, code in DOC_TYPES.items() if code == doc_code)
+    key = (tenant_by_id[tenant_id], doc_type)
+    store = _state["stores"].get(key)
+    if store is None:
+        version = _state["registry"]["tenants"][key[0]]["docs"][doc_type].get("passages")
+        store = _state["stores"][key] = PassageStore(*_passage_paths(*key, version))
+    return store[local]
+
+def search(tenant_key: str, query_embeddings: np.ndarray, k: int = 8, include_standard: bool = True,
+           doc_types: List[str] = None) -> List[List[Tuple[float, str]]]:
+    """Per-query [(score, passage)] restricted to one insurer (optionally some doc types) + standard clauses."""
+    import faiss
+    _load()
+    with _lock:
+        index = _state["index"]
+        if index is None:
+            return [[] for _ in range(len(query_embeddings))]
+        ranges = []
+        tenant_id = _tenant_id(tenant_key)
+        if tenant_id is not None:
+            ranges += [_tenant_range(tenant_id, dt) for dt in (doc_types or [None])]
+        if include_standard and _tenant_id(STANDARD_TENANT) is not None:
+            ranges.append(_tenant_range(0))
+        if not ranges:
+            return [[] for _ in range(len(query_embeddings))]
+
+        # Selectors hold raw pointers to each other, so keep every one referenced until the search returns
+        selectors = [faiss.IDSelectorRange(start, end) for start, end in ranges]
+        chain = [selectors[0]]
+        for other in selectors[1:]:
+            chain.append(faiss.IDSelectorOr(chain[-1], other))
+        scores, ids = index.search(np.ascontiguousarray(query_embeddings, dtype="float32"), k,
+                                   params=faiss.SearchParameters(sel=chain[-1]))
+
+        tenant_by_id = {t["id"]: key for key, t in _state["registry"]["tenants"].items()}
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            results.append([(float(s), _passage(tenant_by_id, int(i))) for s, i in zip(row_scores, row_ids) if i != -1])
+        return results
+
+def stats() -> Dict:
+    _load()
+    with _lock:
+        tenants = _state["registry"]["tenants"]
+        return {
+            "tenants": len(tenants),
+            "vectors": int(_state["index"].ntotal) if _state["index"] is not None else 0,
+            "per_tenant": {k: sum(d["count"] for d in t["docs"].values()) for k, t in tenants.items()},
+        }
@@ -0,0 +1,54 @@
+import os, time, threading
+from typing import Dict, List
+
+# eager: warm before serving; background: serve immediately, warm in the background; off: everything stays lazy
+WARMUP_MODE = os.getenv("WARMUP_MODE", "eager").lower()
+# Insurer keys whose corpus/index to map at startup ("*" = every cached policy folder)
+WARMUP_INSURERS = [k.strip() for k in os.getenv("WARMUP_INSURERS", "").split(",") if k.strip()]
+
+_lock = threading.Lock()
+_state = {"status": "pending", "mode": WARMUP_MODE, "steps": {}, "error": None}
+
+def _step(name: str, fn):
+    started = time.perf_counter()
+    fn()
+    with _lock:
+        _state["steps"][name] = round(time.perf_counter() - started, 3)
+
+def _hot_insurers() -> List[str]:
+    if WARMUP_INSURERS != ["*"]:
+        return WARMUP_INSURERS
+    from policy_search import CACHE_DIR
+    return sorted(d for d in os.listdir(CACHE_DIR) if os.path.isdir(os.path.join(CACHE_DIR, d)))
+
+def warm_up():
+    """Load the embedding model, pre-embed the fixed retrieval queries and map hot insurer indexes."""
+    with _lock:
+        _state["status"] = "warming"
+    try:
+        import embeddings_faiss
+        import rag_utils
+        _step("model", embeddings_faiss.get_model)
+        _step("queries", lambda: embeddings_faiss.warm_query_cache(rag_utils.DEFAULT_QUERIES))
+        for key in _hot_insurers():
+            _step(f"index:{key}", lambda: rag_utils.warm_corpus(key))
+    except Exception as err:
+        print(f"Warmup failed: {err}")
+        with _lock:
+            _state["status"], _state["error"] = "failed", str(err)
+        return
+    with _lock:
+        _state["status"] = "ready"
+
+def mark_skipped():
+    with _lock:
+        _state["status"] = "off"
+
+def is_ready() -> bool:
+    # A failed or skipped warmup still serves (lazily), so only an in-progress warmup is "not ready"
+    with _lock:
+        return _state["status"] in ("ready", "off", "failed")
+
+def warmup_state() -> Dict:
+    with _lock:
+        return {**_state, "steps": dict(_state["steps"])}